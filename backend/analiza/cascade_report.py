@@ -0,0 +1,87 @@
+"""
+Dobór progu kaskady modeli (Config.PREDICT_CASCADE / CASCADE_MARGIN).
+
+W trybie kaskady model logistyczny liczony jest jako pierwszy, a Random Forest
+i Gradient Boosting tylko wtedy, gdy margines pewności (różnica dwóch najwyższych
+prawdopodobieństw klas) jest mniejszy niż próg. Dla każdego progu raport podaje:
+  - odsetek żądań zakończonych na modelu logistycznym,
+  - zgodność klasy wyniku kaskady z pełnym potokiem (model główny - Random Forest),
+  - średni zaoszczędzony czas na żądanie (z pomiarów opóźnienia pojedynczego wiersza).
+
+Przykład:
+    python cascade_report.py --models-dir .. --thresholds 0.2,0.4,0.6,0.8
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import joblib
+
+from modele import load_training_data, measure_latency, MODEL_FILES
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Zgodność i oszczędność czasu kaskady modeli dla progów marginesu")
+    parser.add_argument('--csv', default='diabetes.csv', help="Plik ze zbiorem BRFSS")
+    parser.add_argument('--models-dir', default='..', help="Katalog z plikami pkl")
+    parser.add_argument('--thresholds', default='0.1,0.2,0.3,0.4,0.5,0.6,0.7,0.8,0.9')
+    parser.add_argument('--sample', type=int, default=50000, help="Liczba wierszy do oceny (0 = wszystkie)")
+    parser.add_argument('--report', default='cascade_report.json', help="Ścieżka raportu JSON")
+    return parser.parse_args()
+
+
+def cascade_table(margins, logistic_pred, primary_pred, saved_ms, thresholds):
+    """Wiersze raportu dla kolejnych progów."""
+    rows = []
+    for threshold in thresholds:
+        short_circuit = margins >= threshold
+        final_pred = np.where(short_circuit, logistic_pred, primary_pred)
+        rows.append({
+            'threshold': threshold,
+            'short_circuit_rate': round(float(short_circuit.mean()), 4),
+            'agreement_rate': round(float((final_pred == primary_pred).mean()), 4),
+            'avg_saved_ms': round(float(short_circuit.mean() * saved_ms), 4)
+        })
+    return rows
+
+
+def main():
+    args = parse_args()
+
+    X, _ = load_training_data(args.csv)
+    if args.sample and len(X) > args.sample:
+        X = X.sample(args.sample, random_state=42)
+
+    scaler = joblib.load(os.path.join(args.models_dir, 'scaler.pkl'))
+    X_scaled = scaler.transform(X)
+    models = {name: joblib.load(os.path.join(args.models_dir, file)) for name, file in MODEL_FILES.items()}
+
+    # --- 1. PREDYKCJE WSZYSTKICH MODELI ---
+    logistic_proba = models['logistic'].predict_proba(X_scaled)
+    top_two = np.sort(logistic_proba, axis=1)[:, -2:]
+    margins = top_two[:, 1] - top_two[:, 0]
+    logistic_pred = models['logistic'].classes_[logistic_proba.argmax(axis=1)]
+    primary_pred = models['random_forest'].predict(X_scaled)
+
+    # --- 2. KOSZT MODELI DRZEWIASTYCH (pojedynczy wiersz, jak w /predict) ---
+    latency = {name: measure_latency(model, X_scaled) for name, model in models.items()}
+    saved_ms = latency['random_forest']['single_row_p50_ms'] + latency['gradient_boost']['single_row_p50_ms']
+
+    thresholds = [float(t) for t in args.thresholds.split(',')]
+    rows = cascade_table(margins, logistic_pred, primary_pred, saved_ms, thresholds)
+
+    print(f"\nRows: {len(X)}, tree models cost {round(saved_ms, 3)} ms per request")
+    print(f"{'threshold':>10}{'logistic only':>15}{'agreement':>12}{'saved ms':>10}")
+    print("-" * 47)
+    for row in rows:
+        print(f"{row['threshold']:>10.2f}{row['short_circuit_rate'] * 100:>14.1f}%"
+              f"{row['agreement_rate'] * 100:>11.2f}%{row['avg_saved_ms']:>10.3f}")
+
+    with open(args.report, 'w') as f:
+        json.dump({'rows': len(X), 'latency': latency, 'thresholds': rows}, f, indent=2)
+    print(f"\n✅ Report saved to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+Kompresja wytrenowanego Random Forest pod budżet rozmiaru / opóźnienia.
+
+modele.py dopuszcza max_depth=None, więc zapisany las potrafi ważyć setki MB,
+co spowalnia joblib.load, zwiększa RSS workerów i czas przejścia drzew.
+Skrypt przeszukuje kombinacje limitu głębokości, liczby drzew i poziomu
+kompresji pliku, mierzy każdego kandydata na zbiorze testowym (tym samym
+podziale co w modele.py) i zapisuje najmniejszy artefakt, którego dokładność
+spadła nie więcej niż o zadaną tolerancję. Czas joblib.load i p99 jednego wiersza
+są ograniczeniami (--max-load-ms, --max-p99-ms), a przy równym rozmiarze rozstrzygają remis.
+
+Przykład:
+    python compress_forest.py --max-accuracy-loss 0.005 --depths 10,14,20,none --trees 50,100,200
+"""
+import argparse
+import copy
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import joblib
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+
+from modele import load_training_data, measure_latency
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Kompresja Random Forest pod budżet rozmiaru i opóźnienia")
+    parser.add_argument('--csv', default='diabetes.csv', help="Plik ze zbiorem BRFSS")
+    parser.add_argument('--model', default='../diabetes_model_rf.pkl', help="Aktualny model Random Forest")
+    parser.add_argument('--output', default='../diabetes_model_rf.pkl', help="Gdzie zapisać wybrany artefakt")
+    parser.add_argument('--depths', default='8,12,16,20,none', help="Limity max_depth (none = bez limitu)")
+    parser.add_argument('--trees', default='25,50,100,200', help="Liczby drzew do sprawdzenia")
+    parser.add_argument('--compress', default='0,3', help="Poziomy kompresji joblib (0 = brak)")
+    parser.add_argument('--max-accuracy-loss', type=float, default=0.005,
+                        help="Dopuszczalny spadek dokładności względem aktualnego modelu (np. 0.005 = 0.5 p.p.)")
+    parser.add_argument('--max-p99-ms', type=float, default=None, help="Opcjonalny limit p99 dla jednego wiersza")
+    parser.add_argument('--max-load-ms', type=float, default=None, help="Opcjonalny limit czasu joblib.load")
+    parser.add_argument('--max-size-mb', type=float, default=None, help="Opcjonalny limit rozmiaru pliku")
+    parser.add_argument('--report', default='compression_report.json', help="Ścieżka raportu JSON")
+    parser.add_argument('--dry-run', action='store_true', help="Tylko raport, bez zapisu artefaktu")
+    return parser.parse_args()
+
+
+def _parse_depth(value):
+    return None if value.lower() == 'none' else int(value)
+
+
+def subset_forest(forest, n_trees):
+    """Las złożony z pierwszych n_trees drzew - bez ponownego trenowania."""
+    subset = copy.copy(forest)
+    subset.estimators_ = forest.estimators_[:n_trees]
+    subset.n_estimators = n_trees
+    return subset
+
+
+def measure_artifact(model, compress, repeats=3):
+    """Rozmiar pliku i mediana czasu joblib.load dla danego poziomu kompresji."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'model.pkl')
+        joblib.dump(model, path, compress=compress)
+        size = os.path.getsize(path)
+
+        load_times = []
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            joblib.load(path)
+            load_times.append(time.perf_counter() - start_time)
+
+    return size, float(np.median(load_times)) * 1000
+
+
+def evaluate_candidate(name, model, compress, X_test, y_test):
+    size, load_ms = measure_artifact(model, compress)
+    accuracy = float(accuracy_score(y_test, model.predict(X_test)))
+    latency = measure_latency(model, X_test)
+
+    return {
+        'name': name,
+        'max_depth': model.max_depth,
+        'n_estimators': len(model.estimators_),
+        'compress': compress,
+        'size_bytes': size,
+        'load_ms': round(load_ms, 2),
+        'single_row_p50_ms': latency['single_row_p50_ms'],
+        'single_row_p99_ms': latency['single_row_p99_ms'],
+        'accuracy': round(accuracy, 4)
+    }
+
+
+def print_table(candidates):
+    header = f"{'candidate':<28}{'size MB':>10}{'load ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'accuracy':>10}  ok"
+    print("\n" + header)
+    print("-" * len(header))
+    for c in candidates:
+        print(f"{c['name']:<28}{c['size_bytes'] / 1024 ** 2:>10.2f}{c['load_ms']:>10.2f}"
+              f"{c['single_row_p50_ms']:>10.3f}{c['single_row_p99_ms']:>10.3f}{c['accuracy']:>10.4f}"
+              f"  {'✅' if c['within_budget'] else '-'}")
+
+
+def main():
+    args = parse_args()
+
+    X, y = load_training_data(args.csv)
+
+    # Ten sam podział co w modele.py - porównujemy na identycznym zbiorze testowym
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X_scaled, y, test_size=0.2, random_state=42, stratify=y
+    )
+
+    baseline = joblib.load(args.model)
+    depths = [_parse_depth(d) for d in args.depths.split(',')]
+    tree_counts = sorted(int(t) for t in args.trees.split(','))
+    compress_levels = [int(c) for c in args.compress.split(',')]
+
+    candidates = []
+    models = {}
+    for compress in compress_levels:
+        name = f"baseline,z={compress}"
+        models[name] = baseline
+        candidates.append(evaluate_candidate(name, baseline, compress, X_test, y_test))
+
+    baseline_accuracy = candidates[0]['accuracy']
+    print(f"Baseline: {candidates[0]['n_estimators']} trees, max_depth={baseline.max_depth}, "
+          f"accuracy {baseline_accuracy}")
+
+    params = baseline.get_params()
+    for depth in depths:
+        # Jeden las o maksymalnej liczbie drzew na limit głębokości - mniejsze liczby to jego prefiksy
+        print(f"Training forest with max_depth={depth}...")
+        forest = RandomForestClassifier(**{**params, 'max_depth': depth, 'n_estimators': tree_counts[-1]})
+        forest.fit(X_train, y_train)
+
+        for n_trees in tree_counts:
+            model = subset_forest(forest, n_trees)
+            for compress in compress_levels:
+                name = f"depth={depth},trees={n_trees},z={compress}"
+                models[name] = model
+                candidates.append(evaluate_candidate(name, model, compress, X_test, y_test))
+
+    for c in candidates:
+        c['within_budget'] = (
+            c['accuracy'] >= baseline_accuracy - args.max_accuracy_loss
+            and (args.max_p99_ms is None or c['single_row_p99_ms'] <= args.max_p99_ms)
+            and (args.max_load_ms is None or c['load_ms'] <= args.max_load_ms)
+            and (args.max_size_mb is None or c['size_bytes'] <= args.max_size_mb * 1024 ** 2)
+        )
+
+    print_table(candidates)
+
+    eligible = [c for c in candidates if c['within_budget']]
+    best = min(eligible, key=lambda c: (c['size_bytes'], c['load_ms'], c['single_row_p99_ms'])) if eligible else None
+
+    with open(args.report, 'w') as f:
+        json.dump({
+            'baseline_accuracy': baseline_accuracy,
+            'max_accuracy_loss': args.max_accuracy_loss,
+            'max_p99_ms': args.max_p99_ms,
+            'max_load_ms': args.max_load_ms,
+            'max_size_mb': args.max_size_mb,
+            'selected': best['name'] if best else None,
+            'candidates': candidates
+        }, f, indent=2)
+
+    if best is None:
+        print("\n❌ No candidate meets the budget.")
+        return
+
+    print(f"\nSelected: {best['name']} ({round(best['size_bytes'] / 1024 ** 2, 2)} MB, "
+          f"load {best['load_ms']} ms, accuracy {best['accuracy']})")
+    if not args.dry_run:
+        joblib.dump(models[best['name']], args.output, compress=best['compress'])
+        print(f"✅ Saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
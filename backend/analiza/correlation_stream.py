@@ -0,0 +1,167 @@
+"""
+Strumieniowa (out-of-core) analiza korelacji cech - wersja "korelacja kolumn.py" bez wczytywania całości do pamięci.
+
+Pliki CSV czytane są fragmentami, a dla każdego fragmentu liczone są średnie i macierz
+współmomentów, łączone stabilnym numerycznie wzorem Chana (bez sumowania kwadratów surowych
+wartości). Każdy plik (np. kolejny rok BRFSS) przetwarzany jest w osobnym procesie,
+a częściowe wyniki są na końcu scalane. Pamięć zależy tylko od liczby kolumn i rozmiaru fragmentu.
+
+Wynik trafia do pliku JSON (macierz korelacji, statystyki cech, korelacja z Diabetes_012)
+oraz do obrazka z mapą ciepła - skrypt nie wymaga środowiska graficznego.
+
+Przykład:
+    python correlation_stream.py brfss_2015.csv brfss_2016.csv --output korelacja.json --heatmap korelacja.png
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+from dataset import iter_csv_chunks
+
+TARGET_COLUMN = 'Diabetes_012'
+
+
+class MomentAccumulator:
+    """Liczność, średnie, macierz współmomentów oraz min/max - wszystko scalane przyrostowo."""
+
+    def __init__(self, columns):
+        k = len(columns)
+        self.columns = list(columns)
+        self.n = 0
+        self.mean = np.zeros(k)
+        self.comoment = np.zeros((k, k))
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+
+    def update(self, values):
+        """Dodaje fragment danych (macierz wiersze x kolumny)."""
+        values = values[~np.isnan(values).any(axis=1)]
+        if len(values) == 0:
+            return self
+
+        chunk = MomentAccumulator(self.columns)
+        chunk.n = len(values)
+        chunk.mean = values.mean(axis=0)
+        centered = values - chunk.mean
+        chunk.comoment = centered.T @ centered
+        chunk.min = values.min(axis=0)
+        chunk.max = values.max(axis=0)
+
+        return self.merge(chunk)
+
+    def merge(self, other):
+        """Scalanie dwóch częściowych wyników (wzór Chana i in.)."""
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+
+        n = self.n + other.n
+        delta = other.mean - self.mean
+
+        self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * (self.n * other.n / n)
+        self.mean = self.mean + delta * (other.n / n)
+        self.n = n
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        return self
+
+    def correlation(self):
+        std = np.sqrt(np.diag(self.comoment))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.comoment / np.outer(std, std)
+
+    def feature_stats(self):
+        variance = np.diag(self.comoment) / max(self.n - 1, 1)
+        return {
+            col: {
+                'count': int(self.n),
+                'mean': float(self.mean[i]),
+                'std': float(np.sqrt(variance[i])),
+                'min': float(self.min[i]),
+                'max': float(self.max[i])
+            }
+            for i, col in enumerate(self.columns)
+        }
+
+
+def accumulate_file(path, columns, chunksize):
+    """Przetwarza jeden plik CSV fragmentami - uruchamiane w osobnym procesie."""
+    acc = MomentAccumulator(columns)
+    for chunk in iter_csv_chunks([path], columns, chunksize):
+        acc.update(chunk.to_numpy(dtype=float))
+    return acc
+
+
+def analyze(paths, columns=None, chunksize=50000, workers=None):
+    """Zwraca scalony MomentAccumulator dla wszystkich plików."""
+    if columns is None:
+        columns = list(pd.read_csv(paths[0], nrows=0).columns)
+
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        partials = list(pool.map(accumulate_file, paths, [columns] * len(paths), [chunksize] * len(paths)))
+
+    return reduce(lambda a, b: a.merge(b), partials, MomentAccumulator(columns))
+
+
+def save_heatmap(correlation_df, path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.figure(figsize=(20, 16))
+    sns.heatmap(correlation_df, annot=True, fmt=".2f", cmap='coolwarm', linewidths=0.5)
+    plt.title('mapa korelacji')
+    plt.savefig(path, bbox_inches='tight')
+    plt.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Strumieniowa analiza korelacji cech")
+    parser.add_argument('csv', nargs='*', default=['diabetes.csv'], help="Jeden lub więcej plików CSV")
+    parser.add_argument('--columns', default=None, help="Kolumny do analizy (domyślnie wszystkie z pierwszego pliku)")
+    parser.add_argument('--chunksize', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=None, help="Liczba procesów (domyślnie liczba rdzeni)")
+    parser.add_argument('--output', default='korelacja.json')
+    parser.add_argument('--heatmap', default='korelacja.png')
+    args = parser.parse_args()
+
+    columns = args.columns.split(',') if args.columns else None
+    acc = analyze(args.csv, columns=columns, chunksize=args.chunksize, workers=args.workers)
+
+    correlation_df = pd.DataFrame(acc.correlation(), index=acc.columns, columns=acc.columns)
+
+    result = {
+        'files': args.csv,
+        'rows': int(acc.n),
+        'features': acc.feature_stats(),
+        'correlation': {
+            col: {other: (None if np.isnan(v) else float(v)) for other, v in row.items()}
+            for col, row in correlation_df.to_dict(orient='index').items()
+        }
+    }
+
+    if TARGET_COLUMN in correlation_df.columns:
+        target_correlation = correlation_df[TARGET_COLUMN].sort_values(ascending=False)
+        result['target_correlation'] = {k: float(v) for k, v in target_correlation.dropna().items()}
+
+        print("korelacja")
+        print(target_correlation)
+
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    save_heatmap(correlation_df, args.heatmap)
+    print(f"✅ Saved {args.output} and {args.heatmap} ({acc.n} rows)")
+
+
+if __name__ == '__main__':
+    main()
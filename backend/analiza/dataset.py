@@ -0,0 +1,189 @@
+"""
+Wspólne ładowanie zbioru diabetes.csv dla skryptów w katalogu analiza.
+
+Przy pierwszym uruchomieniu CSV jest konwertowany do kolumnowego cache'u
+(jeden plik .npy na kolumnę, najmniejszy pasujący typ - int8 dla cech binarnych
+i kategorycznych, float32 dla cech ułamkowych, jeśli przechowuje je dokładnie,
+a w przeciwnym razie float64). Cache jest bezstratny i kluczowany hashem pliku
+źródłowego (oraz wersją formatu), więc zmiana CSV automatycznie tworzy nowy cache.
+Kolejne uruchomienia wczytują kolumny przez mmap, bez parsowania tekstu.
+
+Porównanie czasu i pamięci:
+    python dataset.py --benchmark diabetes.csv
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
+# Typy całkowite od najmniejszego - wybieramy pierwszy, który mieści zakres kolumny
+_INT_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+
+# Wersja formatu cache'u - zmiana doboru typów unieważnia stare katalogi
+CACHE_FORMAT = 2
+
+
+def file_hash(path, block_size=1 << 20):
+    """SHA-256 pliku czytanego blokami."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def minimal_dtype(values):
+    """Najmniejszy typ, który bezstratnie przechowa kolumnę."""
+    if len(values) and np.all(np.isfinite(values)) and np.all(np.mod(values, 1) == 0):
+        for dtype in _INT_DTYPES:
+            info = np.iinfo(dtype)
+            if values.min() >= info.min and values.max() <= info.max:
+                return dtype
+    if np.array_equal(values.astype(np.float32).astype(values.dtype), values, equal_nan=True):
+        return np.float32
+    return np.float64
+
+
+def _cache_path(csv_path):
+    return os.path.join(CACHE_DIR, f'{file_hash(csv_path)}-v{CACHE_FORMAT}')
+
+
+def build_cache(csv_path, cache_path):
+    """Konwertuje CSV do katalogu z plikami .npy (po jednym na kolumnę) i plikiem meta.json."""
+    df = pd.read_csv(csv_path)
+
+    tmp_path = cache_path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        values = df[col].to_numpy()
+        dtype = minimal_dtype(values.astype(float))
+        np.save(os.path.join(tmp_path, f'{i}.npy'), values.astype(dtype))
+        columns.append({'name': col, 'file': f'{i}.npy', 'dtype': np.dtype(dtype).name})
+
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump({'source': os.path.abspath(csv_path), 'rows': len(df), 'columns': columns}, f, indent=2)
+
+    # Zamiana katalogu na końcu, żeby przerwana konwersja nie zostawiła połowicznego cache'u
+    os.replace(tmp_path, cache_path)
+
+
+def load_dataset(csv_path='diabetes.csv', columns=None, use_cache=True):
+    """
+    Zwraca DataFrame ze zbioru. Kolumny są tablicami mmap z cache'u,
+    więc niewykorzystane dane nie są w ogóle wczytywane do pamięci.
+    """
+    if not use_cache:
+        df = pd.read_csv(csv_path)
+        return df[columns] if columns else df
+
+    cache_path = _cache_path(csv_path)
+    if not os.path.exists(os.path.join(cache_path, 'meta.json')):
+        print(f"Building compact cache for {csv_path}...")
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        build_cache(csv_path, cache_path)
+
+    with open(os.path.join(cache_path, 'meta.json')) as f:
+        meta = json.load(f)
+
+    files = {col['name']: col['file'] for col in meta['columns']}
+    wanted = columns or list(files)
+
+    missing = [col for col in wanted if col not in files]
+    if missing:
+        raise KeyError(f"Columns not found in {csv_path}: {missing}")
+
+    return pd.DataFrame(
+        {col: np.load(os.path.join(cache_path, files[col]), mmap_mode='r') for col in wanted},
+        copy=False
+    )
+
+
+def iter_csv_chunks(paths, columns, chunksize):
+    """Kolejne fragmenty jednego lub wielu plików CSV - dla zbiorów, które nie mieszczą się w pamięci."""
+    for path in paths:
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize):
+            yield chunk[columns]
+
+
+def _rss_mb():
+    """Bieżące RSS procesu (MB) - obejmuje też strony zmapowane przez mmap, których nie widzi tracemalloc."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except OSError:
+        # Poza Linuksem tylko szczytowe RSS procesu (ru_maxrss: KB na Linuksie, bajty na macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _measure(label, csv_path, use_cache):
+    """Pomiar w świeżym procesie (spawn) - RSS nie jest zaniżony pamięcią zwolnioną przez poprzedni pomiar."""
+    loader = lambda: load_dataset(csv_path, use_cache=use_cache)  # noqa: E731
+    rss_before = _rss_mb()
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    df = loader()
+    # Dotykamy wszystkich danych, żeby mmap nie zaniżał wyniku
+    checksum = sum(float(df[col].sum()) for col in df.columns)
+    duration = time.perf_counter() - start_time
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_growth = _rss_mb() - rss_before
+
+    result = {
+        'label': label,
+        'load_time_s': round(duration, 4),
+        # Sterta Pythona (tracemalloc) - bez stron mmap
+        'python_heap_peak_mb': round(peak / 1024 ** 2, 2),
+        # Przyrost RSS po dotknięciu wszystkich kolumn - z mmap włącznie
+        'rss_growth_mb': round(rss_growth, 2),
+        'frame_memory_mb': round(df.memory_usage(deep=True).sum() / 1024 ** 2, 2),
+        'checksum': checksum
+    }
+    return result
+
+
+def benchmark(csv_path):
+    """Porównuje czas wczytania i zużycie pamięci (sterta Pythona i RSS): read_csv vs cache."""
+    print(f"Benchmark for {csv_path}:")
+    # Pierwsze wywołanie buduje cache (jeśli go brak), nie wliczamy go do pomiaru
+    load_dataset(csv_path)
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for label, use_cache in (('read_csv', False), ('cache', True)):
+        with context.Pool(1) as pool:
+            result = pool.apply(_measure, (label, csv_path, use_cache))
+        print(f"  {label:<12} time: {result['load_time_s']}s  python heap peak: {result['python_heap_peak_mb']} MB  "
+              f"RSS growth: {result['rss_growth_mb']} MB  frame: {result['frame_memory_mb']} MB")
+        results.append(result)
+    if results[0]['checksum'] != results[1]['checksum']:
+        print("  Warning: cached data differs from CSV!")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Kompaktowy cache zbioru diabetes.csv")
+    parser.add_argument('csv', nargs='?', default='diabetes.csv')
+    parser.add_argument('--benchmark', action='store_true', help="Porównaj read_csv z wczytaniem z cache'u")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.csv)
+    else:
+        df = load_dataset(args.csv)
+        print(df.dtypes)
@@ -0,0 +1,157 @@
+"""
+Trenowanie przyrostowe (out-of-core) dla zbiorów większych niż pamięć maszyny, np. połączonych lat BRFSS.
+
+Dane czytane są fragmentami w dwóch przebiegach:
+  1. StandardScaler.partial_fit + zliczenie klas (do wag 'balanced'),
+  2. SGDClassifier(loss='log_loss').partial_fit - odpowiednik regresji logistycznej.
+Stan jest co N fragmentów zapisywany do checkpointu, więc przerwany trening można wznowić (--resume).
+
+Wynikowe pliki mają ten sam kontrakt co modele.py (diabetes_model_logistic.pkl,
+scaler.pkl, model_columns.pkl), więc ml_service.load_model wczytuje je bez zmian.
+
+Przykład:
+    python incremental.py brfss_2015.csv brfss_2016.csv brfss_2017.csv --epochs 3 --checkpoint-every 20
+"""
+import argparse
+import os
+
+import numpy as np
+import joblib
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import accuracy_score
+
+from dataset import iter_csv_chunks, CACHE_DIR
+from modele import required_columns, MODEL_FILES
+
+TARGET_COLUMN = 'Diabetes_012'
+FEATURE_COLUMNS = [col for col in required_columns if col != TARGET_COLUMN]
+CLASSES = np.array([0, 1, 2])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Przyrostowe trenowanie modelu logistycznego na fragmentach CSV")
+    parser.add_argument('csv', nargs='+', help="Jeden lub więcej plików CSV w formacie BRFSS")
+    parser.add_argument('--output-dir', default='..', help="Katalog docelowy plików pkl")
+    parser.add_argument('--chunksize', type=int, default=50000)
+    parser.add_argument('--epochs', type=int, default=3, help="Liczba przejść SGD przez dane")
+    parser.add_argument('--checkpoint', default=os.path.join(CACHE_DIR, 'incremental_checkpoint.pkl'))
+    parser.add_argument('--checkpoint-every', type=int, default=10, help="Co ile fragmentów zapisywać stan")
+    parser.add_argument('--resume', action='store_true', help="Wznów od ostatniego checkpointu")
+    parser.add_argument('--keep-scaler', action='store_true',
+                        help="Użyj istniejącego scaler.pkl (zgodność z obecnymi modelami drzewiastymi)")
+    parser.add_argument('--eval-csv', default=None, help="Opcjonalny plik do oceny dokładności")
+    return parser.parse_args()
+
+
+def save_checkpoint(path, state):
+    """Zapis atomowy - przerwanie w trakcie zapisu nie psuje poprzedniego checkpointu."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    joblib.dump(state, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+def new_state(args):
+    return {
+        'files': [os.path.abspath(p) for p in args.csv],
+        'phase': 'scaler',
+        'epoch': 0,
+        'chunk': 0,
+        'scaler': StandardScaler(),
+        'class_counts': np.zeros(len(CLASSES)),
+        'model': SGDClassifier(loss='log_loss', alpha=1e-4, random_state=42)
+    }
+
+
+def class_weights(class_counts):
+    """Wagi jak class_weight='balanced' w LogisticRegression (partial_fit ich nie obsługuje)."""
+    counts = np.maximum(class_counts, 1)
+    return counts.sum() / (len(CLASSES) * counts)
+
+
+def run_phase(state, args, step):
+    """Przechodzi przez wszystkie fragmenty, pomijając te zapisane już w checkpoincie."""
+    rng = np.random.default_rng(42 + state['epoch'])
+
+    for i, chunk in enumerate(iter_csv_chunks(args.csv, required_columns, args.chunksize)):
+        if i < state['chunk']:
+            continue
+
+        chunk = chunk.dropna()
+        step(chunk[FEATURE_COLUMNS], chunk[TARGET_COLUMN].to_numpy(dtype=int), rng)
+        state['chunk'] = i + 1
+
+        if state['chunk'] % args.checkpoint_every == 0:
+            save_checkpoint(args.checkpoint, state)
+            print(f"  checkpoint: {state['phase']} epoch {state['epoch']} chunk {state['chunk']}")
+
+    state['chunk'] = 0
+
+
+def main():
+    args = parse_args()
+
+    state = None
+    if args.resume and os.path.exists(args.checkpoint):
+        state = joblib.load(args.checkpoint)
+        if state['files'] != [os.path.abspath(p) for p in args.csv]:
+            print("❌ Checkpoint was created for different files - start without --resume.")
+            exit()
+        print(f"Resuming from {state['phase']} epoch {state['epoch']} chunk {state['chunk']}")
+    if state is None:
+        state = new_state(args)
+
+    # --- 1. SKALER + LICZNOŚĆ KLAS ---
+    if state['phase'] == 'scaler':
+        if args.keep_scaler:
+            state['scaler'] = joblib.load(os.path.join(args.output_dir, 'scaler.pkl'))
+
+        def fit_scaler(X, y, rng):
+            if not args.keep_scaler:
+                state['scaler'].partial_fit(X)
+            state['class_counts'] += np.bincount(y, minlength=len(CLASSES))[:len(CLASSES)]
+
+        print("Pass 1: scaler and class counts...")
+        run_phase(state, args, fit_scaler)
+        state['phase'] = 'sgd'
+        save_checkpoint(args.checkpoint, state)
+
+    # --- 2. SGD (regresja logistyczna) ---
+    weights = class_weights(state['class_counts'])
+    print(f"Class counts: {state['class_counts'].astype(int).tolist()}, weights: {np.round(weights, 3).tolist()}")
+
+    def fit_sgd(X, y, rng):
+        X_scaled = state['scaler'].transform(X)
+        order = rng.permutation(len(y))
+        state['model'].partial_fit(X_scaled[order], y[order], classes=CLASSES, sample_weight=weights[y[order]])
+
+    while state['epoch'] < args.epochs:
+        print(f"Pass 2: SGD epoch {state['epoch'] + 1}/{args.epochs}...")
+        run_phase(state, args, fit_sgd)
+        state['epoch'] += 1
+        save_checkpoint(args.checkpoint, state)
+
+    # --- 3. OCENA (opcjonalna, również fragmentami) ---
+    if args.eval_csv:
+        correct = total = 0
+        for chunk in iter_csv_chunks([args.eval_csv], required_columns, args.chunksize):
+            chunk = chunk.dropna()
+            y_pred = state['model'].predict(state['scaler'].transform(chunk[FEATURE_COLUMNS]))
+            correct += accuracy_score(chunk[TARGET_COLUMN], y_pred, normalize=False)
+            total += len(chunk)
+        print(f"  Accuracy: {round(correct / max(total, 1) * 100, 2)}%")
+
+    # --- 4. ZAPISYWANIE ---
+    joblib.dump(state['model'], os.path.join(args.output_dir, MODEL_FILES['logistic']))
+    joblib.dump(state['scaler'], os.path.join(args.output_dir, 'scaler.pkl'))
+    joblib.dump(FEATURE_COLUMNS, os.path.join(args.output_dir, 'model_columns.pkl'))
+
+    if not args.keep_scaler:
+        print("⚠️ scaler.pkl was refitted - retrain the tree models with modele.py or use --keep-scaler.")
+
+    os.remove(args.checkpoint)
+    print("✅ SUCCESS! Incremental logistic model and scaler saved.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,9 @@
-import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
+from dataset import load_dataset
 
 file_path = 'diabetes.csv'
-df = pd.read_csv(file_path)
+df = load_dataset(file_path)
 
 correlation_matrix = df.corr()
 
@@ -1,94 +1,335 @@
-import pandas as pd
+"""
+Trenowanie modeli produkcyjnych (regresja logistyczna, Random Forest, Gradient Boosting).
+
+Przykłady:
+    python modele.py                                  # ustawienia domyślne
+    python modele.py --booster hist --search halving  # szybszy booster i strojenie metodą successive halving
+    python modele.py --retune --report raport.json    # wymuś ponowne strojenie RF
+
+Niezależne modele trenowane są równolegle (osobne procesy), najlepsze parametry
+Random Forest są cache'owane per zbiór danych, a na końcu zapisywany jest raport
+JSON z czasem trenowania, opóźnieniem predykcji, rozmiarem artefaktu i dokładnością.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
 import numpy as np
 import joblib
-import time
-from sklearn.model_selection import train_test_split, RandomizedSearchCV
+from joblib import Parallel, delayed
+from sklearn.model_selection import train_test_split, RandomizedSearchCV, ParameterGrid
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 (włącza HalvingRandomSearchCV)
+from sklearn.model_selection import HalvingRandomSearchCV
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, HistGradientBoostingClassifier
 from sklearn.metrics import accuracy_score, classification_report
 
-# --- 1. ŁADOWANIE I PRZYGOTOWANIE DANYCH ---
-try:
-    df = pd.read_csv('diabetes.csv')
-    print("✅ Dataset loaded successfully.")
-except FileNotFoundError:
-    print("❌ Error: 'diabetes.csv' not found.")
-    exit()
+from dataset import load_dataset, file_hash, CACHE_DIR
 
 required_columns = [
     'Diabetes_012', 'HighBP', 'HighChol', 'Stroke', 'DiffWalk', 'PhysActivity',
     'GenHlth', 'PhysHlth', 'MentHlth', 'Sex', 'HeartDiseaseorAttack',
     'Smoker', 'Fruits', 'Veggies', 'HvyAlcoholConsump', 'BMI', 'Age'
 ]
-df = df[required_columns]
-
-X = df.drop(columns=['Diabetes_012'])
-y = df['Diabetes_012']
-
-# --- 2. SKALOWANIE (Standardization) ---
-# Wyrównujemy skale wszystkich cech (np. BMI vs Age)
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-# Podział z zachowaniem proporcji klas (stratify=y)
-X_train, X_test, y_train, y_test = train_test_split(
-    X_scaled, y, test_size=0.2, random_state=42, stratify=y
-)
 
-print(f"Training on {X_train.shape[0]} records.")
-
-# --- 3. DEFINICJA I OPTYMALIZACJA MODELI ---
-
-# A. Regresja Logistyczna z wagami klas
-lr = LogisticRegression(max_iter=2000, class_weight='balanced', random_state=42)
-
-# B. Random Forest z automatycznym doborem parametrów
-rf_base = RandomForestClassifier(class_weight='balanced', random_state=42)
+# Siatka parametrów Random Forest przeszukiwana podczas strojenia
 rf_params = {
     'n_estimators': [100, 200],
     'max_depth': [10, 20, None],
     'min_samples_leaf': [2, 4]
 }
-rf_search = RandomizedSearchCV(rf_base, rf_params, n_iter=5, cv=3, random_state=42, n_jobs=-1)
-print("Searching for best Random Forest parameters...")
-rf_search.fit(X_train, y_train)
-best_rf = rf_search.best_estimator_
-
-# C. Gradient Boosting (klasyczny Boosting)
-gb = GradientBoostingClassifier(n_estimators=100, learning_rate=0.1, max_depth=5, random_state=42)
-
-# --- 4. TRENOWANIE I EVALUACJA ---
-models_to_train = {
-    "Logistic Regression": lr,
-    "Random Forest": best_rf,
-    "Gradient Boosting": gb
+
+# Nazwy plików artefaktów - zgodne z ml_service.load_model
+MODEL_FILES = {
+    'logistic': 'diabetes_model_logistic.pkl',
+    'random_forest': 'diabetes_model_rf.pkl',
+    'gradient_boost': 'diabetes_model_gb.pkl'
 }
 
-results = {}
 
-for name, model in models_to_train.items():
-    print(f"\nTraining {name}...")
-    start_time = time.time()
+# Kwantyle ryzyka populacji referencyjnej (ml_service dołącza na ich podstawie percentyl)
+PERCENTILES_FILE = 'risk_percentiles.pkl'
+
+# Rozkłady cech zbioru treningowego - referencja monitoringu dryfu (services/drift_service.py)
+PROFILE_FILE = 'input_profile.pkl'
+CONTINUOUS_FEATURES = ('BMI',)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Trenowanie modeli ryzyka cukrzycy")
+    parser.add_argument('--csv', default='diabetes.csv', help="Plik ze zbiorem BRFSS")
+    parser.add_argument('--output-dir', default='..', help="Katalog docelowy plików pkl")
+    parser.add_argument('--booster', choices=['gb', 'hist'], default='gb',
+                        help="gb = GradientBoostingClassifier, hist = HistGradientBoostingClassifier (wielowątkowy)")
+    parser.add_argument('--search', choices=['random', 'halving'], default='random',
+                        help="Strojenie RF: RandomizedSearchCV albo HalvingRandomSearchCV")
+    parser.add_argument('--retune', action='store_true', help="Ignoruj zapisane parametry RF i stroj od nowa")
+    parser.add_argument('--jobs', type=int, default=-1, help="Liczba rdzeni do wykorzystania (-1 = wszystkie)")
+    parser.add_argument('--report', default='training_report.json', help="Ścieżka raportu JSON")
+    parser.add_argument('--percentile-quantiles', type=int, default=1000,
+                        help="Liczba kwantyli ryzyka zapisywanych na warstwę wiek/płeć")
+    return parser.parse_args()
+
+
+# --- 1. ŁADOWANIE I PRZYGOTOWANIE DANYCH ---
+def load_training_data(csv_path):
+    try:
+        # Kompaktowy cache (int8 / float32, mmap) zamiast parsowania CSV przy każdym uruchomieniu
+        df = load_dataset(csv_path, columns=required_columns)
+        print("✅ Dataset loaded successfully.")
+    except FileNotFoundError:
+        print(f"❌ Error: '{csv_path}' not found.")
+        exit()
+
+    X = df.drop(columns=['Diabetes_012'])
+    y = np.asarray(df['Diabetes_012'])
+    return X, y
+
+
+# --- 3. STROJENIE RANDOM FOREST (z cache'em parametrów) ---
+def _rf_params_cache_path(data_hash, search):
+    key = json.dumps({'data': data_hash, 'search': search, 'grid': rf_params}, sort_keys=True, default=str)
+    return os.path.join(CACHE_DIR, f"rf_params_{hashlib.sha256(key.encode()).hexdigest()[:16]}.json")
+
+
+def tune_random_forest(X_train, y_train, data_hash, search, retune, n_jobs):
+    """Zwraca najlepsze parametry RF - z cache'u, jeśli zbiór i siatka się nie zmieniły."""
+    cache_path = _rf_params_cache_path(data_hash, search)
+
+    if not retune and os.path.exists(cache_path):
+        with open(cache_path) as f:
+            best_params = json.load(f)
+        print(f"Using cached Random Forest parameters: {best_params}")
+        return best_params, 0.0
+
+    rf_base = RandomForestClassifier(class_weight='balanced', random_state=42)
+    if search == 'halving':
+        # Successive halving: wielu kandydatów na małej próbce, tylko najlepsi dostają pełne dane
+        rf_search = HalvingRandomSearchCV(
+            rf_base, rf_params, n_candidates=len(ParameterGrid(rf_params)),
+            factor=3, cv=3, random_state=42, n_jobs=n_jobs
+        )
+    else:
+        rf_search = RandomizedSearchCV(rf_base, rf_params, n_iter=5, cv=3, random_state=42, n_jobs=n_jobs)
+
+    print(f"Searching for best Random Forest parameters ({search})...")
+    start_time = time.perf_counter()
+    rf_search.fit(X_train, y_train)
+    search_time = time.perf_counter() - start_time
 
+    best_params = rf_search.best_params_
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(cache_path, 'w') as f:
+        json.dump(best_params, f)
+
+    print(f"  Best parameters: {best_params} ({round(search_time, 2)}s)")
+    return best_params, search_time
+
+
+# --- 4. DEFINICJA MODELI ---
+def build_models(best_rf_params, booster, n_jobs):
+    # A. Regresja Logistyczna z wagami klas
+    lr = LogisticRegression(max_iter=2000, class_weight='balanced', random_state=42)
+
+    # B. Random Forest z parametrami ze strojenia
+    rf = RandomForestClassifier(class_weight='balanced', random_state=42, n_jobs=n_jobs, **best_rf_params)
+
+    # C. Boosting - klasyczny (jednowątkowy) albo histogramowy (wielowątkowy, wielokrotnie szybszy)
+    if booster == 'hist':
+        gb = HistGradientBoostingClassifier(max_iter=100, learning_rate=0.1, max_depth=5, random_state=42)
+    else:
+        gb = GradientBoostingClassifier(n_estimators=100, learning_rate=0.1, max_depth=5, random_state=42)
+
+    return {
+        'logistic': lr,
+        'random_forest': rf,
+        'gradient_boost': gb
+    }
+
+
+def _fit(name, model, X_train, y_train):
+    """Trenuje jeden model - uruchamiane w osobnym procesie."""
+    start_time = time.perf_counter()
     model.fit(X_train, y_train)
-    y_pred = model.predict(X_test)
+    return name, model, time.perf_counter() - start_time
 
+
+def train_models(models, X_train, y_train):
+    """Trenuje niezależne modele równolegle (po jednym procesie na model)."""
+    print(f"\nTraining {len(models)} models in parallel...")
+    results = Parallel(n_jobs=len(models), backend='loky')(
+        delayed(_fit)(name, model, X_train, y_train) for name, model in models.items()
+    )
+    return {name: (model, fit_time) for name, model, fit_time in results}
+
+
+# --- 5. EWALUACJA ---
+def measure_latency(model, X_test, samples=200):
+    """Mediana opóźnienia predict_proba dla pojedynczego wiersza oraz średni koszt wiersza w batchu."""
+    rows = X_test[:samples]
+    timings = []
+    for i in range(len(rows)):
+        start_time = time.perf_counter()
+        model.predict_proba(rows[i:i + 1])
+        timings.append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    model.predict_proba(X_test)
+    batch_time = time.perf_counter() - start_time
+
+    return {
+        'single_row_p50_ms': round(float(np.percentile(timings, 50)) * 1000, 4),
+        'single_row_p99_ms': round(float(np.percentile(timings, 99)) * 1000, 4),
+        'batch_per_row_us': round(batch_time / len(X_test) * 1e6, 4)
+    }
+
+
+def build_risk_percentiles(models, X, X_scaled, quantiles=1000, min_stratum_size=200):
+    """Posortowane kwantyle ryzyka (klasa 1 + 2, w %) populacji referencyjnej per model i per warstwa wiek/płeć.
+
+    Zamiast wszystkich wyników zapisujemy `quantiles` wartości na warstwę (float32), więc plik
+    ma kilkaset KB, a wyszukanie percentyla to jedno np.searchsorted.
+    """
+    levels = (np.arange(quantiles) + 0.5) / quantiles
+    age = X['Age'].to_numpy(dtype=int)
+    sex = X['Sex'].to_numpy(dtype=int)
+
+    table = {}
+    for name, model in models.items():
+        probabilities = model.predict_proba(X_scaled)
+        risk = (probabilities[:, 1] + probabilities[:, 2]) * 100
+
+        strata = {'all': np.quantile(risk, levels).astype(np.float32)}
+        for age_value in np.unique(age):
+            for sex_value in np.unique(sex):
+                mask = (age == age_value) & (sex == sex_value)
+                if mask.sum() >= min_stratum_size:
+                    strata[(int(age_value), int(sex_value))] = np.quantile(risk[mask], levels).astype(np.float32)
+        table[name] = strata
+
+    return {'quantiles': quantiles, 'models': table}
+
+
+def build_input_profile(X, alpha=0.01):
+    """Histogramy cech do wykrywania dryfu: wartości dla cech dyskretnych, kubełki logarytmiczne dla ciągłych.
+
+    Kubełek cechy ciągłej to floor(log(x) / log(gamma)), gamma = (1 + alpha) / (1 - alpha) - kwantyle
+    odtworzone z kubełków mają błąd względny najwyżej alpha. Układ kubełków jest zapisany w profilu,
+    więc szkice w aplikacji używają dokładnie tych samych granic.
+    """
+    features = {}
+    for column in X.columns:
+        values = X[column].to_numpy(dtype=float)
+
+        if column in CONTINUOUS_FEATURES:
+            gamma = (1 + alpha) / (1 - alpha)
+            indices = np.floor(np.log(np.clip(values, 1e-9, None)) / np.log(gamma)).astype(int)
+            min_index, max_index = int(indices.min()), int(indices.max())
+            counts = np.bincount(indices - min_index, minlength=max_index - min_index + 1)
+            features[column] = {
+                'kind': 'log', 'gamma': gamma, 'min_index': min_index, 'max_index': max_index,
+                'counts': counts.tolist()
+            }
+        else:
+            unique, counts = np.unique(values, return_counts=True)
+            features[column] = {'kind': 'discrete', 'values': unique.tolist(), 'counts': counts.tolist()}
+
+    return {'rows': int(len(X)), 'features': features}
+
+
+def evaluate(name, model, X_test, y_test):
+    y_pred = model.predict(X_test)
     acc = accuracy_score(y_test, y_pred)
-    results[name] = acc
 
+    print(f"\n{name}")
     print(f"  Accuracy: {round(acc * 100, 2)}%")
     print(classification_report(y_test, y_pred))
-    print(f"  Time: {round(time.time() - start_time, 2)}s")
 
-# --- 5. ZAPISYWANIE ---
-print("\nSaving models and scaler...")
+    return {'accuracy': round(float(acc), 4), **measure_latency(model, X_test)}
+
+
+def main():
+    args = parse_args()
+    total_start = time.perf_counter()
+
+    X, y = load_training_data(args.csv)
+
+    # --- 2. SKALOWANIE (Standardization) ---
+    # Wyrównujemy skale wszystkich cech (np. BMI vs Age)
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    # Podział z zachowaniem proporcji klas (stratify=y)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X_scaled, y, test_size=0.2, random_state=42, stratify=y
+    )
+
+    print(f"Training on {X_train.shape[0]} records.")
+
+    best_rf_params, search_time = tune_random_forest(
+        X_train, y_train, file_hash(args.csv), args.search, args.retune, args.jobs
+    )
+
+    # Rdzenie dzielimy między równolegle trenowane modele, żeby nie przeciążyć procesora
+    cpu_count = os.cpu_count() or 1
+    jobs = cpu_count if args.jobs == -1 else args.jobs
+    rf_jobs = max(1, jobs - 2)
+
+    models = build_models(best_rf_params, args.booster, rf_jobs)
+    trained = train_models(models, X_train, y_train)
+
+    # --- 6. ZAPISYWANIE I RAPORT ---
+    print("\nSaving models and scaler...")
+    report = {
+        'dataset': os.path.abspath(args.csv),
+        'rows': int(len(y)),
+        'booster': args.booster,
+        'search': args.search,
+        'rf_params': best_rf_params,
+        'rf_search_time_s': round(search_time, 2),
+        'models': {}
+    }
+
+    for name, (model, fit_time) in trained.items():
+        # n_jobs służy tylko do treningu - przy predykcji pojedynczego wiersza /predict
+        # dispatch wątków joblib kosztuje więcej niż samo liczenie drzew
+        if hasattr(model, 'n_jobs'):
+            model.n_jobs = None
+        metrics = evaluate(name, model, X_test, y_test)
+
+        artifact_path = os.path.join(args.output_dir, MODEL_FILES[name])
+        joblib.dump(model, artifact_path)
+
+        report['models'][name] = {
+            'estimator': type(model).__name__,
+            'fit_time_s': round(fit_time, 2),
+            'artifact_size_bytes': os.path.getsize(artifact_path),
+            **metrics
+        }
+
+    joblib.dump(scaler, os.path.join(args.output_dir, 'scaler.pkl'))
+    joblib.dump(X.columns.tolist(), os.path.join(args.output_dir, 'model_columns.pkl'))
+
+    # --- 7. PERCENTYLE RYZYKA (cały zbiór jako populacja referencyjna) ---
+    print("Scoring reference population for risk percentiles...")
+    percentiles = build_risk_percentiles(
+        {name: model for name, (model, _) in trained.items()}, X, X_scaled, args.percentile_quantiles
+    )
+    joblib.dump(percentiles, os.path.join(args.output_dir, PERCENTILES_FILE))
+    report['risk_percentile_strata'] = {name: len(strata) for name, strata in percentiles['models'].items()}
+
+    # --- 8. PROFIL CECH (referencja dla monitoringu dryfu) ---
+    joblib.dump(build_input_profile(X), os.path.join(args.output_dir, PROFILE_FILE))
+
+    report['total_time_s'] = round(time.perf_counter() - total_start, 2)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
 
-joblib.dump(lr, '../diabetes_model_logistic.pkl')
-joblib.dump(best_rf, '../diabetes_model_rf.pkl')
-joblib.dump(gb, '../diabetes_model_gb.pkl')
+    print(f"✅ SUCCESS! All 3 models and scaler saved. Report: {args.report}")
 
-joblib.dump(scaler, '../scaler.pkl')
-joblib.dump(X.columns.tolist(), '../model_columns.pkl')
 
-print("✅ SUCCESS! All 3 models and scaler saved.")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
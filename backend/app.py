@@ -1,12 +1,14 @@
-from flask import Flask
+import click
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from async_app import AsyncFlask
 from config import Config
 from models import db
-from routes import auth_bp, api_bp 
-from ml_service import load_model
+from routes import auth_bp, api_bp, ops_bp
+from ml_service import load_model, configure_model_pool, configure_llm, configure_stage_priors, warm_up_explainers
+from services import metrics_service, profiling_service, retention_service, drift_service, shadow_service
 
-app = Flask(__name__)
+app = AsyncFlask(__name__)
 app.config.from_object(Config)
 
 db.init_app(app)
@@ -16,14 +18,50 @@ CORS(app, resources={r"/*": {"origins": "http://localhost:5173"}})
 
 app.register_blueprint(auth_bp)
 app.register_blueprint(api_bp)
+app.register_blueprint(ops_bp)
 
+metrics_service.init_app(app)
+profiling_service.init_app(app)
 
-with app.app_context():
+if app.config['PREDICT_PARALLEL_MODELS']:
+    configure_model_pool(app.config['MODEL_POOL_SIZE'])
+
+configure_llm(app.config['LLM_THREADS'], app.config['LLM_TIMEOUT_S'])
+configure_stage_priors(shap=app.config['SHAP_PRIOR_MS'] / 1000, llm=app.config['LLM_PRIOR_MS'] / 1000)
+drift_service.configure_windows(app.config['DRIFT_WINDOW_S'], app.config['DRIFT_WINDOWS'],
+                                app.config['DRIFT_SKETCH_TTL_S'])
+
+
+def init_background_workers(app):
+    """Wątki w tle (retencja historii, zapis szkiców dryfu, modele shadow) - tylko w procesie serwera,
+    nie przy imporcie (CLI, testy, skrypty)."""
+    retention_service.start_worker(app)
+    drift_service.start_persister(app)
+    shadow_service.start(app)
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Tworzy brakujące tabele (flask --app app init-db)."""
     db.create_all()
+    print("✅ Database tables created.")
+
+
+@app.cli.command('compact-history')
+@click.option('--days', type=int, default=None, help="Okres pełnej historii (domyślnie HISTORY_RETENTION_DAYS)")
+@click.option('--chunk', type=int, default=None, help="Rekordów na transakcję (domyślnie HISTORY_RETENTION_CHUNK)")
+def compact_history_command(days, chunk):
+    """Kompaktuje starą historię do dziennych agregatów (flask --app app compact-history)."""
+    summary = retention_service.compact_history(days, chunk)
+    print(f"✅ Compacted {summary['rows']} history records in {summary['chunks']} chunks: {summary}")
+
 
 if __name__ == '__main__':
     with app.app_context():
+        db.create_all()
         print("🔄 Loading ML Model...")
         load_model()
+        warm_up_explainers()
+    init_background_workers(app)
 
     app.run(debug=True, use_reloader=False, port=5000)
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+Punkt wejścia ASGI: uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+Widoki asynchroniczne (/predict, /chat) wykonywane są bezpośrednio na pętli zdarzeń serwera
+(AsyncFlask.dispatch_native), a Gemini wołany jest klientem aio - żądanie czekające na LLM
+nie zajmuje wątku, więc jeden worker obsługuje naraz dużo więcej takich żądań niż
+ASGI_SYNC_THREADS. Modele, SHAP i baza idą w tych widokach do wątków roboczych (offload).
+Pozostałe endpointy wykonywane są zwykłym app.wsgi_app na puli ASGI_SYNC_THREADS wątków.
+
+WsgiToAsgi z asgiref wykonuje wszystkie żądania na jednym wątku, stąd własna pula.
+Lifespan przy starcie workera ładuje modele i eksplainery SHAP oraz uruchamia wątki w tle.
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app, init_background_workers
+from ml_service import load_model, warm_up_explainers
+from services.ai_service import NATIVE_ASYNC_KEY
+
+_sync_executor = ThreadPoolExecutor(max_workers=app.config['ASGI_SYNC_THREADS'], thread_name_prefix='asgi-sync')
+
+
+async def _read_body(receive):
+    body = io.BytesIO()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body.write(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    body.seek(0)
+    return body
+
+
+def _build_environ(scope, body):
+    """Środowisko WSGI (PEP 3333) z zakresu żądania ASGI."""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1')
+        if name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        elif name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        value = value.decode('latin1')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _run_wsgi(environ):
+    """Zwykłe wywołanie aplikacji WSGI (w wątku puli) - zwraca (status, nagłówki, treść)."""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = headers
+
+    iterable = app(environ, start_response)
+    try:
+        body = b''.join(iterable)
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+    return started['status'], started['headers'], body
+
+
+async def _send_response(send, status, headers, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _http(scope, receive, send):
+    environ = _build_environ(scope, await _read_body(receive))
+
+    if not app.is_native_request(environ):
+        loop = asyncio.get_running_loop()
+        status, headers, body = await loop.run_in_executor(_sync_executor, _run_wsgi, environ)
+        await _send_response(send, status, headers, body)
+        return
+
+    # Znacznik dla ensure_sync, run_llm (klient aio Gemini) i profilowania
+    environ[NATIVE_ASYNC_KEY] = True
+    response = await app.dispatch_native(environ)
+    try:
+        await _send_response(send, response.status_code, response.headers.items(), b''.join(response.iter_encoded()))
+    finally:
+        response.close()
+
+
+async def _lifespan(receive, send):
+    """Przy starcie workera ładujemy modele i eksplainery SHAP i uruchamiamy wątki w tle (jak app.py w __main__)."""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            def startup():
+                with app.app_context():
+                    load_model()
+                    warm_up_explainers()
+
+            try:
+                await asyncio.to_thread(startup)
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            init_background_workers(app)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+    elif scope['type'] == 'http':
+        await _http(scope, receive, send)
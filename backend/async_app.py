@@ -0,0 +1,91 @@
+"""
+Klasa aplikacji Flask z obsługą widoków async def dopasowaną do tego projektu.
+
+Pod serwerem ASGI (asgi.py) żądania do widoków async def obsługuje dispatch_native: cały
+cykl Flask (sygnały, before/after_request, obsługa błędów, teardown) przebiega na pętli
+zdarzeń serwera, a korutyna widoku jest na niej oczekiwana - czekanie na Gemini nie zajmuje
+wątku. Pod WSGI Flask wykonuje korutynę jak dotąd, przez asgiref w osobnym wątku z pętlą.
+
+Profilowane żądanie (services/profiling_service) uruchamia korutynę w bieżącym wątku, żeby
+profiler widział modele, SHAP i bazę (offload wykonuje je wtedy inline).
+"""
+import asyncio
+import inspect
+import sys
+from functools import wraps
+
+from flask import Flask
+from flask.signals import request_started
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+
+from services.ai_service import native_async
+from services.profiling_service import profiling_active
+
+
+class AsyncFlask(Flask):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._native_endpoints = {}
+
+    def ensure_sync(self, func):
+        if inspect.iscoroutinefunction(func):
+            if profiling_active():
+                @wraps(func)
+                def run_in_current_thread(*args, **kwargs):
+                    return asyncio.run(func(*args, **kwargs))
+                return run_in_current_thread
+            if native_async():
+                # Korutynę oczekuje dispatch_native na pętli serwera
+                return func
+        return super().ensure_sync(func)
+
+    def is_native_request(self, environ):
+        """Czy żądanie trafia do widoku async def (także opakowanego, np. jwt_required)."""
+        try:
+            endpoint, _ = self.url_map.bind_to_environ(environ).match()
+        except (HTTPException, RequestRedirect):
+            return False
+
+        if endpoint not in self._native_endpoints:
+            view = self.view_functions.get(endpoint)
+            self._native_endpoints[endpoint] = view is not None and inspect.iscoroutinefunction(inspect.unwrap(view))
+        return self._native_endpoints[endpoint]
+
+    async def full_dispatch_native(self):
+        """full_dispatch_request, w którym wynik widoku (korutyna) jest oczekiwany."""
+        self._got_first_request = True
+
+        try:
+            request_started.send(self, _async_wrapper=self.ensure_sync)
+            rv = self.preprocess_request()
+            if rv is None:
+                rv = self.dispatch_request()
+                if inspect.isawaitable(rv):
+                    rv = await rv
+        except Exception as e:
+            rv = self.handle_user_exception(e)
+        return self.finalize_request(rv)
+
+    async def dispatch_native(self, environ):
+        """wsgi_app dla pętli zdarzeń - zwraca obiekt Response zamiast wywoływać start_response.
+
+        environ musi mieć ustawiony znacznik NATIVE_ASYNC_KEY (ai_service), inaczej ensure_sync
+        opakuje korutynę jak pod WSGI.
+        """
+        ctx = self.request_context(environ)
+        error = None
+        try:
+            try:
+                ctx.push()
+                return await self.full_dispatch_native()
+            except Exception as e:
+                error = e
+                return self.handle_exception(e)
+            except:  # noqa: E722
+                error = sys.exc_info()[1]
+                raise
+        finally:
+            if error is not None and self.should_ignore_error(error):
+                error = None
+            ctx.pop(error)
@@ -1,3 +1,4 @@
+from flask import current_app
 from models import db, User
 from flask_jwt_extended import create_access_token, create_refresh_token
 
@@ -35,4 +36,13 @@ def login_user(email, password):
             "email": user.email
         }
     
-    return None
\ No newline at end of file
+    return None
+
+
+def is_admin(user_id):
+    """Sprawdza, czy użytkownik jest na liście ADMIN_EMAILS."""
+    if not user_id:
+        return False
+
+    user = db.session.get(User, int(user_id))
+    return bool(user) and user.email in current_app.config.get('ADMIN_EMAILS', [])
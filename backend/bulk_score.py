@@ -0,0 +1,154 @@
+"""
+Masowe ocenianie plików CSV (np. pełny diabetes.csv z BRFSS, ~250 tys. wierszy) modelami produkcyjnymi.
+
+Plik czytany jest fragmentami, fragmenty oceniane są równolegle w puli procesów
+(każdy proces wczytuje modele tylko raz), a wyniki dopisywane są na bieżąco
+do pliku CSV lub Parquet - zużycie pamięci nie zależy od rozmiaru wejścia.
+
+Przykład:
+    python bulk_score.py analiza/diabetes.csv wyniki.parquet --workers 8 --shap --keep Diabetes_012
+"""
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import ml_service
+
+
+def _init_worker(models_dir):
+    """Inicjalizacja procesu roboczego - modele wczytywane są raz na proces."""
+    from threadpoolctl import threadpool_limits
+
+    # Równoległość zapewnia pula procesów, więc BLAS/OpenMP w każdym procesie ograniczamy do 1 wątku
+    global _thread_limits
+    _thread_limits = threadpool_limits(limits=1)
+
+    ml_service.load_model(models_dir)
+
+
+def _score_chunk(chunk, with_shap, keep_columns):
+    """Ocenia jeden fragment pliku wszystkimi modelami i zwraca ramkę wyników."""
+    input_df = ml_service.build_feature_frame(chunk)
+    input_scaled_df = ml_service.scale_features(input_df)
+
+    result = pd.DataFrame({'row': chunk.index}, index=chunk.index)
+    for col in keep_columns:
+        result[col] = chunk[col]
+
+    for model_name, probabilities in ml_service.score_frame(input_scaled_df).items():
+        classes = ml_service._models[model_name].classes_
+        result[f'{model_name}_prediction'] = classes[np.argmax(probabilities, axis=1)].astype(int)
+        for i in range(probabilities.shape[1]):
+            result[f'{model_name}_class_{i}'] = np.round(probabilities[:, i] * 100, 2)
+        # Ryzyko (klasa 1 + 2) - tak samo jak w predict_diabetes_risk
+        result[f'{model_name}_diabetes_risk'] = np.round(probabilities[:, 1:].sum(axis=1) * 100, 2)
+
+    if with_shap:
+        factors = ml_service.shap_top_factors(input_scaled_df)
+        result['shap_factors'] = [';'.join(row_factors) for row_factors in factors]
+
+    return result
+
+
+class _ResultWriter:
+    """Dopisuje kolejne fragmenty wyników do pliku CSV albo Parquet."""
+
+    def __init__(self, path, output_format):
+        self.path = path
+        self.output_format = output_format
+        self._parquet_writer = None
+        self._header_written = False
+
+    def write(self, result):
+        if self.output_format == 'parquet':
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise SystemExit("Zapis do Parquet wymaga biblioteki pyarrow (pip install pyarrow)")
+
+            table = pa.Table.from_pandas(result, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            result.to_csv(self.path, mode='a' if self._header_written else 'w',
+                          header=not self._header_written, index=False)
+            self._header_written = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def bulk_score(input_path, output_path, workers=None, chunksize=20000, with_shap=False,
+               keep_columns=(), models_dir=None, output_format=None):
+    """Ocenia cały plik i zwraca (liczba wierszy, czas w sekundach)."""
+    workers = workers or os.cpu_count() or 1
+    if output_format is None:
+        output_format = 'parquet' if output_path.endswith('.parquet') else 'csv'
+
+    writer = _ResultWriter(output_path, output_format)
+    # Ograniczona liczba fragmentów w locie = ograniczona pamięć
+    max_in_flight = workers * 2
+    pending = deque()
+    total_rows = 0
+
+    start_time = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(models_dir,)) as pool:
+        try:
+            for chunk in pd.read_csv(input_path, chunksize=chunksize):
+                pending.append(pool.submit(_score_chunk, chunk, with_shap, list(keep_columns)))
+
+                # Wyniki zapisujemy w kolejności wejścia
+                while len(pending) >= max_in_flight:
+                    result = pending.popleft().result()
+                    writer.write(result)
+                    total_rows += len(result)
+
+            while pending:
+                result = pending.popleft().result()
+                writer.write(result)
+                total_rows += len(result)
+        finally:
+            writer.close()
+
+    return total_rows, time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Masowe ocenianie pliku CSV modelami produkcyjnymi.")
+    parser.add_argument('input', help="Plik CSV z kolumnami w formacie BRFSS (np. diabetes.csv)")
+    parser.add_argument('output', help="Plik wynikowy (.csv lub .parquet)")
+    parser.add_argument('--workers', type=int, default=None, help="Liczba procesów (domyślnie liczba rdzeni)")
+    parser.add_argument('--chunksize', type=int, default=20000, help="Liczba wierszy w jednym fragmencie")
+    parser.add_argument('--shap', action='store_true', help="Dodaj główne czynniki ryzyka wg SHAP (wolniejsze)")
+    parser.add_argument('--keep', default='', help="Kolumny wejściowe przepisywane do wyniku, np. Diabetes_012")
+    parser.add_argument('--models-dir', default=None, help="Katalog z plikami pkl (domyślnie katalog backend)")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default=None, help="Wymuszenie formatu wyjścia")
+    args = parser.parse_args()
+
+    keep_columns = [col for col in args.keep.split(',') if col]
+
+    total_rows, duration = bulk_score(
+        args.input, args.output,
+        workers=args.workers,
+        chunksize=args.chunksize,
+        with_shap=args.shap,
+        keep_columns=keep_columns,
+        models_dir=args.models_dir,
+        output_format=args.format
+    )
+
+    print(f"Scored {total_rows} rows in {round(duration, 2)}s "
+          f"({round(total_rows / duration if duration else 0, 1)} rows/sec)")
+
+
+if __name__ == '__main__':
+    main()
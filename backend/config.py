@@ -15,6 +15,69 @@ class Config:
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Administratorzy (dostęp do /profiles) - lista e-maili oddzielona przecinkami
+    ADMIN_EMAILS = [e.strip() for e in os.getenv('ADMIN_EMAILS', '').split(',') if e.strip()]
+
+    # Profilowanie żądań na żądanie: nagłówek X-Profile: 1 od administratora lub losowa próbka
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '0') == '1'
+    PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+    PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(os.path.dirname(__file__), 'profiles'))
+
+    # Termin odpowiedzi /predict (ms, 0 = bez limitu) - po nim SHAP i Gemini są pomijane; nagłówek X-Deadline-Ms go nadpisuje
+    PREDICT_DEADLINE_MS = int(os.getenv('PREDICT_DEADLINE_MS', '8000'))
+    # Zakładany czas SHAP / Gemini (ms), zanim metryki zbiorą pierwsze pomiary - bez tego pierwsze wolne wywołania ignorują termin
+    SHAP_PRIOR_MS = int(os.getenv('SHAP_PRIOR_MS', '500'))
+    LLM_PRIOR_MS = int(os.getenv('LLM_PRIOR_MS', '5000'))
+
+    # Pula wątków Gemini i limit czasu jednego zapytania (s, 0 = bez limitu) - zawieszone wywołania zwalniają wątki
+    LLM_THREADS = int(os.getenv('LLM_THREADS', '8'))
+    LLM_TIMEOUT_S = float(os.getenv('LLM_TIMEOUT_S', '20'))
+
+    # Kaskada modeli: drzewa liczone tylko, gdy margines pewności modelu logistycznego < CASCADE_MARGIN
+    # (próg dobierz raportem analiza/cascade_report.py)
+    PREDICT_CASCADE = os.getenv('PREDICT_CASCADE', '0') == '1'
+    CASCADE_MARGIN = float(os.getenv('CASCADE_MARGIN', '0.5'))
+
+    # Równoległe liczenie modeli w jednym żądaniu na wspólnej puli wątków (n_jobs modeli ustawiane na 1)
+    PREDICT_PARALLEL_MODELS = os.getenv('PREDICT_PARALLEL_MODELS', '0') == '1'
+    MODEL_POOL_SIZE = int(os.getenv('MODEL_POOL_SIZE', '3'))
+
+    # Limit scenariuszy w jednym żądaniu /what-if
+    WHAT_IF_MAX_SCENARIOS = int(os.getenv('WHAT_IF_MAX_SCENARIOS', '500'))
+
+    # Retencja historii: rekordy starsze niż N dni -> dzienne agregaty (HistoryDaily) + archiwum porad
+    HISTORY_RETENTION_DAYS = int(os.getenv('HISTORY_RETENTION_DAYS', '180'))
+    HISTORY_RETENTION_CHUNK = int(os.getenv('HISTORY_RETENTION_CHUNK', '1000'))
+    # 0 = tylko ręcznie (flask --app app compact-history)
+    HISTORY_RETENTION_INTERVAL_S = int(os.getenv('HISTORY_RETENTION_INTERVAL_S', '0'))
+    HISTORY_RETENTION_PAUSE_S = float(os.getenv('HISTORY_RETENTION_PAUSE_S', '0.05'))
+    HISTORY_ARCHIVE_DIR = os.getenv('HISTORY_ARCHIVE_DIR', os.path.join(os.path.dirname(__file__), 'archive'))
+
+    # Monitoring dryfu wejść /predict: szkice per worker zapisywane do DRIFT_DIR (0 = bez zapisu)
+    DRIFT_DIR = os.getenv('DRIFT_DIR', os.path.join(os.path.dirname(__file__), 'drift'))
+    DRIFT_PERSIST_INTERVAL_S = int(os.getenv('DRIFT_PERSIST_INTERVAL_S', '60'))
+    DRIFT_MIN_OBSERVATIONS = int(os.getenv('DRIFT_MIN_OBSERVATIONS', '100'))
+    # Raport obejmuje ostatnie DRIFT_WINDOWS okien po DRIFT_WINDOW_S sekund (domyślnie doba godzinnych)
+    DRIFT_WINDOW_S = int(os.getenv('DRIFT_WINDOW_S', '3600'))
+    DRIFT_WINDOWS = int(os.getenv('DRIFT_WINDOWS', '24'))
+    # Pliki workerów niezapisywane dłużej niż tyle sekund (martwe procesy, stare pody) są pomijane i usuwane
+    DRIFT_SKETCH_TTL_S = int(os.getenv('DRIFT_SKETCH_TTL_S', '900'))
+
+    # Modele-kandydaci liczone w tle na próbce ruchu /predict (pusty katalog = wyłączone)
+    SHADOW_MODELS_DIR = os.getenv('SHADOW_MODELS_DIR', '')
+    SHADOW_SAMPLE_RATE = float(os.getenv('SHADOW_SAMPLE_RATE', '0.1'))
+    SHADOW_QUEUE_SIZE = int(os.getenv('SHADOW_QUEUE_SIZE', '100'))
+    # Maksymalny udział jednego rdzenia CPU dla wątku shadow
+    SHADOW_CPU_SHARE = float(os.getenv('SHADOW_CPU_SHARE', '0.1'))
+
+    # Czat: budżet promptu w tokenach (~4 znaki/token) - starsze wiadomości są streszczane
+    CHAT_CONTEXT_TOKENS = int(os.getenv('CHAT_CONTEXT_TOKENS', '3000'))
+    CHAT_SUMMARY_TOKENS = int(os.getenv('CHAT_SUMMARY_TOKENS', '400'))
+    CHAT_MAX_MESSAGE_CHARS = int(os.getenv('CHAT_MAX_MESSAGE_CHARS', '4000'))
+
+    # Serwer ASGI (asgi.py): wątki dla endpointów synchronicznych; widoki async działają na pętli
+    ASGI_SYNC_THREADS = int(os.getenv('ASGI_SYNC_THREADS', '16'))
+
 
     """
     podczas uruchamiania apki stwórz plik .env w folderze /backend i wklej to do środka
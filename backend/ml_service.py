@@ -1,26 +1,20 @@
+import asyncio
+import copy
 import joblib
-import pandas as pd
 import os
 import json
+import threading
+import time
+from contextlib import contextmanager
 import numpy as np
-import shap
-from sklearn.linear_model import LinearRegression
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
-try:
-    import google.generativeai as genai
+from services.metrics_service import span, inc, record, stage_mean
+from services.ai_service import get_genai, run_llm, configure_llm_timeout, llm_request_options
+from services import drift_service, shadow_service
 
-    GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-
-    if GEMINI_API_KEY:
-        genai.configure(api_key=GEMINI_API_KEY)
-        _gemini_available = True
-    else:
-        _gemini_available = False
-        print("Nie ma API key w .env!")
-
-except ImportError:
-    _gemini_available = False
-    print("Nie ma biblioteki do LLM!")
+# Ciężkie biblioteki (pandas, sklearn, shap, google.generativeai) importowane są dopiero przy
+# pierwszym użyciu - import modułu (workery, CLI, testy) nie kosztuje kilku sekund.
 
 # --- ZMIENNE GLOBALNE ---
 _models = {
@@ -30,27 +24,76 @@ _models = {
 }
 _model_columns = None
 _scaler = None # Miejsce na wczytany StandardScaler
-_shap_explainer = None
+_explainers = {} # Explainery SHAP modeli drzewiastych (warm_up_explainers / pierwsze użycie)
+_explainer_lock = threading.Lock()
+_risk_percentiles = None # Kwantyle ryzyka populacji referencyjnej (analiza/modele.py)
+
+# Wspólna pula wątków do równoległego liczenia modeli w jednym żądaniu (configure_model_pool)
+_model_executor = None
+_pool_n_jobs = {}  # model -> n_jobs sprzed włączenia puli (przywracane po jej wyłączeniu)
+_blas_controller = None  # ThreadpoolController - limit BLAS tylko na czas liczenia (single_thread_blas)
+_blas_limit = None
+_blas_users = 0
+_blas_lock = threading.Lock()
+
+# Wątki dla wywołań Gemini - przy przekroczonym terminie odpowiedź jest porzucana, a wątek kończy w tle
+# (najpóźniej po limicie czasu klienta Gemini, configure_llm)
+_llm_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='llm')
+
+# Zakładany czas etapu (s), dopóki metryki nie mają jeszcze pomiarów (configure_stage_priors)
+_stage_priors = {'shap': 0.5, 'llm': 5.0}
+
+# Trwające obliczenia (single-flight): klucz -> Future z wynikiem dla oczekujących żądań
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+# Wartości domyślne cech - używane, gdy pole nie zostało przesłane
+FEATURE_DEFAULTS = {
+    'HighBP': 0,
+    'HighChol': 0,
+    'CholCheck': 1,
+    'BMI': 25.0,
+    'Smoker': 0,
+    'Stroke': 0,
+    'HeartDiseaseorAttack': 0,
+    'PhysActivity': 0,
+    'Fruits': 0,
+    'Veggies': 0,
+    'HvyAlcoholConsump': 0,
+    'AnyHealthcare': 1,
+    'NoDocbcCost': 0,
+    'GenHlth': 3,
+    'MentHlth': 0,
+    'PhysHlth': 0,
+    'DiffWalk': 0,
+    'Sex': 0,
+    'Age': 1
+}
+
 
+# Pliki artefaktów (zgodne z analiza/modele.py) - także dla modeli-kandydatów (shadow_service)
+MODEL_FILES = {
+    'logistic': 'diabetes_model_logistic.pkl',
+    'random_forest': 'diabetes_model_rf.pkl',
+    'gradient_boost': 'diabetes_model_gb.pkl'
+}
 
-def load_model():
-    """Wczytuje modele, kolumny oraz skaler z plików pkl."""
-    global _models, _model_columns, _scaler
 
-    base_path = os.path.dirname(__file__)
+def load_model(base_path=None):
+    """Wczytuje modele, kolumny oraz skaler z plików pkl (domyślnie z katalogu backend)."""
+    global _models, _model_columns, _scaler, _risk_percentiles
 
-    # Ścieżki do plików
-    model_files = {
-        'logistic': 'diabetes_model_logistic.pkl',
-        'random_forest': 'diabetes_model_rf.pkl',
-        'gradient_boost': 'diabetes_model_gb.pkl'
-    }
+    if base_path is None:
+        base_path = os.path.dirname(__file__)
 
     columns_path = os.path.join(base_path, 'model_columns.pkl')
     scaler_path = os.path.join(base_path, 'scaler.pkl') # Ścieżka do skalera
 
+    # Explainery odnoszą się do poprzednich modeli
+    _explainers.clear()
+
     loaded_count = 0
-    for key, filename in model_files.items():
+    for key, filename in MODEL_FILES.items():
         model_path = os.path.join(base_path, filename)
         if os.path.exists(model_path):
             _models[key] = joblib.load(model_path)
@@ -72,34 +115,193 @@ def load_model():
     else:
         print(f"Error: model_columns.pkl not found at: {columns_path}")
 
+    percentiles_path = os.path.join(base_path, 'risk_percentiles.pkl')
+    if os.path.exists(percentiles_path):
+        _risk_percentiles = joblib.load(percentiles_path)
+        print("Risk percentiles loaded successfully.")
+
+    drift_service.load_reference(base_path)
+
     if loaded_count == 0:
         print("Error: No model files loaded!")
 
+    if _model_executor is not None:
+        _limit_model_jobs()
+
+
+def _limit_model_jobs():
+    """Jeden wątek na model (n_jobs) - równoległość zapewnia pula, nie sklearn."""
+    for model in _models.values():
+        if model is not None and getattr(model, 'n_jobs', 1) not in (None, 1):
+            _pool_n_jobs.setdefault(model, model.n_jobs)
+            model.n_jobs = 1
+
+
+def _restore_model_jobs():
+    for model, n_jobs in _pool_n_jobs.items():
+        model.n_jobs = n_jobs
+    _pool_n_jobs.clear()
+
+
+def _limit_openmp():
+    """Inicjalizator wątków puli - limit OpenMP dotyczy wątku, który go ustawia."""
+    from threadpoolctl import threadpool_limits
+
+    threadpool_limits(limits=1, user_api='openmp')
+
+
+@contextmanager
+def single_thread_blas():
+    """BLAS z jednym wątkiem, dopóki trwa choć jedno liczenie w puli lub w wątku shadow
+    (limit BLAS jest globalny dla procesu, więc liczony jest licznikiem użytkowników)."""
+    global _blas_controller, _blas_limit, _blas_users
 
-def get_shap_explanation(model, input_scaled_df):
-    """Oblicza wpływ cech na wynik przy użyciu SHAP na przeskalowanych danych."""
-    global _shap_explainer
+    with _blas_lock:
+        if _blas_users == 0:
+            if _blas_controller is None:
+                from threadpoolctl import ThreadpoolController
 
+                _blas_controller = ThreadpoolController()
+            _blas_limit = _blas_controller.limit(limits=1, user_api='blas')
+        _blas_users += 1
     try:
-        if _shap_explainer is None:
-            _shap_explainer = shap.TreeExplainer(model)
+        yield
+    finally:
+        with _blas_lock:
+            _blas_users -= 1
+            if _blas_users == 0:
+                _blas_limit.restore_original_limits()
+                _blas_limit = None
+
+
+def configure_model_pool(size):
+    """Tworzy (size > 0) lub wyłącza (size = 0) pulę wątków do równoległego liczenia modeli."""
+    global _model_executor
+
+    if _model_executor is not None:
+        _model_executor.shutdown(wait=True)
+        _model_executor = None
+        _restore_model_jobs()
+
+    if size > 0:
+        _model_executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='model', initializer=_limit_openmp)
+        _limit_model_jobs()
+
+
+def configure_llm(threads, timeout_s):
+    """Rozmiar puli wątków Gemini i limit czasu pojedynczego zapytania po stronie klienta."""
+    global _llm_executor
+
+    previous = _llm_executor
+    _llm_executor = ThreadPoolExecutor(max_workers=max(threads, 1), thread_name_prefix='llm')
+    previous.shutdown(wait=False)
+    configure_llm_timeout(timeout_s)
+
+
+def configure_stage_priors(**priors):
+    """Zakładane czasy etapów (s) dla _fits_budget przed pierwszym pomiarem, np. shap=0.5, llm=5.0."""
+    _stage_priors.update(priors)
+
+
+def _tree_definition(tree, scale):
+    """Drzewo sklearn w formacie słownikowym SHAP (wartości przeskalowane np. o learning_rate)."""
+    structure = tree.tree_
+    return {
+        'children_left': structure.children_left.copy(),
+        'children_right': structure.children_right.copy(),
+        'children_default': structure.children_left.copy(),
+        'features': structure.feature.copy(),
+        'thresholds': structure.threshold.copy(),
+        'values': structure.value[:, 0, :] * scale,
+        'node_sample_weight': structure.weighted_n_node_samples.copy()
+    }
+
+
+def _build_explainer(model_name):
+    """TreeExplainer dla modelu drzewiastego.
+
+    Wieloklasowy GradientBoostingClassifier nie jest obsługiwany przez SHAP bezpośrednio,
+    więc dla każdej klasy budujemy explainer z jej drzew regresyjnych (surowe log-odds).
+    """
+    import shap
+
+    model = _models[model_name]
+    estimators = getattr(model, 'estimators_', None)
+    if isinstance(estimators, np.ndarray) and estimators.ndim == 2 and estimators.shape[1] > 1:
+        return [
+            shap.TreeExplainer({'trees': [_tree_definition(tree, model.learning_rate) for tree in estimators[:, k]]})
+            for k in range(estimators.shape[1])
+        ]
+    return shap.TreeExplainer(model)
+
 
-        # Używamy przeskalowanych danych do analizy
-        shap_values = _shap_explainer.shap_values(input_scaled_df, check_additivity=False)
+def _get_explainer(model_name):
+    """Explainer z pamięci albo zbudowany pod lockiem (jeden wątek buduje, reszta czeka)."""
+    explainer = _explainers.get(model_name)
+    if explainer is None:
+        with _explainer_lock:
+            explainer = _explainers.get(model_name)
+            if explainer is None:
+                explainer = _explainers[model_name] = _build_explainer(model_name)
+    return explainer
 
-        vals = shap_values[1] if isinstance(shap_values, list) and len(shap_values) > 1 else shap_values
 
-        if isinstance(vals, list):
-            vals = vals[-1]
+def warm_up_explainers():
+    """Buduje explainery wszystkich modeli drzewiastych przy starcie (zamiast przy pierwszym żądaniu)."""
+    for model_name, model in _models.items():
+        if model is not None and not hasattr(model, 'coef_'):
+            with span('explainer_build', model_name):
+                _get_explainer(model_name)
+            print(f"SHAP explainer ready for {model_name}")
 
-        values_array = vals[0] if len(vals.shape) > 1 else vals
+
+def risk_attributions(model_name, input_scaled_df):
+    """Wkład cech w ryzyko (klasy 1 + 2) dla każdego wiersza - macierz (wiersze x cechy).
+
+    Model liniowy: dokładny SHAP w postaci zamkniętej. StandardScaler centruje cechy (E[x] = 0),
+    więc wkład w logit klasy 0 względem średniego logitu to (coef_0 - mean(coef)) * x;
+    ryzyko to jego odwrotność. Modele drzewiaste: TreeExplainer (prawdopodobieństwa dla RF,
+    log-odds dla boostingu).
+    """
+    model = _models[model_name]
+    values = np.asarray(input_scaled_df, dtype=float)
+
+    if hasattr(model, 'coef_'):
+        coef = model.coef_
+        if coef.shape[0] == 1:
+            return values * coef[0]
+        return values * (coef.mean(axis=0) - coef[0])
+
+    explainer = _get_explainer(model_name)
+    if isinstance(explainer, list):
+        shap_values = np.stack([e.shap_values(values, check_additivity=False) for e in explainer], axis=-1)
+        tree_output = 'raw_value'
+    else:
+        shap_values = explainer.shap_values(input_scaled_df, check_additivity=False)
+        tree_output = explainer.model.tree_output
+
+    # Starsze wersje SHAP zwracają listę macierzy (po jednej na klasę), nowsze tablicę 3D
+    if isinstance(shap_values, list):
+        shap_values = np.stack(shap_values, axis=-1)
+    if shap_values.ndim == 2:
+        return shap_values
+
+    if tree_output == 'probability':
+        return shap_values[..., 1:].sum(axis=-1)
+    return shap_values.mean(axis=-1) - shap_values[..., 0]
+
+
+def get_shap_explanation(model_name, input_scaled_df, top_n=3):
+    """Czynniki podnoszące i obniżające ryzyko dla pierwszego wiersza wg wybranego modelu."""
+    try:
+        values_array = risk_attributions(model_name, input_scaled_df)[0]
         feature_names = input_scaled_df.columns.tolist()
 
         importance_dict = {name: float(val) for name, val in zip(feature_names, values_array)}
         sorted_features = sorted(importance_dict.items(), key=lambda item: item[1], reverse=True)
 
-        risk_factors = [f"{k}" for k, v in sorted_features[:3] if v > 0]
-        protective_factors = [f"{k}" for k, v in sorted_features[-3:] if v < 0]
+        risk_factors = [f"{k}" for k, v in sorted_features[:top_n] if v > 0]
+        protective_factors = [f"{k}" for k, v in sorted_features[-top_n:] if v < 0]
 
         return risk_factors, protective_factors
 
@@ -108,11 +310,118 @@ def get_shap_explanation(model, input_scaled_df):
         return [], []
 
 
-def generate_llm_advice(user_data, prediction_class, diabetes_risk, risk_factors):
-    """Generuje poradę tekstową przy użyciu Google Gemini."""
-    if not _gemini_available:
-        return None
+def map_input(data):
+    """Mapuje dane z formularza na wartości cech (z wartościami domyślnymi)."""
+    return {
+        col: float(data.get(col, default)) if col == 'BMI' else int(data.get(col, default))
+        for col, default in FEATURE_DEFAULTS.items()
+    }
+
+
+def build_feature_frame(raw_df):
+    """Wektorowa wersja map_input - zamienia wiele surowych wierszy (np. fragment CSV) na ramkę cech."""
+    import pandas as pd
+
+    features = {}
+    for col in _model_columns:
+        default = FEATURE_DEFAULTS.get(col, 0)
+        if col in raw_df.columns:
+            values = pd.to_numeric(raw_df[col], errors='coerce').fillna(default).to_numpy(dtype=float)
+        else:
+            values = np.full(len(raw_df), default, dtype=float)
+
+        # Tak jak int() w map_input - wszystko poza BMI to liczby całkowite
+        features[col] = values if col == 'BMI' else np.trunc(values)
+
+    return pd.DataFrame(features, index=raw_df.index, columns=_model_columns)
+
+
+def scale_features(input_df):
+    """Skaluje ramkę cech wczytanym StandardScalerem (jeśli jest dostępny)."""
+    import pandas as pd
+
+    if _scaler:
+        return pd.DataFrame(_scaler.transform(input_df), columns=_model_columns, index=input_df.index)
+    return input_df
+
+
+def score_frame(input_scaled_df):
+    """Ocenia wszystkie wiersze naraz każdym wczytanym modelem. Zwraca {model: macierz prawdopodobieństw}."""
+    scores = {}
+    for model_name, model in _models.items():
+        if model is not None:
+            scores[model_name] = model.predict_proba(input_scaled_df)
+    return scores
+
+
+def expand_sweep(feature, start, stop, step):
+    """Zmiany jednej cechy od start do stop (włącznie) co step, np. BMI 18-40 co 0.5."""
+    values = np.arange(start, stop + step / 2, step)
+    return [{feature: round(float(value), 4)} for value in values]
+
+
+def score_scenarios(base, scenarios):
+    """Ocenia profil bazowy i jego warianty jednym wektorowym przebiegiem na model.
+
+    scenarios to lista słowników z nadpisanymi polami. Zwraca (wynik, błąd) jak predict_diabetes_risk;
+    dla każdego wariantu podawane jest ryzyko i jego różnica względem profilu bazowego.
+    """
+    import pandas as pd
+
+    if all(model is None for model in _models.values()) or _scaler is None:
+        load_model()
+        if all(model is None for model in _models.values()):
+            return None, "All models failed to load"
+
+    with span('what_if'):
+        rows = [base] + [dict(base, **changes) for changes in scenarios]
+        input_scaled_df = scale_features(build_feature_frame(pd.DataFrame(rows)))
+        scores = score_frame(input_scaled_df)
+
+    risks = {name: np.round((proba[:, 1] + proba[:, 2]) * 100, 2) for name, proba in scores.items()}
+    classes = {name: proba.argmax(axis=1) for name, proba in scores.items()}
 
+    result = {
+        'base': {
+            name: {'prediction': int(classes[name][0]), 'diabetes_risk': float(risk[0])}
+            for name, risk in risks.items()
+        },
+        'scenarios': []
+    }
+    for i, changes in enumerate(scenarios, start=1):
+        result['scenarios'].append({
+            'changes': changes,
+            'models': {
+                name: {
+                    'prediction': int(classes[name][i]),
+                    'diabetes_risk': float(risk[i]),
+                    'delta': float(round(risk[i] - risk[0], 2))
+                }
+                for name, risk in risks.items()
+            }
+        })
+
+    return result, None
+
+
+def shap_top_factors(input_scaled_df, top_n=3, model_name='random_forest'):
+    """Dla każdego wiersza zwraca cechy najmocniej podnoszące ryzyko (klasy 1 + 2) wg wybranego modelu."""
+    if _models.get(model_name) is None:
+        return [[] for _ in range(len(input_scaled_df))]
+
+    risk_values = risk_attributions(model_name, input_scaled_df)
+
+    feature_names = np.array(input_scaled_df.columns)
+    order = np.argsort(-risk_values, axis=1)[:, :top_n]
+
+    return [
+        [str(feature_names[i]) for i in row_order if row_values[i] > 0]
+        for row_order, row_values in zip(order, risk_values)
+    ]
+
+
+def _advice_prompt(user_data, prediction_class, diabetes_risk, risk_factors):
+    """Prompt dla Gemini z danymi pacjenta i wynikiem modelu."""
     class_labels = {
         0: "brak cukrzycy (zdrowy)",
         1: "stan przedcukrzycowy",
@@ -141,18 +450,253 @@ def generate_llm_advice(user_data, prediction_class, diabetes_risk, risk_factors
     Napisz 3 krótkie, konkretne zalecenia dla tej osoby. 
     Bądź empatyczny, ale rzeczowy. Nie używaj wstępów, wypunktuj zalecenia.
     """
+    return prompt
+
+
+def generate_llm_advice(user_data, prediction_class, diabetes_risk, risk_factors):
+    """Generuje poradę tekstową przy użyciu Google Gemini."""
+    genai = get_genai()
+    if genai is None:
+        return None
+
+    try:
+        model = genai.GenerativeModel('models/gemini-flash-latest')
+        response = model.generate_content(
+            _advice_prompt(user_data, prediction_class, diabetes_risk, risk_factors),
+            request_options=llm_request_options()
+        )
+        return response.text
+    except Exception as e:
+        print(f"Gemini Error: {e}")
+        return None
+
+
+async def generate_llm_advice_async(user_data, prediction_class, diabetes_risk, risk_factors):
+    """Jak generate_llm_advice, ale bez blokowania wątku na czas odpowiedzi Gemini."""
+    genai = get_genai()
+    if genai is None:
+        return None
 
     try:
         model = genai.GenerativeModel('models/gemini-flash-latest')
-        response = model.generate_content(prompt)
+        response = await model.generate_content_async(
+            _advice_prompt(user_data, prediction_class, diabetes_risk, risk_factors),
+            request_options=llm_request_options()
+        )
         return response.text
     except Exception as e:
         print(f"Gemini Error: {e}")
         return None
 
 
-def predict_diabetes_risk(data, is_authenticated=False):
-    """Główna funkcja predykcji (Skalowanie -> ML -> SHAP -> Gemini)."""
+def _flight_key(stage, data, *params):
+    """Klucz single-flight: kanoniczny wektor cech (map_input) i parametry wpływające na wynik."""
+    return (stage, tuple(map_input(data).values())) + params
+
+
+def _join_flight(key):
+    """(future, leader) - pierwsze żądanie z danym kluczem liczy, kolejne czekają na jego Future."""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future, False
+        future = _inflight[key] = Future()
+        return future, True
+
+
+def _leave_flight(key):
+    with _inflight_lock:
+        _inflight.pop(key, None)
+
+
+async def _generate_advice(data, predictions, deadline):
+    """(tekst porady, None) albo (None, 'timeout') - wywołanie Gemini ograniczone terminem."""
+    primary = primary_result(predictions)
+    try:
+        llm_text = await asyncio.wait_for(
+            run_llm(generate_llm_advice_async, generate_llm_advice, data, primary['prediction'],
+                    primary['diabetes_risk'], predictions.get('shap_factors', [])),
+            timeout=_remaining(deadline)
+        )
+        return llm_text, None
+    except asyncio.TimeoutError:
+        return None, 'timeout'
+
+
+async def add_llm_advice_async(data, predictions, deadline=None):
+    """Etap Gemini z predict_diabetes_risk (with_llm=False) w wersji asynchronicznej - z tym samym terminem.
+    Jednoczesne identyczne żądania czekają (najwyżej do własnego terminu) na jedno wywołanie Gemini.
+    Porada przerwana terminem lidera nie jest współdzielona - wywołanie przejmuje jedno z oczekujących.
+    """
+    if not _fits_budget('llm', deadline):
+        _omit(predictions, 'llm', 'budget')
+        return
+
+    key = _flight_key('llm', data, predictions.get('explained_model'), bool(predictions.get('shap_factors')))
+
+    with span('llm'):
+        outcome = None
+        while outcome is None:
+            future, leader = _join_flight(key)
+            if leader:
+                try:
+                    outcome = await _generate_advice(data, predictions, deadline)
+                    future.set_result(outcome if outcome[1] is None else None)
+                except BaseException as e:
+                    future.set_exception(e)
+                    raise
+                finally:
+                    _leave_flight(key)
+                continue
+
+            try:
+                # shield - przekroczenie terminu tego żądania nie anuluje obliczenia lidera
+                outcome = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=_remaining(deadline))
+            except asyncio.TimeoutError:
+                outcome = (None, 'timeout')
+            if outcome is not None and outcome[1] is None:
+                inc('diabetes_coalesced_total', stage='llm')
+            # outcome None - lider nie zdążył; kolejna próba (jedno z oczekujących zostaje liderem)
+
+    llm_text, omitted = outcome
+    if omitted:
+        _omit(predictions, 'llm', omitted)
+    elif llm_text:
+        predictions['llm_analysis'] = llm_text
+
+
+def _remaining(deadline):
+    """Pozostały czas do terminu w sekundach (None = bez limitu)."""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.perf_counter())
+
+
+def _fits_budget(stage, deadline):
+    """Czy etap zmieści się w pozostałym czasie - na podstawie średniego czasu z metryk
+    (a przed pierwszym pomiarem - ostrożnego założenia z _stage_priors)."""
+    remaining = _remaining(deadline)
+    if remaining is None:
+        return True
+    expected = stage_mean(stage)
+    if expected is None:
+        expected = _stage_priors.get(stage, 0.0)
+    return remaining > expected
+
+
+def probability_margin(probabilities):
+    """Różnica między dwiema najwyższymi wartościami prawdopodobieństwa klas (pewność modelu)."""
+    top = np.sort(np.asarray(probabilities))[::-1]
+    return float(top[0] - top[1])
+
+
+def risk_percentile(model_name, diabetes_risk, age=None, sex=None):
+    """Percentyl ryzyka w populacji referencyjnej (ogółem i w warstwie wiek/płeć) - wyszukiwanie binarne."""
+    if _risk_percentiles is None:
+        return None
+
+    strata = _risk_percentiles['models'].get(model_name)
+    if not strata:
+        return None
+
+    result = {}
+    for label, key in (('all', 'all'), ('age_sex', (age, sex))):
+        quantiles = strata.get(key)
+        if quantiles is not None:
+            below = np.searchsorted(quantiles, diabetes_risk, side='right')
+            result[label] = round(float(below) / len(quantiles) * 100, 1)
+    return result or None
+
+
+def _score_model(model_name, model, input_scaled_df):
+    """((klasa, prawdopodobieństwa) albo None przy błędzie, czas) - bez metryk, więc działa też w wątkach puli."""
+    start = time.perf_counter()
+    try:
+        prediction = model.predict(input_scaled_df)[0]
+        probabilities = model.predict_proba(input_scaled_df)[0]
+        result = prediction, probabilities
+    except Exception as e:
+        print(f"Error in {model_name}: {e}")
+        result = None
+    return result, time.perf_counter() - start
+
+
+def _run_model(model_name, model, input_scaled_df):
+    """(klasa, prawdopodobieństwa) jednego modelu albo None przy błędzie."""
+    result, duration = _score_model(model_name, model, input_scaled_df)
+    record('model', duration, model_name)
+    return result
+
+
+def primary_result(predictions):
+    """Wynik modelu głównego (Random Forest, a gdy nie był liczony - pierwszy dostępny) dla SHAP / Gemini."""
+    primary = next(
+        (predictions[name] for name in ('random_forest', 'logistic', 'gradient_boost') if predictions.get(name)),
+        None
+    )
+    return primary or {'prediction': 0, 'diabetes_risk': 0}
+
+
+def _omit(predictions, stage, reason):
+    """Oznacza pominięty etap w odpowiedzi i zlicza go w metrykach."""
+    predictions.setdefault('omitted', {})[stage] = reason
+    inc('diabetes_budget_misses_total', stage=stage, reason=reason)
+
+
+def predict_diabetes_risk(data, is_authenticated=False, deadline=None, cascade_margin=None, parallel=None,
+                          explain_model='random_forest', with_llm=True):
+    """Główna funkcja predykcji (Skalowanie -> ML -> SHAP -> Gemini).
+
+    deadline to chwila (time.perf_counter()), po której opcjonalne etapy (SHAP, Gemini)
+    są pomijane lub porzucane; ich lista trafia do predictions['omitted'].
+    Przy podanym cascade_margin najpierw liczony jest model logistyczny, a modele drzewiaste
+    tylko wtedy, gdy jego margines pewności jest mniejszy niż próg.
+    parallel=None liczy modele równolegle, jeśli skonfigurowano pulę (configure_model_pool).
+    explain_model wskazuje model, którego czynniki ryzyka (SHAP) trafiają do odpowiedzi i do Gemini.
+    with_llm=False pomija Gemini - widok asynchroniczny dolicza poradę przez add_llm_advice_async.
+
+    Jednoczesne wywołania z tym samym wektorem cech i parametrami są scalane (single-flight):
+    liczy pierwsze, pozostałe czekają (najwyżej do własnego terminu) i dostają głęboką kopię jego
+    wyniku. Wynik z pominiętymi etapami (omitted) nie jest współdzielony - liczenie przejmuje
+    wtedy jedno z oczekujących.
+    """
+    try:
+        key = _flight_key('predict', data, bool(is_authenticated), explain_model, with_llm, cascade_margin, parallel)
+    except (AttributeError, TypeError, ValueError):
+        # Niepoprawne dane - błąd zwróci właściwe obliczenie
+        return _predict_diabetes_risk(data, is_authenticated, deadline, cascade_margin, parallel, explain_model, with_llm)
+
+    while True:
+        future, leader = _join_flight(key)
+        if leader:
+            break
+        try:
+            shared = future.result(timeout=_remaining(deadline))
+        except FutureTimeoutError:
+            # Własny termin minął - liczymy sami (opcjonalne etapy i tak zostaną pominięte)
+            return _predict_diabetes_risk(data, is_authenticated, deadline, cascade_margin, parallel, explain_model, with_llm)
+        if shared is not None:
+            inc('diabetes_coalesced_total', stage='predict')
+            return copy.deepcopy(shared)
+        # Wynik lidera nie nadawał się do współdzielenia - kolejna próba (jedno z oczekujących zostaje liderem)
+
+    try:
+        result = _predict_diabetes_risk(data, is_authenticated, deadline, cascade_margin, parallel, explain_model, with_llm)
+        predictions = result[0]
+        # Oczekujący dostają kopię - lider i routes mogą modyfikować swój wynik.
+        # Wynik okrojony terminem lidera (lub błąd) nie jest współdzielony
+        shareable = predictions is not None and not predictions.get('omitted')
+        future.set_result(copy.deepcopy(result) if shareable else None)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _leave_flight(key)
+
+
+def _predict_diabetes_risk(data, is_authenticated, deadline, cascade_margin, parallel, explain_model, with_llm):
+    import pandas as pd
 
     if all(model is None for model in _models.values()) or _scaler is None:
         load_model()
@@ -161,89 +705,111 @@ def predict_diabetes_risk(data, is_authenticated=False):
 
     try:
         # 1. Przygotowanie surowego DataFrame
-        input_df = pd.DataFrame(columns=_model_columns, dtype=float)
-        input_df.loc[0] = 0.0
-
-        mapper = {
-            'HighBP': int(data.get('HighBP', 0)),
-            'HighChol': int(data.get('HighChol', 0)),
-            'CholCheck': int(data.get('CholCheck', 1)),
-            'BMI': float(data.get('BMI', 25.0)),
-            'Smoker': int(data.get('Smoker', 0)),
-            'Stroke': int(data.get('Stroke', 0)),
-            'HeartDiseaseorAttack': int(data.get('HeartDiseaseorAttack', 0)),
-            'PhysActivity': int(data.get('PhysActivity', 0)),
-            'Fruits': int(data.get('Fruits', 0)),
-            'Veggies': int(data.get('Veggies', 0)),
-            'HvyAlcoholConsump': int(data.get('HvyAlcoholConsump', 0)),
-            'AnyHealthcare': int(data.get('AnyHealthcare', 1)),
-            'NoDocbcCost': int(data.get('NoDocbcCost', 0)),
-            'GenHlth': int(data.get('GenHlth', 3)),
-            'MentHlth': int(data.get('MentHlth', 0)),
-            'PhysHlth': int(data.get('PhysHlth', 0)),
-            'DiffWalk': int(data.get('DiffWalk', 0)),
-            'Sex': int(data.get('Sex', 0)),
-            'Age': int(data.get('Age', 1))
-        }
-
-        for col, val in mapper.items():
-            if col in input_df.columns:
-                input_df.at[0, col] = val
+        with span('build'):
+            input_df = pd.DataFrame(columns=_model_columns, dtype=float)
+            input_df.loc[0] = 0.0
+
+            mapper = map_input(data)
+            drift_service.observe(mapper)
+
+            for col, val in mapper.items():
+                if col in input_df.columns:
+                    input_df.at[0, col] = val
 
         # 2. SKALOWANIE DANYCH - Kluczowy krok dla poprawnych wyników
-        if _scaler:
-            input_scaled_values = _scaler.transform(input_df)
-            input_scaled_df = pd.DataFrame(input_scaled_values, columns=_model_columns)
-        else:
-            input_scaled_df = input_df
+        with span('scale'):
+            input_scaled_df = scale_features(input_df)
 
         predictions = {}
-        rf_prediction_class = 0
-        rf_diabetes_risk = 0
 
-        # 3. Predykcja na przeskalowanych danych
-        for model_name, model in _models.items():
-            if model is not None:
-                try:
-                    prediction = model.predict(input_scaled_df)[0]
-                    probabilities = model.predict_proba(input_scaled_df)[0]
-                    confidence = float(round(max(probabilities) * 100, 2))
-
-                    # Ryzyko (klasa 1 + 2)
-                    diabetes_risk = float(round((probabilities[1] + probabilities[2]) * 100, 2))
-
-                    if model_name == 'random_forest':
-                        rf_prediction_class = int(prediction)
-                        rf_diabetes_risk = diabetes_risk
-
-                    predictions[model_name] = {
-                        'prediction': int(prediction),
-                        'probabilities': {
-                            f'class_{i}': float(round(p * 100, 2)) for i, p in enumerate(probabilities)
-                        },
-                        'confidence': confidence,
-                        'diabetes_risk': diabetes_risk
-                    }
-                except Exception as e:
-                    print(f"Error in {model_name}: {e}")
-                    predictions[model_name] = None
-
-        # 4. SHAP & LLM (wykorzystują przeskalowane dane)
-        if is_authenticated and _models['random_forest']:
-            risk_factors, _ = get_shap_explanation(_models['random_forest'], input_scaled_df)
-
-            llm_text = generate_llm_advice(
-                data,
-                rf_prediction_class,
-                rf_diabetes_risk,
-                risk_factors
+        # 3. Predykcja na przeskalowanych danych (logistyczny pierwszy - kolejność _models)
+        pending = [(name, model) for name, model in _models.items() if model is not None]
+        results = {}
+
+        # Kaskada: pewny model logistyczny wystarcza, drzewa pomijamy
+        if cascade_margin is not None and pending and pending[0][0] == 'logistic':
+            results['logistic'] = _run_model(*pending.pop(0), input_scaled_df)
+            if results['logistic'] is not None and probability_margin(results['logistic'][1]) >= cascade_margin:
+                pending = []
+                inc('diabetes_cascade_total', outcome='short_circuit')
+            else:
+                inc('diabetes_cascade_total', outcome='full')
+
+        if parallel is None:
+            parallel = _model_executor is not None
+
+        if parallel and _model_executor is not None and len(pending) > 1:
+            with span('models_parallel'), single_thread_blas():
+                futures = {
+                    name: _model_executor.submit(_score_model, name, model, input_scaled_df)
+                    for name, model in pending
+                }
+                # Czasy modeli zapisujemy w wątku żądania - tylko tu jest kontekst dla Server-Timing
+                for name, future in futures.items():
+                    results[name], duration = future.result()
+                    record('model', duration, name)
+        else:
+            for name, model in pending:
+                results[name] = _run_model(name, model, input_scaled_df)
+
+        for model_name, result in results.items():
+            if result is None:
+                predictions[model_name] = None
+                continue
+
+            prediction, probabilities = result
+            predictions[model_name] = {
+                'prediction': int(prediction),
+                'probabilities': {
+                    f'class_{i}': float(round(p * 100, 2)) for i, p in enumerate(probabilities)
+                },
+                'confidence': float(round(max(probabilities) * 100, 2)),
+                # Ryzyko (klasa 1 + 2)
+                'diabetes_risk': float(round((probabilities[1] + probabilities[2]) * 100, 2))
+            }
+
+            percentile = risk_percentile(
+                model_name, predictions[model_name]['diabetes_risk'], mapper.get('Age'), mapper.get('Sex')
             )
+            if percentile:
+                predictions[model_name]['risk_percentile'] = percentile
+
+        predictions['models_run'] = [name for name, result in results.items() if result is not None]
+
+        # Kandydaci liczeni w tle na próbce ruchu - tu tylko wstawienie do kolejki
+        shadow_service.submit(mapper, predictions)
 
-            if llm_text:
-                predictions['llm_analysis'] = llm_text
+        primary = primary_result(predictions)
+
+        # 4. SHAP & LLM (wykorzystują przeskalowane dane) - tylko jeśli zmieszczą się w terminie
+        if is_authenticated and _models.get(explain_model) is not None:
+            risk_factors = []
+
+            if _fits_budget('shap', deadline):
+                with span('shap'):
+                    risk_factors, _ = get_shap_explanation(explain_model, input_scaled_df)
+                predictions['explained_model'] = explain_model
+            else:
+                _omit(predictions, 'shap', 'budget')
 
             predictions['shap_factors'] = risk_factors
 
+            if with_llm and not _fits_budget('llm', deadline):
+                _omit(predictions, 'llm', 'budget')
+            elif with_llm:
+                with span('llm'):
+                    future = _llm_executor.submit(
+                        generate_llm_advice, data, primary['prediction'], primary['diabetes_risk'], risk_factors
+                    )
+                    try:
+                        llm_text = future.result(timeout=_remaining(deadline))
+                    except FutureTimeoutError:
+                        llm_text = None
+                        _omit(predictions, 'llm', 'timeout')
+
+                if llm_text:
+                    predictions['llm_analysis'] = llm_text
+
         return predictions, None
 
     except Exception as e:
@@ -268,6 +834,8 @@ def analyze_risk_trend(history_records):
         X.append([days_diff])
         y.append(record.probability)
 
+    from sklearn.linear_model import LinearRegression
+
     model = LinearRegression()
     model.fit(X, y)
 
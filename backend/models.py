@@ -47,9 +47,13 @@ input_snapshot JSON
 """
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
 from werkzeug.security import generate_password_hash, check_password_hash
 import json
-from datetime import datetime, timezone
+from datetime import datetime, time, timezone
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -70,6 +74,10 @@ class User(db.Model):
     logs = db.relationship('Log', backref='user', lazy=True, cascade="all, delete-orphan")
 
     history = db.relationship('History', backref='user', lazy=True, cascade="all, delete-orphan")
+
+    history_daily = db.relationship('HistoryDaily', backref='user', lazy=True, cascade="all, delete-orphan")
+
+    chat_sessions = db.relationship('ChatSession', backref='user', lazy=True, cascade="all, delete-orphan")
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
 
@@ -146,4 +154,145 @@ class History(db.Model):
     input_snapshot = db.Column(db.JSON, nullable=True)
 
     def __repr__(self):
-        return f'<History Result {self.result} User {self.user_id}>'
\ No newline at end of file
+        return f'<History Result {self.result} User {self.user_id}>'
+
+
+class HistoryDaily(db.Model):
+    """Dzienny agregat historii starszej niż okres retencji (services/retention_service.py).
+
+    Właściwości created_at i probability pozwalają mieszać agregaty z rekordami History,
+    np. w analyze_risk_trend.
+    """
+    __tablename__ = 'history_daily'
+    __table_args__ = (db.UniqueConstraint('user_id', 'day', name='uq_history_daily_user_day'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+
+    count = db.Column(db.Integer, nullable=False)
+    min_probability = db.Column(db.Float, nullable=False)
+    max_probability = db.Column(db.Float, nullable=False)
+    mean_probability = db.Column(db.Float, nullable=False)
+
+    # Wynik ostatniej predykcji danego dnia
+    last_result = db.Column(db.Integer, nullable=False)
+    last_created_at = db.Column(db.DateTime, nullable=False)
+
+    @property
+    def created_at(self):
+        return datetime.combine(self.day, time(12))
+
+    @property
+    def probability(self):
+        return self.mean_probability
+
+    def __repr__(self):
+        return f'<HistoryDaily {self.day} User {self.user_id}>'
+
+
+class ChatSession(db.Model):
+    """Rozmowa z asystentem AI. Starsze wiadomości są streszczane do summary (services/ai_service.py)."""
+    __tablename__ = 'chat_sessions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    # Streszczenie wiadomości o id <= summarized_until (nie trafiają już do promptu dosłownie)
+    summary = db.Column(db.Text, nullable=True)
+    summarized_until = db.Column(db.Integer, default=0, nullable=False)
+
+    messages = db.relationship('ChatMessage', backref='session', lazy=True, cascade="all, delete-orphan",
+                               order_by='ChatMessage.id')
+
+    def __repr__(self):
+        return f'<ChatSession {self.id} User {self.user_id}>'
+
+
+class ChatMessage(db.Model):
+    __tablename__ = 'chat_messages'
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('chat_sessions.id'), nullable=False, index=True)
+    # 'user' albo 'model' (nazwy ról Gemini)
+    role = db.Column(db.String(10), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<ChatMessage {self.id} Session {self.session_id}>'
+
+
+class UserVersion(db.Model):
+    """Liczniki wersji danych użytkownika - źródło ETagów dla GET /history, /trends, /logs, /user-data."""
+    __tablename__ = 'user_versions'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    history = db.Column(db.Integer, default=0, nullable=False)
+    logs = db.Column(db.Integer, default=0, nullable=False)
+    user_data = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<UserVersion User {self.user_id}>'
+
+
+# Które modele podbijają który licznik w UserVersion
+VERSIONED_MODELS = {
+    History: 'history',
+    Log: 'logs',
+    UserData: 'user_data'
+}
+
+
+def get_user_version(user_id, kind):
+    """Zwraca aktualną wersję danego rodzaju danych użytkownika (jedno zapytanie po kluczu głównym)."""
+    column = getattr(UserVersion, kind)
+    version = db.session.execute(
+        select(column).where(UserVersion.user_id == int(user_id))
+    ).scalar()
+    return version or 0
+
+
+def bump_user_versions(connection, user_ids, kinds):
+    """Podbija liczniki wersji dla podanych użytkowników.
+
+    Działa na poziomie połączenia, więc mogą z niej korzystać także operacje masowe
+    (insert().values, delete()), które omijają zdarzenia ORM.
+    """
+    if not user_ids or not kinds:
+        return
+
+    # Upsert - pierwsze równoległe zapisy użytkownika nie ścigają się o INSERT wiersza wersji
+    dialect_insert = postgresql_insert if connection.dialect.name == 'postgresql' else sqlite_insert
+    row = {'user_id': 0, 'history': 0, 'logs': 0, 'user_data': 0}
+    row.update({kind: 1 for kind in kinds})
+
+    for user_id in user_ids:
+        statement = dialect_insert(UserVersion).values(**dict(row, user_id=int(user_id)))
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[UserVersion.user_id],
+            set_={kind: getattr(UserVersion, kind) + 1 for kind in kinds}
+        ))
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_versions_after_flush(session, flush_context):
+    """Każdy zapis History / Log / UserData unieważnia ETag danego użytkownika."""
+    touched = {}
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        kind = VERSIONED_MODELS.get(type(obj))
+        if kind is None or obj.user_id is None:
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        touched.setdefault(int(obj.user_id), set()).add(kind)
+
+    if not touched:
+        return
+
+    connection = session.connection()
+    for user_id, kinds in touched.items():
+        bump_user_versions(connection, [user_id], kinds)
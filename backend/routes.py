@@ -1,13 +1,131 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, make_response, Response, current_app, g
 from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
 import json
+import hashlib
+import time
+from functools import wraps
 from datetime import datetime, timezone
+from sqlalchemy import update
+
+from models import db, UserData, Log, History, HistoryDaily, User, ChatSession, ChatMessage, get_user_version
+from auth import register_user, login_user, is_admin
+from ml_service import predict_diabetes_risk, add_llm_advice_async, analyze_risk_trend, score_scenarios, expand_sweep, FEATURE_DEFAULTS
+
+from services.ai_service import (
+    get_ai_response, get_ai_response_async, summarize_conversation, summarize_conversation_async,
+    run_llm, estimate_tokens, split_chat_window, AI_UNAVAILABLE_MSG
+)
+from services.metrics_service import span, render_prometheus
+from services.profiling_service import list_profiles, offload
+from services.drift_service import drift_report
+from services.shadow_service import shadow_summary
+
+def conditional_get(kind):
+    """
+    Obsługa ETag / If-None-Match dla endpointów GET zależnych od danych użytkownika.
+    ETag wynika wyłącznie z licznika w UserVersion, więc przy trafieniu (304)
+    nie wykonujemy ani zapytań o dane, ani analizy trendu.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = get_jwt_identity()
+            version = get_user_version(user_id, kind)
+
+            etag = f"{kind}-{user_id}-{version}"
+            if request.query_string:
+                etag += "-" + hashlib.sha1(request.query_string).hexdigest()[:12]
+
+            if etag in request.if_none_match:
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+# Klucze odpowiedzi /predict, które nie są wynikami modeli
+PREDICTION_META_KEYS = ('shap_factors', 'explained_model', 'omitted', 'models_run')
+
+
+def validate_prediction_input(data):
+    """Walidacja danych formularza predykcji. Zwraca listę błędów (pusta = poprawne)."""
+    errors = []
+
+    # Wymagane pola
+    if 'Sex' not in data:
+        errors.append("Pole 'Sex' jest wymagane")
+    elif data['Sex'] not in [0, 1]:
+        errors.append("Sex musi być 0 (kobieta) lub 1 (mężczyzna)")
+
+    if 'Age' not in data:
+        errors.append("Pole 'Age' jest wymagane")
+    elif not (1 <= data['Age'] <= 13):
+        errors.append("Age musi być w zakresie 1-13")
+
+    if 'BMI' not in data:
+        errors.append("Pole 'BMI' jest wymagane")
+    elif not (10 <= data['BMI'] <= 70):
+        errors.append("BMI musi być w zakresie 10-70")
+
+    # Walidacja pól opcjonalnych
+    if 'GenHlth' in data and not (1 <= data['GenHlth'] <= 5):
+        errors.append("GenHlth musi być w zakresie 1-5")
+
+    if 'MentHlth' in data and not (0 <= data['MentHlth'] <= 30):
+        errors.append("MentHlth musi być w zakresie 0-30 dni")
+
+    if 'PhysHlth' in data and not (0 <= data['PhysHlth'] <= 30):
+        errors.append("PhysHlth musi być w zakresie 0-30 dni")
+
+    # Walidacja pól binarnych
+    binary_fields = [
+        'HighBP', 'HighChol', 'Smoker', 'Stroke', 'HeartDiseaseorAttack',
+        'PhysActivity', 'Fruits', 'Veggies', 'HvyAlcoholConsump', 'DiffWalk'
+    ]
+
+    for field in binary_fields:
+        if field in data and data[field] not in [0, 1]:
+            errors.append(f"{field} musi być 0 lub 1")
+
+    return errors
 
-from models import db, UserData, Log, History, User
-from auth import register_user, login_user
-from ml_service import predict_diabetes_risk, analyze_risk_trend
 
-from services.ai_service import get_ai_response
+def request_deadline():
+    """Termin obsługi żądania (time.perf_counter()) z PREDICT_DEADLINE_MS lub nagłówka X-Deadline-Ms.
+
+    Wartość 0 oznacza brak limitu.
+    """
+    budget_ms = current_app.config.get('PREDICT_DEADLINE_MS', 0)
+    try:
+        budget_ms = int(request.headers.get('X-Deadline-Ms', budget_ms))
+    except ValueError:
+        pass
+
+    if budget_ms <= 0:
+        return None
+    return g.get('request_start', time.perf_counter()) + budget_ms / 1000
+
+
+async def offload_db(fn, *args, **kwargs):
+    """
+    offload dla pracy z bazą w widoku async: po wywołaniu sesja oddaje połączenie do puli.
+    Pod asgi.py żądanie czeka potem na Gemini bez wątku, więc trzymane połączenie
+    wyczerpałoby pulę (domyślnie 5 + 10) przy kilkunastu rozmowach naraz.
+    """
+    def run():
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            db.session.close()
+    return await offload(run)
+
 
 # ==========================================
 #  AUTH BLUEPRINT (Register, Login, Predict)
@@ -47,104 +165,94 @@ def refresh():
 # --- ML PREDICTION ROUTE ---
 # ZAMIEŃ TĘ CZĘŚĆ W routes.py w endpoincie /predict
 
-@auth_bp.route('/predict', methods=['POST'])
-@jwt_required(optional=True)
-def predict():
-    user_id = get_jwt_identity()
-    data = request.get_json()
-
-    # === WALIDACJA DANYCH ===
-    errors = []
-
-    # Wymagane pola
-    if 'Sex' not in data:
-        errors.append("Pole 'Sex' jest wymagane")
-    elif data['Sex'] not in [0, 1]:
-        errors.append("Sex musi być 0 (kobieta) lub 1 (mężczyzna)")
-
-    if 'Age' not in data:
-        errors.append("Pole 'Age' jest wymagane")
-    elif not (1 <= data['Age'] <= 13):
-        errors.append("Age musi być w zakresie 1-13")
-
-    if 'BMI' not in data:
-        errors.append("Pole 'BMI' jest wymagane")
-    elif not (10 <= data['BMI'] <= 70):
-        errors.append("BMI musi być w zakresie 10-70")
+def save_prediction_history(user_id, data, predictions):
+    """
+    Zapisuje wynik /predict jako jeden rekord History (wszystkie modele w model_scores).
+    Porada Gemini idzie do llm_feedback, a pola meta predykcji nie trafiają do bazy.
+    """
+    llm_text = predictions.pop('llm_analysis', None)
+    # Pola opisujące przebieg predykcji nie trafiają do model_scores w historii
+    meta = {key: predictions.pop(key, None) for key in PREDICTION_META_KEYS}
 
-    # Walidacja pól opcjonalnych
-    if 'GenHlth' in data and not (1 <= data['GenHlth'] <= 5):
-        errors.append("GenHlth musi być w zakresie 1-5")
+    try:
+        # Extract primary model (Random Forest) data for the main result
+        primary_model = predictions.get('random_forest')
+        
+        # Fallback if Random Forest failed but others didn't (unlikely but safe)
+        if not primary_model:
+            primary_model = predictions.get('logistic') or predictions.get('gradient_boost')
 
-    if 'MentHlth' in data and not (0 <= data['MentHlth'] <= 30):
-        errors.append("MentHlth musi być w zakresie 0-30 dni")
+        if primary_model:
+            # Calculate combined risk for the primary model
+            probabilities = primary_model.get('probabilities', {})
+            diabetes_risk = probabilities.get('class_1', 0) + probabilities.get('class_2', 0)
 
-    if 'PhysHlth' in data and not (0 <= data['PhysHlth'] <= 30):
-        errors.append("PhysHlth musi być w zakresie 0-30 dni")
+            # Save ONE history record with all details
+            new_history = History(
+                user_id=user_id,
+                result=primary_model['prediction'],
+                probability=diabetes_risk,
+                llm_feedback=llm_text,
+                model_scores=predictions, # Save ALL model predictions here
+                input_snapshot=json.dumps({
+                    'input_data': data
+                })
+            )
+            with span('history_commit'):
+                db.session.add(new_history)
+                db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        if llm_text:
+            predictions['llm_analysis'] = llm_text
+        predictions.update({key: value for key, value in meta.items() if value})
 
-    # Walidacja pól binarnych
-    binary_fields = [
-        'HighBP', 'HighChol', 'Smoker', 'Stroke', 'HeartDiseaseorAttack',
-        'PhysActivity', 'Fruits', 'Veggies', 'HvyAlcoholConsump', 'DiffWalk'
-    ]
 
-    for field in binary_fields:
-        if field in data and data[field] not in [0, 1]:
-            errors.append(f"{field} musi być 0 lub 1")
+@auth_bp.route('/predict', methods=['POST'])
+@jwt_required(optional=True)
+async def predict():
+    """
+    Predykcja wszystkich modeli; dla zalogowanych także SHAP, porada Gemini i zapis do historii.
+    Widok jest asynchroniczny: modele i baza działają w wątkach roboczych (offload), a oczekiwanie
+    na Gemini pod serwerem ASGI (asgi.py) nie zajmuje wątku. Porada jest porzucana po terminie żądania.
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json()
+    explain_model = data.pop('explain', 'random_forest')
 
-    # Jeśli są błędy walidacji, zwróć 400
+    errors = validate_prediction_input(data)
+    if explain_model not in ('logistic', 'random_forest', 'gradient_boost'):
+        errors.append("explain musi być jednym z: logistic, random_forest, gradient_boost")
     if errors:
         return jsonify({
             "msg": "Błąd walidacji danych",
             "errors": errors
         }), 400
 
-    # === KONIEC WALIDACJI ===
-
-    predictions, error = predict_diabetes_risk(data, is_authenticated=bool(user_id))
+    deadline = request_deadline()
+    predictions, error = await offload(
+        predict_diabetes_risk,
+        data,
+        is_authenticated=bool(user_id),
+        deadline=deadline,
+        explain_model=explain_model,
+        cascade_margin=current_app.config['CASCADE_MARGIN'] if current_app.config.get('PREDICT_CASCADE') else None,
+        with_llm=False
+    )
 
     if predictions is None:
         return jsonify({"msg": "Prediction failed", "error": error}), 500
 
     if user_id:
-        try:
-            llm_text = predictions.pop('llm_analysis', None)
-            shap_list = predictions.pop('shap_factors', [])
-
-            # Extract primary model (Random Forest) data for the main result
-            primary_model = predictions.get('random_forest')
-            
-            # Fallback if Random Forest failed but others didn't (unlikely but safe)
-            if not primary_model:
-                primary_model = predictions.get('logistic') or predictions.get('gradient_boost')
-
-            if primary_model:
-                # Calculate combined risk for the primary model
-                probabilities = primary_model.get('probabilities', {})
-                diabetes_risk = probabilities.get('class_1', 0) + probabilities.get('class_2', 0)
-
-                # Save ONE history record with all details
-                new_history = History(
-                    user_id=user_id,
-                    result=primary_model['prediction'],
-                    probability=diabetes_risk,
-                    llm_feedback=llm_text,
-                    model_scores=predictions, # Save ALL model predictions here
-                    input_snapshot=json.dumps({
-                        'input_data': data
-                    })
-                )
-                db.session.add(new_history)
-                db.session.commit()
-
-            if llm_text:
-                predictions['llm_analysis'] = llm_text
-
-            if shap_list:
-                predictions['shap_factors'] = shap_list
+        # Porada Gemini tylko wtedy, gdy wykonano etap SHAP (jak w predict_diabetes_risk)
+        if 'shap_factors' in predictions:
+            await add_llm_advice_async(data, predictions, deadline)
 
+        try:
+            await offload_db(save_prediction_history, user_id, data, predictions)
         except Exception as e:
-            db.session.rollback()
             return jsonify({"msg": "Prediction done but database save failed", "error": str(e)}), 500
 
     return jsonify({
@@ -154,6 +262,63 @@ def predict():
     }), 200
 
 
+@auth_bp.route('/what-if', methods=['POST'])
+def what_if():
+    """
+    Scenariusze "co jeśli" dla profilu bazowego, ocenione jednym przebiegiem na model.
+    Body: {"base": {...}, "modifications": [{"BMI": 25}, {"Smoker": 0, "PhysActivity": 1}]}
+      albo {"base": {...}, "sweep": {"feature": "BMI", "start": 18, "stop": 40, "step": 0.5}}
+    """
+    data = request.get_json() or {}
+    base = data.get('base') or {}
+    max_scenarios = current_app.config.get('WHAT_IF_MAX_SCENARIOS', 500)
+
+    errors = validate_prediction_input(base)
+    if errors:
+        return jsonify({"msg": "Błąd walidacji danych", "errors": errors}), 400
+
+    if 'sweep' in data:
+        sweep = data['sweep']
+        try:
+            feature = sweep['feature']
+            start, stop, step = float(sweep['start']), float(sweep['stop']), float(sweep['step'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"msg": "Sweep wymaga pól feature, start, stop, step"}), 400
+
+        if feature not in FEATURE_DEFAULTS:
+            return jsonify({"msg": f"Nieznana cecha: {feature}"}), 400
+        if step <= 0 or stop < start:
+            return jsonify({"msg": "Wymagane step > 0 oraz stop >= start"}), 400
+        if (stop - start) / step + 1 > max_scenarios:
+            return jsonify({"msg": f"Maksymalnie {max_scenarios} scenariuszy"}), 400
+
+        scenarios = expand_sweep(feature, start, stop, step)
+    else:
+        scenarios = data.get('modifications')
+        if not isinstance(scenarios, list) or not scenarios or not all(isinstance(m, dict) for m in scenarios):
+            return jsonify({"msg": "Podaj listę modifications albo sweep"}), 400
+        if len(scenarios) > max_scenarios:
+            return jsonify({"msg": f"Maksymalnie {max_scenarios} scenariuszy"}), 400
+
+    for i, changes in enumerate(scenarios, start=1):
+        unknown = [field for field in changes if field not in FEATURE_DEFAULTS]
+        scenario_errors = validate_prediction_input(dict(base, **changes))
+        if unknown:
+            scenario_errors.append(f"Nieznane pola: {', '.join(unknown)}")
+        if scenario_errors:
+            return jsonify({"msg": f"Błąd walidacji scenariusza {i}", "errors": scenario_errors}), 400
+
+    result, error = score_scenarios(base, scenarios)
+    if result is None:
+        return jsonify({"msg": "What-if analysis failed", "error": error}), 500
+
+    return jsonify({
+        "msg": "What-if analysis successful",
+        "count": len(scenarios),
+        "data": result
+    }), 200
+
+
 # ==========================================
 #  API BLUEPRINT (Logs, User Data)
 # ==========================================
@@ -202,6 +367,7 @@ def add_log():
 
 @api_bp.route('/logs', methods=['GET'])
 @jwt_required()
+@conditional_get('logs')
 def get_logs():
     current_user_id = get_jwt_identity()
 
@@ -226,11 +392,13 @@ def get_logs():
 
 @api_bp.route('/trends', methods=['GET'])
 @jwt_required()
+@conditional_get('history')
 def get_trends():
     user_id = get_jwt_identity()
 
-    # Pobieramy całą historię predykcji tego użytkownika
+    # Pobieramy całą historię predykcji tego użytkownika (starsza część jako dzienne agregaty)
     user_history = History.query.filter_by(user_id=user_id).all()
+    user_history += HistoryDaily.query.filter_by(user_id=user_id).all()
 
     if not user_history:
         return jsonify({"msg": "No history found"}), 404
@@ -252,6 +420,7 @@ def get_trends():
 
 @api_bp.route('/history', methods=['GET'])
 @jwt_required()
+@conditional_get('history')
 def get_history():
     """Pobiera historię predykcji użytkownika"""
     user_id = get_jwt_identity()
@@ -260,12 +429,21 @@ def get_history():
     limit = request.args.get('limit', type=int)
 
     query = History.query.filter_by(user_id=user_id).order_by(History.created_at.desc())
+    daily_query = HistoryDaily.query.filter_by(user_id=user_id).order_by(HistoryDaily.day.desc())
 
     if limit:
         query = query.limit(limit)
+        daily_query = daily_query.limit(limit)
 
     history_records = query.all()
 
+    # Helper function do etykiet
+    result_labels = {
+        0: "Brak cukrzycy",
+        1: "Stan przedcukrzycowy",
+        2: "Cukrzyca"
+    }
+
     result = []
     for record in history_records:
         # Parsowanie input_snapshot
@@ -277,13 +455,6 @@ def get_history():
             except:
                 pass
 
-        # Helper function do etykiet
-        result_labels = {
-            0: "Brak cukrzycy",
-            1: "Stan przedcukrzycowy",
-            2: "Cukrzyca"
-        }
-
         result.append({
             "id": record.id,
             "created_at": record.created_at.isoformat(),
@@ -295,6 +466,29 @@ def get_history():
             "model_scores": record.model_scores
         })
 
+    # Dni starsze niż okres retencji - jeden wpis na dzień (bez id, danych wejściowych i porady)
+    for record in daily_query.all():
+        result.append({
+            "id": None,
+            "created_at": record.created_at.isoformat(),
+            "result": record.last_result,
+            "result_label": result_labels.get(record.last_result, "Nieznany"),
+            "probability": round(record.mean_probability, 2),
+            "llm_feedback": None,
+            "input_data": {},
+            "model_scores": None,
+            "daily_summary": {
+                "count": record.count,
+                "min_probability": record.min_probability,
+                "max_probability": record.max_probability,
+                "mean_probability": round(record.mean_probability, 2)
+            }
+        })
+
+    result.sort(key=lambda item: item["created_at"], reverse=True)
+    if limit:
+        result = result[:limit]
+
     return jsonify({
         "msg": "History retrieved successfully",
         "count": len(result),
@@ -364,6 +558,7 @@ def delete_history(history_id):
 
 @api_bp.route('/user-data', methods=['GET'])
 @jwt_required()
+@conditional_get('user_data')
 def get_user_data():
     """Pobiera dane użytkownika"""
     user_id = get_jwt_identity()
@@ -455,21 +650,8 @@ def save_user_data():
     
 
 
-@api_bp.route('/chat', methods=['POST'])
-@jwt_required()
-def chat_with_ai():
-    """
-    Endpoint obsługujący czat. Pobiera dane użytkownika z bazy,
-    aby nadać kontekst rozmowie, a następnie pyta Gemini.
-    """
-    user_id = get_jwt_identity()
-    data = request.get_json()
-    user_message = data.get('message')
-
-    if not user_message:
-        return jsonify({"error": "Message is required"}), 400
-
-    # 1. Pobierz kontekst zdrowotny użytkownika (jeśli istnieje)
+def chat_context(user_id):
+    """Kontekst zdrowotny użytkownika dla czatu (UserData + BMI z ostatniego logu)."""
     user_data = UserData.query.filter_by(user_id=user_id).first()
     context = {}
     
@@ -495,10 +677,250 @@ def chat_with_ai():
             except:
                 pass
 
-    # 2. Wywołanie serwisu AI
-    ai_response_text = get_ai_response(user_message, user_context=context)
+    return context
+
+
+def load_chat_state(user_id, session_id):
+    """Streszczenie i niestreszczone wiadomości sesji czatu (None, gdy sesja nie należy do użytkownika)."""
+    if session_id is None:
+        return {'id': None, 'summary': None, 'summarized_until': 0, 'messages': []}
+
+    session = ChatSession.query.filter_by(id=session_id, user_id=user_id).first()
+    if session is None:
+        return None
+
+    messages = ChatMessage.query.filter(
+        ChatMessage.session_id == session.id, ChatMessage.id > session.summarized_until
+    ).order_by(ChatMessage.id).all()
+
+    return {
+        'id': session.id,
+        'summary': session.summary,
+        'summarized_until': session.summarized_until,
+        'messages': [{'id': m.id, 'role': m.role, 'content': m.content} for m in messages]
+    }
+
+
+def save_chat_turn(user_id, session_id, user_message, reply, summary, summarized_until, previous_until=0):
+    """Zapisuje wymianę (pytanie + odpowiedź) i nowe streszczenie; zwraca id sesji.
+
+    Streszczenie zapisywane jest warunkowo (summarized_until wciąż równe previous_until) -
+    gdy równoległa wymiana w tej sesji zdążyła je już zmienić, zostaje jej wersja, a niestreszczone
+    wiadomości po prostu pozostają w oknie kontekstu.
+    """
+    try:
+        if session_id is None:
+            session = ChatSession(user_id=user_id, summary=summary, summarized_until=summarized_until)
+            db.session.add(session)
+        else:
+            if summarized_until != previous_until:
+                db.session.execute(
+                    update(ChatSession)
+                    .where(ChatSession.id == session_id, ChatSession.summarized_until == previous_until)
+                    .values(summary=summary, summarized_until=summarized_until)
+                )
+            session = db.session.get(ChatSession, session_id)
+
+        session.updated_at = datetime.now(timezone.utc)
+        session.messages.append(ChatMessage(role='user', content=user_message))
+        session.messages.append(ChatMessage(role='model', content=reply))
+        db.session.commit()
+        return session.id
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+@api_bp.route('/chat', methods=['POST'])
+@jwt_required()
+async def chat_with_ai():
+    """
+    Endpoint obsługujący czat. Pobiera dane użytkownika z bazy,
+    aby nadać kontekst rozmowie, a następnie pyta Gemini.
+    Body: {"message": "...", "session_id": 12} - bez session_id zaczyna nową rozmowę.
+    Do Gemini trafiają najnowsze wiadomości sesji mieszczące się w CHAT_CONTEXT_TOKENS,
+    a starsze są włączane do streszczenia, więc rozmiar promptu nie rośnie z długością rozmowy.
+    Odczyt z bazy i wywołanie Gemini idą do wątków roboczych.
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "JSON object body is required"}), 400
+    user_message = data.get('message')
+    session_id = data.get('session_id')
+    config = current_app.config
+
+    if not user_message:
+        return jsonify({"error": "Message is required"}), 400
+    if not isinstance(user_message, str):
+        return jsonify({"error": "message must be a string"}), 400
+    if len(user_message) > config['CHAT_MAX_MESSAGE_CHARS']:
+        return jsonify({"error": f"Message is too long (max {config['CHAT_MAX_MESSAGE_CHARS']} characters)"}), 400
+    if session_id is not None and (not isinstance(session_id, int) or isinstance(session_id, bool)):
+        return jsonify({"error": "session_id must be an integer"}), 400
+
+    # 1. Pobierz kontekst zdrowotny użytkownika (jeśli istnieje) i stan rozmowy
+    context = await offload_db(chat_context, user_id)
+    state = await offload_db(load_chat_state, user_id, session_id)
+    if state is None:
+        return jsonify({"error": "Chat session not found"}), 404
+
+    # 2. Okno kontekstu: to, co się nie mieści, trafia do streszczenia
+    summary, summarized_until = state['summary'], state['summarized_until']
+    budget = config['CHAT_CONTEXT_TOKENS'] - config['CHAT_SUMMARY_TOKENS'] - estimate_tokens(user_message)
+    folded, window = split_chat_window(state['messages'], budget)
+
+    if folded:
+        with span('chat_summary'):
+            summary = await run_llm(summarize_conversation_async, summarize_conversation,
+                                    summary, folded, config['CHAT_SUMMARY_TOKENS'])
+        summarized_until = folded[-1]['id']
+
+    # 3. Wywołanie serwisu AI
+    with span('llm'):
+        ai_response_text = await run_llm(get_ai_response_async, get_ai_response, user_message,
+                                         user_context=context, history=window, summary=summary)
+
+    # Odpowiedzi zastępczej (brak połączenia z AI) nie zapisujemy w historii rozmowy
+    if ai_response_text != AI_UNAVAILABLE_MSG:
+        try:
+            session_id = await offload_db(
+                save_chat_turn, user_id, state['id'], user_message, ai_response_text, summary, summarized_until,
+                state['summarized_until']
+            )
+        except Exception as e:
+            return jsonify({"msg": "Chat response generated but database save failed", "error": str(e)}), 500
 
     return jsonify({
         "text": ai_response_text,
-        "status": "success"
-    }), 200
\ No newline at end of file
+        "status": "success",
+        "session_id": session_id
+    }), 200
+
+
+@api_bp.route('/chat/sessions', methods=['GET'])
+@jwt_required()
+def list_chat_sessions():
+    """Lista rozmów użytkownika (najnowsze pierwsze)"""
+    user_id = get_jwt_identity()
+    sessions = ChatSession.query.filter_by(user_id=user_id).order_by(ChatSession.updated_at.desc()).all()
+
+    return jsonify({
+        "msg": "Chat sessions retrieved successfully",
+        "count": len(sessions),
+        "data": [{
+            "id": session.id,
+            "created_at": session.created_at.isoformat(),
+            "updated_at": session.updated_at.isoformat(),
+            "summary": session.summary
+        } for session in sessions]
+    }), 200
+
+
+@api_bp.route('/chat/sessions/<int:session_id>', methods=['GET'])
+@jwt_required()
+def get_chat_session(session_id):
+    """Pełna treść rozmowy (także wiadomości już streszczone)"""
+    user_id = get_jwt_identity()
+    session = ChatSession.query.filter_by(id=session_id, user_id=user_id).first()
+
+    if not session:
+        return jsonify({"msg": "Chat session not found"}), 404
+
+    return jsonify({
+        "msg": "Chat session retrieved successfully",
+        "data": {
+            "id": session.id,
+            "summary": session.summary,
+            "messages": [{
+                "id": message.id,
+                "role": message.role,
+                "content": message.content,
+                "created_at": message.created_at.isoformat()
+            } for message in session.messages]
+        }
+    }), 200
+
+
+@api_bp.route('/chat/sessions/<int:session_id>', methods=['DELETE'])
+@jwt_required()
+def delete_chat_session(session_id):
+    """Usuwa rozmowę wraz z wiadomościami"""
+    user_id = get_jwt_identity()
+    session = ChatSession.query.filter_by(id=session_id, user_id=user_id).first()
+
+    if not session:
+        return jsonify({"msg": "Chat session not found"}), 404
+
+    try:
+        db.session.delete(session)
+        db.session.commit()
+        return jsonify({"msg": "Chat session deleted successfully"}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": str(e)}), 500
+
+
+# ==========================================
+#  OPS BLUEPRINT (Metryki, Profilowanie)
+# ==========================================
+ops_bp = Blueprint('ops', __name__)
+
+@ops_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Histogramy czasu etapów w formacie tekstowym Prometheusa"""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+@ops_bp.route('/profiles', methods=['GET'])
+@jwt_required()
+def list_recent_profiles():
+    """Lista ostatnich profili żądań (tylko dla administratorów)"""
+    if not is_admin(get_jwt_identity()):
+        return jsonify({"msg": "Admin access required"}), 403
+
+    limit = request.args.get('limit', default=20, type=int)
+    profiles = list_profiles(limit)
+
+    return jsonify({
+        "msg": "Profiles retrieved successfully",
+        "count": len(profiles),
+        "data": profiles
+    }), 200
+
+
+@ops_bp.route('/drift', methods=['GET'])
+@jwt_required()
+def get_drift_report():
+    """PSI / KL rozkładów wejść /predict względem zbioru treningowego (tylko dla administratorów)"""
+    if not is_admin(get_jwt_identity()):
+        return jsonify({"msg": "Admin access required"}), 403
+
+    report = drift_report(
+        current_app.config['DRIFT_DIR'],
+        request.args.get('min_observations', default=current_app.config['DRIFT_MIN_OBSERVATIONS'], type=int)
+    )
+    if report is None:
+        return jsonify({"msg": "Reference profile not loaded (input_profile.pkl)"}), 404
+
+    return jsonify({
+        "msg": "Drift report generated",
+        "data": report
+    }), 200
+
+
+@ops_bp.route('/shadow', methods=['GET'])
+@jwt_required()
+def get_shadow_summary():
+    """Zgodność, różnice ryzyka i czasy modeli-kandydatów względem produkcyjnych (tylko dla administratorów)"""
+    if not is_admin(get_jwt_identity()):
+        return jsonify({"msg": "Admin access required"}), 403
+
+    summary = shadow_summary()
+    if summary is None:
+        return jsonify({"msg": "Shadow evaluation disabled (SHADOW_MODELS_DIR)"}), 404
+
+    return jsonify({
+        "msg": "Shadow summary retrieved successfully",
+        "data": summary
+    }), 200
@@ -0,0 +1,267 @@
+"""
+Generator syntetycznych danych do testów w dużej skali (/history, /trends, /logs, kontekst /chat).
+
+Tworzy użytkowników wraz z UserData, dziennymi wpisami Log i rekordami History o takim samym
+kształcie jak zapisywane przez /predict (model_scores wszystkich modeli, input_snapshot
+jako JSON z 'input_data'). Wiersze trafiają do bazy masowo - insert() z listą słowników
+(executemany) w dużych paczkach, bez tworzenia obiektów ORM - więc 10 mln wierszy to minuty.
+
+Identyfikatory użytkowników nadaje baza (sekwencja users_id_seq w PostgreSQL, autoincrement
+w SQLite): paczka użytkowników zapisywana jest z INSERT ... RETURNING id, a zwrócone id trafiają
+do kluczy obcych UserData/Log/History. Jawne id omijałyby sekwencję i kolejny /register
+kończyłby się błędem duplikatu klucza. Wszyscy użytkownicy dzielą jeden hash hasła
+(domyślnie 'Seed12345'), bo liczenie hasha per wiersz zajęłoby więcej niż sam zapis.
+
+Przykład:
+    python seed_data.py --users 200000 --history 30 --logs 20
+"""
+import argparse
+import json
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from models import db, User, UserData, Log, History, UserVersion
+
+MODEL_NAMES = ('logistic', 'random_forest', 'gradient_boost')
+
+DEFAULT_PASSWORD = 'Seed12345'
+
+ADVICE = (
+    "1. Zwiększ aktywność fizyczną do 150 minut tygodniowo. 2. Ogranicz cukry proste. 3. Kontroluj ciśnienie.",
+    "1. Zadbaj o regularny sen. 2. Jedz więcej warzyw. 3. Wykonaj badanie poziomu glukozy.",
+    "1. Utrzymuj obecne nawyki. 2. Pij więcej wody. 3. Kontroluj wagę raz w tygodniu."
+)
+
+
+def _profiles(rng, n):
+    """Cechy demograficzne i zdrowotne użytkowników (rozkłady zbliżone do BRFSS)."""
+    return {
+        'sex': rng.random(n) < 0.44,
+        'age': rng.integers(1, 14, n),
+        'high_bp': rng.random(n) < 0.43,
+        'high_chol': rng.random(n) < 0.42,
+        'chol_check': rng.random(n) < 0.96,
+        'smoker': rng.random(n) < 0.44,
+        'stroke': rng.random(n) < 0.04,
+        'heart_disease': rng.random(n) < 0.09,
+        'any_healthcare': rng.random(n) < 0.95,
+        'no_docbc_cost': rng.random(n) < 0.08,
+        'diff_walk': rng.random(n) < 0.17,
+        'bmi': np.clip(rng.normal(28.4, 6.6, n), 14, 70),
+        'gen_hlth': rng.integers(1, 6, n),
+        'height': np.clip(rng.normal(172, 9, n), 150, 200)
+    }
+
+
+def _base_risk(profile):
+    """Przybliżone ryzyko (0-1) z cech - tylko po to, by historia wyglądała wiarygodnie."""
+    score = (
+        -4.0
+        + 0.9 * profile['high_bp'] + 0.6 * profile['high_chol'] + 0.7 * profile['heart_disease']
+        + 0.08 * (profile['bmi'] - 25) + 0.15 * profile['age'] + 0.35 * (profile['gen_hlth'] - 3)
+        + 0.4 * profile['diff_walk']
+    )
+    return 1 / (1 + np.exp(-score))
+
+
+def _model_scores(model_risks):
+    """model_scores w formacie /predict dla ryzyk (0-1) kolejnych modeli."""
+    scores = {}
+    for model_name, model_risk in zip(MODEL_NAMES, model_risks):
+        probabilities = [1 - model_risk, model_risk * 0.15, model_risk * 0.85]
+        prediction = probabilities.index(max(probabilities))
+        scores[model_name] = {
+            'prediction': prediction,
+            'probabilities': {f'class_{i}': round(p * 100, 2) for i, p in enumerate(probabilities)},
+            'confidence': round(max(probabilities) * 100, 2),
+            'diabetes_risk': round(model_risk * 100, 2)
+        }
+    return scores
+
+
+def build_batch(emails, history_per_user, log_days, password_hash, rng, now):
+    """Wiersze (listy słowników) wszystkich tabel dla paczki użytkowników.
+
+    Losowanie odbywa się wektorowo dla całej paczki, a pętle tylko składają słowniki.
+    Id użytkowników nie są jeszcze znane, więc user_id w pozostałych tabelach to pozycja
+    użytkownika w paczce - podmienia ją bind_user_ids() po zapisie wierszy User.
+    """
+    n = len(emails)
+    profile = _profiles(rng, n)
+    base_risk = _base_risk(profile)
+    columns = {key: values.tolist() for key, values in profile.items()}
+    today = now.date()
+
+    # --- Losowania dla dziennych wpisów (n x log_days) ---
+    log_shape = (n, log_days)
+    weights = (profile['bmi'] * (profile['height'] / 100) ** 2)[:, None] + np.cumsum(rng.normal(0, 0.3, log_shape), axis=1)
+    log_flags = {
+        'ate_fruit': rng.random(log_shape) < 0.6, 'ate_veggie': rng.random(log_shape) < 0.7,
+        'physical_activity': rng.random(log_shape) < 0.5, 'bad_mental_day': rng.random(log_shape) < 0.15,
+        'bad_physical_day': rng.random(log_shape) < 0.12
+    }
+    log_flags = {key: values.tolist() for key, values in log_flags.items()}
+    drinks = rng.poisson(0.5, log_shape).tolist()
+    weights = np.round(weights, 1).tolist()
+
+    # --- Losowania dla historii (n x history_per_user): ryzyko dryfuje w czasie ---
+    hist_shape = (n, history_per_user)
+    drift = rng.normal(0, 0.003, (n, 1)) * np.arange(history_per_user)
+    risk = np.clip(base_risk[:, None] + drift + rng.normal(0, 0.02, hist_shape), 0.005, 0.995)
+    model_risks = np.clip(risk[..., None] + rng.normal(0, 0.04, hist_shape + (len(MODEL_NAMES),)), 0.001, 0.999).tolist()
+    bmi = np.round(profile['bmi'][:, None] + rng.normal(0, 0.5, hist_shape), 1).tolist()
+    minutes = rng.integers(0, 1440, hist_shape).tolist()
+    advice = np.where(rng.random(hist_shape) < 0.7, rng.integers(0, len(ADVICE), hist_shape), -1).tolist()
+    behaviour = {
+        'PhysActivity': rng.random(hist_shape) < 0.75, 'Fruits': rng.random(hist_shape) < 0.63,
+        'Veggies': rng.random(hist_shape) < 0.81, 'HvyAlcoholConsump': rng.random(hist_shape) < 0.06
+    }
+    behaviour = {key: values.astype(int).tolist() for key, values in behaviour.items()}
+    health_days = rng.integers(0, 31, hist_shape + (2,)).tolist()
+    account_age = rng.integers(1, 365, n).tolist()
+
+    users, user_data, logs, history, versions = [], [], [], [], []
+
+    for i, email in enumerate(emails):
+        user_id = i
+        flags = {key: bool(columns[key][i]) for key in (
+            'sex', 'high_bp', 'high_chol', 'chol_check', 'smoker', 'stroke', 'heart_disease',
+            'any_healthcare', 'no_docbc_cost', 'diff_walk'
+        )}
+
+        users.append({
+            'email': email, 'password_hash': password_hash,
+            'created_at': now - timedelta(days=max(history_per_user, log_days) + account_age[i])
+        })
+        user_data.append(dict(flags, user_id=user_id, age=columns['age'][i]))
+        versions.append({'user_id': user_id, 'history': 1, 'logs': 1, 'user_data': 1})
+
+        height = round(columns['height'][i], 1)
+        for day in range(log_days):
+            logs.append({
+                'user_id': user_id, 'log_date': today - timedelta(days=log_days - day),
+                'ate_fruit': log_flags['ate_fruit'][i][day], 'ate_veggie': log_flags['ate_veggie'][i][day],
+                'physical_activity': log_flags['physical_activity'][i][day],
+                'alcohol_drinks': drinks[i][day],
+                'bad_mental_day': log_flags['bad_mental_day'][i][day],
+                'bad_physical_day': log_flags['bad_physical_day'][i][day],
+                'weight': weights[i][day], 'height': height
+            })
+
+        static_input = {
+            "Sex": int(flags['sex']), "Age": columns['age'][i],
+            "HighBP": int(flags['high_bp']), "HighChol": int(flags['high_chol']),
+            "CholCheck": int(flags['chol_check']), "Smoker": int(flags['smoker']),
+            "Stroke": int(flags['stroke']), "HeartDiseaseorAttack": int(flags['heart_disease']),
+            "AnyHealthcare": int(flags['any_healthcare']), "NoDocbcCost": int(flags['no_docbc_cost']),
+            "DiffWalk": int(flags['diff_walk']), "GenHlth": columns['gen_hlth'][i]
+        }
+
+        for j in range(history_per_user):
+            scores = _model_scores(model_risks[i][j])
+            primary = scores['random_forest']['probabilities']
+            input_data = dict(
+                static_input,
+                PhysActivity=behaviour['PhysActivity'][i][j], Fruits=behaviour['Fruits'][i][j],
+                Veggies=behaviour['Veggies'][i][j], HvyAlcoholConsump=behaviour['HvyAlcoholConsump'][i][j],
+                MentHlth=health_days[i][j][0], PhysHlth=health_days[i][j][1], BMI=bmi[i][j]
+            )
+            history.append({
+                'user_id': user_id,
+                'created_at': now - timedelta(days=history_per_user - j, minutes=minutes[i][j]),
+                'result': scores['random_forest']['prediction'],
+                'probability': round(primary['class_1'] + primary['class_2'], 2),
+                'llm_feedback': ADVICE[advice[i][j]] if advice[i][j] >= 0 else None,
+                'model_scores': scores,
+                'input_snapshot': json.dumps({'input_data': input_data})
+            })
+
+    return {
+        User: users, UserData: user_data, UserVersion: versions, Log: logs, History: history
+    }
+
+
+def bind_user_ids(batch, user_ids):
+    """Zamienia pozycje w paczce (user_id z build_batch) na id nadane przez bazę."""
+    for model, rows in batch.items():
+        if model is not User:
+            for row in rows:
+                row['user_id'] = user_ids[row['user_id']]
+
+
+def seed_database(users, history_per_user=30, log_days=30, batch_size=1000, seed=0,
+                  password=DEFAULT_PASSWORD, progress=True):
+    """Generuje dane i zwraca listę identyfikatorów utworzonych użytkowników.
+
+    Wymaga kontekstu aplikacji. batch_size to liczba użytkowników na transakcję.
+    """
+    rng = np.random.default_rng(seed)
+    now = datetime.now(timezone.utc)
+    password_hash = generate_password_hash(password)
+
+    db.create_all()
+    # Losowy znacznik przebiegu w adresach e-mail - kolejne uruchomienia nie kolidują z unikalnym emailem
+    run = secrets.token_hex(4)
+    user_ids = []
+
+    total_rows = 0
+    start = time.perf_counter()
+
+    for offset in range(0, users, batch_size):
+        emails = [f'seed-{run}-{k}@example.com' for k in range(offset, min(offset + batch_size, users))]
+        batch = build_batch(emails, history_per_user, log_days, password_hash, rng, now)
+
+        # Jedna transakcja na paczkę; kolejność tabel zgodna z kluczami obcymi.
+        # sort_by_parameter_order: id wracają w kolejności wierszy, także przy wsadowym INSERT
+        with db.engine.begin() as connection:
+            batch_ids = connection.execute(
+                insert(User).returning(User.id, sort_by_parameter_order=True), batch[User]
+            ).scalars().all()
+            bind_user_ids(batch, batch_ids)
+            total_rows += len(batch_ids)
+
+            for model, rows in batch.items():
+                if model is not User and rows:
+                    connection.execute(insert(model), rows)
+                    total_rows += len(rows)
+        user_ids.extend(batch_ids)
+
+        if progress:
+            elapsed = time.perf_counter() - start
+            done = min(offset + batch_size, users)
+            print(f"  {done}/{users} users, {total_rows} rows, {round(total_rows / elapsed)} rows/s")
+
+    return user_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generator syntetycznych użytkowników, logów i historii")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--history', type=int, default=30, help="Rekordy History na użytkownika")
+    parser.add_argument('--logs', type=int, default=30, help="Dzienne wpisy Log na użytkownika")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Użytkowników na transakcję")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--password', default=DEFAULT_PASSWORD, help="Wspólne hasło wszystkich kont")
+    args = parser.parse_args()
+
+    from app import app
+
+    with app.app_context():
+        start = time.perf_counter()
+        user_ids = seed_database(args.users, args.history, args.logs, args.batch_size, args.seed, args.password)
+        elapsed = time.perf_counter() - start
+
+    if user_ids:
+        with app.app_context():
+            first_email = db.session.get(User, user_ids[0]).email
+        print(f"✅ Seeded users {user_ids[0]}-{user_ids[-1]} in {round(elapsed, 1)}s "
+              f"(login: {first_email} / {args.password})")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,49 +1,243 @@
+import asyncio
 import os
-import google.generativeai as genai
+import threading
 from dotenv import load_dotenv
+from flask import has_request_context, request
 
 # Ładujemy zmienne środowiskowe
 load_dotenv()
 
-# Konfiguracja API key
-api_key = os.getenv("GEMINI_API_KEY")
-if api_key:
-    genai.configure(api_key=api_key)
+AI_UNAVAILABLE_MSG = "Przepraszam, chwilowo nie mogę połączyć się z serwerem AI."
 
-def get_ai_response(user_message, user_context=None):
+_genai = None
+_genai_lock = threading.Lock()
+
+# Limit czasu pojedynczego zapytania do Gemini po stronie klienta (configure_llm_timeout)
+_request_options = {}
+
+# Znacznik w środowisku WSGI: żądanie obsługuje pętla zdarzeń serwera ASGI (asgi.py)
+NATIVE_ASYNC_KEY = 'diabetes.native_async'
+
+
+def get_genai():
+    """
+    Moduł google.generativeai skonfigurowany kluczem API albo None (brak biblioteki lub klucza).
+    Import (ponad pół sekundy) następuje dopiero przy pierwszym wywołaniu LLM.
+    """
+    global _genai
+
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                try:
+                    import google.generativeai as genai
+                except ImportError:
+                    print("Nie ma biblioteki do LLM!")
+                    genai = False
+                else:
+                    api_key = os.getenv("GEMINI_API_KEY")
+                    if api_key:
+                        genai.configure(api_key=api_key)
+                    else:
+                        print("Nie ma API key w .env!")
+                        genai = False
+                _genai = genai
+
+    return _genai or None
+
+
+def configure_llm_timeout(timeout_s):
+    """Ustawia limit czasu zapytań Gemini (0 = bez limitu) - zawieszone wywołanie nie blokuje wątku na zawsze."""
+    _request_options.clear()
+    if timeout_s > 0:
+        _request_options['timeout'] = timeout_s
+
+
+def llm_request_options():
+    """request_options dla generate_content / generate_content_async."""
+    return dict(_request_options)
+
+
+def native_async():
+    """Czy bieżące żądanie obsługuje bezpośrednio pętla zdarzeń serwera ASGI (asgi.py)."""
+    return has_request_context() and bool(request.environ.get(NATIVE_ASYNC_KEY))
+
+
+async def run_llm(async_fn, sync_fn, *args, **kwargs):
+    """
+    Wywołanie LLM z widoku asynchronicznego.
+    Pod serwerem ASGI klient aio Gemini działa na pętli serwera i nie zajmuje wątku.
+    Pod WSGI Flask tworzy pętlę na czas jednego żądania, a klient aio jest związany z pierwszą
+    pętlą, na której go użyto - wtedy wersja synchroniczna idzie do wątku roboczego.
+    """
+    if native_async():
+        return await async_fn(*args, **kwargs)
+    return await asyncio.to_thread(sync_fn, *args, **kwargs)
+
+
+def estimate_tokens(text):
+    """Przybliżona liczba tokenów (ok. 4 znaki na token) - wystarcza do pilnowania budżetu promptu."""
+    return (len(text or '') + 3) // 4
+
+
+def split_chat_window(messages, budget):
+    """
+    Dzieli wiadomości (od najstarszej) na (streszczane, okno) tak, by okno mieściło się w budget tokenów.
+    Po przekroczeniu budżetu okno zmniejszane jest do połowy - streszczanie odbywa się
+    raz na kilka wymian zamiast przy każdej wiadomości.
+    """
+    def newest_within(limit):
+        used = 0
+        for i in range(len(messages) - 1, -1, -1):
+            used += estimate_tokens(messages[i]['content'])
+            if used > limit:
+                return i + 1
+        return 0
+
+    start = newest_within(budget)
+    if start > 0:
+        start = max(start, newest_within(budget // 2))
+        # Okno zaczyna się od wiadomości użytkownika (Gemini oczekuje naprzemiennych ról)
+        while start < len(messages) and messages[start]['role'] != 'user':
+            start += 1
+    return messages[:start], messages[start:]
+
+
+def _chat_contents(history, user_message):
+    """Historia rozmowy w formacie Gemini (role 'user' / 'model') i bieżąca wiadomość."""
+    contents = [{'role': message['role'], 'parts': [message['content']]} for message in history or []]
+    contents.append({'role': 'user', 'parts': [user_message]})
+    return contents
+
+
+def _chat_model(genai, user_context, summary=None):
+    """Model Gemini z instrukcją systemową, kontekstem pacjenta i streszczeniem wcześniejszej rozmowy."""
+    # Budowanie promptu systemowego
+    system_instruction = """
+    Jesteś Asystentem Zdrowia (AI Health Assistant).
+    Twoim celem jest edukacja zdrowotna i motywacja.
+    
+    Zasady:
+    1. Nie jesteś lekarzem. Zawsze zalecaj kontakt ze specjalistą w poważnych sprawach.
+    2. Odpowiadaj krótko, konkretnie i empatycznie.
+    3. Opieraj się na naukowych faktach dotyczących cukrzycy i zdrowego stylu życia.
+    """
+
+    # Jeśli mamy dane o użytkowniku, dodajemy je do kontekstu dla modelu
+    if user_context:
+        context_str = f"\nKontekst pacjenta: Płeć: {user_context.get('sex')}, Wiek: {user_context.get('age')}"
+        if user_context.get('high_bp'): context_str += ", Nadciśnienie: TAK"
+        if user_context.get('high_chol'): context_str += ", Wysoki cholesterol: TAK"
+        if user_context.get('bmi'): context_str += f", BMI: {user_context.get('bmi')}"
+        
+        system_instruction += context_str
+
+    if summary:
+        system_instruction += f"\nStreszczenie wcześniejszej części rozmowy: {summary}"
+
+    model = genai.GenerativeModel(
+        model_name="gemini-2.5-flash",
+        system_instruction=system_instruction
+    )
+
+    return model
+
+
+def get_ai_response(user_message, user_context=None, history=None, summary=None):
     """
     Generuje odpowiedź z Gemini.
     user_context: Opcjonalny słownik z danymi o zdrowiu użytkownika (wiek, waga itp.)
+    history: Wcześniejsze wiadomości sesji [{'role': 'user'/'model', 'content': ...}] mieszczące się w budżecie
+    summary: Streszczenie starszej części rozmowy
     """
+    genai = get_genai()
+    if genai is None:
+        return AI_UNAVAILABLE_MSG
+
     try:
-        # Budowanie promptu systemowego
-        system_instruction = """
-        Jesteś Asystentem Zdrowia (AI Health Assistant).
-        Twoim celem jest edukacja zdrowotna i motywacja.
-        
-        Zasady:
-        1. Nie jesteś lekarzem. Zawsze zalecaj kontakt ze specjalistą w poważnych sprawach.
-        2. Odpowiadaj krótko, konkretnie i empatycznie.
-        3. Opieraj się na naukowych faktach dotyczących cukrzycy i zdrowego stylu życia.
-        """
-
-        # Jeśli mamy dane o użytkowniku, dodajemy je do kontekstu dla modelu
-        if user_context:
-            context_str = f"\nKontekst pacjenta: Płeć: {user_context.get('sex')}, Wiek: {user_context.get('age')}"
-            if user_context.get('high_bp'): context_str += ", Nadciśnienie: TAK"
-            if user_context.get('high_chol'): context_str += ", Wysoki cholesterol: TAK"
-            if user_context.get('bmi'): context_str += f", BMI: {user_context.get('bmi')}"
-            
-            system_instruction += context_str
-
-        model = genai.GenerativeModel(
-            model_name="gemini-2.5-flash",
-            system_instruction=system_instruction
+        response = _chat_model(genai, user_context, summary).generate_content(
+            _chat_contents(history, user_message), request_options=llm_request_options()
         )
+        return response.text
+
+    except Exception as e:
+        print(f"Gemini Error: {e}")
+        return AI_UNAVAILABLE_MSG
+
 
-        response = model.generate_content(user_message)
+async def get_ai_response_async(user_message, user_context=None, history=None, summary=None):
+    """Jak get_ai_response, ale oczekiwanie na Gemini nie blokuje wątku."""
+    genai = get_genai()
+    if genai is None:
+        return AI_UNAVAILABLE_MSG
+
+    try:
+        response = await _chat_model(genai, user_context, summary).generate_content_async(
+            _chat_contents(history, user_message), request_options=llm_request_options()
+        )
         return response.text
 
     except Exception as e:
         print(f"Gemini Error: {e}")
-        return "Przepraszam, chwilowo nie mogę połączyć się z serwerem AI."
\ No newline at end of file
+        return AI_UNAVAILABLE_MSG
+
+
+def _summary_prompt(previous_summary, messages, max_tokens):
+    transcript = '\n'.join(
+        f"{'Użytkownik' if message['role'] == 'user' else 'Asystent'}: {message['content']}" for message in messages
+    )
+    return f"""
+    Zaktualizuj streszczenie rozmowy pacjenta z asystentem zdrowia o nowe wiadomości.
+    Zachowaj fakty o zdrowiu pacjenta, jego pytania, cele i udzielone zalecenia.
+    Odpowiedz wyłącznie streszczeniem, najwyżej {max_tokens * 3} znaków.
+
+    Dotychczasowe streszczenie: {previous_summary or 'brak'}
+
+    Nowe wiadomości:
+    {transcript}
+    """
+
+
+def _fallback_summary(previous_summary, messages, max_tokens):
+    """Streszczenie bez LLM: najnowsze fragmenty wiadomości przycięte do budżetu."""
+    parts = [previous_summary] if previous_summary else []
+    parts += [f"{'U' if message['role'] == 'user' else 'A'}: {message['content'][:200]}" for message in messages]
+    return ' | '.join(parts)[-max_tokens * 4:]
+
+
+def _bounded(summary, max_tokens):
+    return summary.strip()[:max_tokens * 4]
+
+
+def summarize_conversation(previous_summary, messages, max_tokens):
+    """Włącza starsze wiadomości do streszczenia rozmowy (najwyżej max_tokens tokenów)."""
+    genai = get_genai()
+    if genai is None:
+        return _fallback_summary(previous_summary, messages, max_tokens)
+
+    try:
+        model = genai.GenerativeModel(model_name="gemini-2.5-flash")
+        response = model.generate_content(
+            _summary_prompt(previous_summary, messages, max_tokens), request_options=llm_request_options()
+        )
+        return _bounded(response.text, max_tokens)
+    except Exception as e:
+        print(f"Gemini Error: {e}")
+        return _fallback_summary(previous_summary, messages, max_tokens)
+
+
+async def summarize_conversation_async(previous_summary, messages, max_tokens):
+    """Jak summarize_conversation, ale bez blokowania wątku."""
+    genai = get_genai()
+    if genai is None:
+        return _fallback_summary(previous_summary, messages, max_tokens)
+
+    try:
+        model = genai.GenerativeModel(model_name="gemini-2.5-flash")
+        response = await model.generate_content_async(
+            _summary_prompt(previous_summary, messages, max_tokens), request_options=llm_request_options()
+        )
+        return _bounded(response.text, max_tokens)
+    except Exception as e:
+        print(f"Gemini Error: {e}")
+        return _fallback_summary(previous_summary, messages, max_tokens)
@@ -0,0 +1,397 @@
+"""
+Monitorowanie dryfu danych wejściowych /predict względem zbioru treningowego (BRFSS).
+
+Każda predykcja dopisuje swoje cechy do szkiców o stałym rozmiarze: histogramu wartości
+dla cech dyskretnych i kubełków logarytmicznych dla BMI (szkic kwantylowy o względnym
+błędzie alpha, jak DDSketch). Układ kubełków pochodzi z profilu referencyjnego zapisanego
+przez analiza/modele.py (input_profile.pkl), więc szkice i referencja są zawsze porównywalne.
+Surowe wiersze żądań nie są nigdzie zapisywane - tylko liczniki.
+
+Szkice są per proces i per okno czasu (DRIFT_WINDOW_S sekund, np. godzina) - proces trzyma
+tylko ostatnie DRIFT_WINDOWS okien, a raport łączy wyłącznie je. Liczniki skumulowane od startu
+z czasem rozmywałyby świeży dryf, a okno przesuwne pokazuje rozkład z ostatniego okresu.
+
+Co DRIFT_PERSIST_INTERVAL_S sekund worker zapisuje swoje okna do DRIFT_DIR (plik z nazwą hosta,
+PID i losowym znacznikiem procesu - PID 1 w każdym kontenerze nie nadpisuje cudzych plików),
+a raport (GET /drift) sumuje pliki wszystkich workerów - liczniki się dodają, więc łączenie
+szkiców jest dokładne. Pliki nieaktualizowane dłużej niż DRIFT_SKETCH_TTL_S (martwe workery,
+zrestartowane pody) są pomijane i usuwane. Raport podaje PSI i KL(live || referencja) per cecha.
+"""
+import hashlib
+import json
+import math
+import os
+import secrets
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+
+import joblib
+
+PROFILE_FILE = 'input_profile.pkl'
+
+# Wygładzanie pustych kubełków w PSI / KL
+EPSILON = 1e-4
+
+# PSI cechy ciągłej liczone na przedziałach decylowych referencji - drobne kubełki szkicu
+# dawałyby zawyżone PSI już z samego szumu próbkowania
+PSI_BINS = 10
+
+# Progi interpretacji PSI (przyjęte w praktyce monitoringu modeli)
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+_lock = threading.Lock()
+_profile = None
+_fingerprint = None
+_windows = {}  # początek okna (epoch s) -> {'observed': n, 'counts': cecha -> lista liczników}
+_index = {}  # cecha -> wartość -> pozycja (cechy dyskretne)
+_started_at = None
+_worker = None
+_worker_id = None  # (pid, znacznik) - po fork() proces potomny losuje własny
+
+_window_s = 3600
+_window_count = 24
+_sketch_ttl_s = 86400
+
+
+def configure_windows(window_s, windows, sketch_ttl_s):
+    """Długość okna szkicu, liczba okien w raporcie i czas życia plików innych workerów."""
+    global _window_s, _window_count, _sketch_ttl_s
+    with _lock:
+        _window_s = max(int(window_s), 1)
+        _window_count = max(int(windows), 1)
+        _sketch_ttl_s = sketch_ttl_s
+        _windows.clear()
+
+
+def _layout_fingerprint(profile):
+    """Skrót układu kubełków - pliki workerów z innym układem są pomijane."""
+    layout = {
+        name: {key: value for key, value in feature.items() if key != 'counts'}
+        for name, feature in profile['features'].items()
+    }
+    return hashlib.sha1(json.dumps(layout, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _empty_counts(profile):
+    # Ostatni kubełek cechy dyskretnej = wartości spoza referencji
+    return {
+        name: [0] * (len(feature['counts']) + (1 if feature['kind'] == 'discrete' else 0))
+        for name, feature in profile['features'].items()
+    }
+
+
+def load_reference(base_path):
+    """Wczytuje profil referencyjny (jeśli istnieje) i zeruje szkice procesu."""
+    global _profile, _fingerprint, _index, _started_at
+
+    path = os.path.join(base_path, PROFILE_FILE)
+    if not os.path.exists(path):
+        print(f"Warning: {PROFILE_FILE} not found - drift monitoring disabled")
+        return False
+
+    profile = joblib.load(path)
+    with _lock:
+        _profile = profile
+        _fingerprint = _layout_fingerprint(profile)
+        _windows.clear()
+        _index = {
+            name: {value: i for i, value in enumerate(feature['values'])}
+            for name, feature in profile['features'].items() if feature['kind'] == 'discrete'
+        }
+        _started_at = datetime.now(timezone.utc).isoformat()
+    print("Input reference profile loaded successfully.")
+    return True
+
+
+def _bucket(feature, value):
+    """Pozycja wartości cechy ciągłej w kubełkach logarytmicznych profilu."""
+    if value <= 0:
+        return 0
+    index = math.floor(math.log(value) / math.log(feature['gamma']))
+    return min(max(index, feature['min_index']), feature['max_index']) - feature['min_index']
+
+
+def _window_start(now=None):
+    now = time.time() if now is None else now
+    return int(now // _window_s * _window_s)
+
+
+def _oldest_window(now=None):
+    """Początek najstarszego okna, które wchodzi do raportu."""
+    return _window_start(now) - (_window_count - 1) * _window_s
+
+
+def observe(features):
+    """Dopisuje jeden wiersz cech (słownik cecha -> wartość) do szkiców - O(liczba cech)."""
+    profile = _profile
+    if profile is None:
+        return
+
+    positions = []
+    for name, feature in profile['features'].items():
+        value = features.get(name)
+        if value is None:
+            continue
+        if feature['kind'] == 'discrete':
+            index = _index[name].get(float(value), len(feature['values']))
+        else:
+            index = _bucket(feature, float(value))
+        positions.append((name, index))
+
+    with _lock:
+        if profile is not _profile:
+            return
+        start = _window_start()
+        window = _windows.get(start)
+        if window is None:
+            # Nowe okno - okna spoza zakresu raportu nie są już potrzebne
+            for old in [old for old in _windows if old < _oldest_window()]:
+                del _windows[old]
+            window = _windows[start] = {'observed': 0, 'counts': _empty_counts(profile)}
+        counts = window['counts']
+        for name, index in positions:
+            counts[name][index] += 1
+        window['observed'] += 1
+
+
+def _worker_path(drift_dir):
+    global _worker_id
+
+    pid = os.getpid()
+    if _worker_id is None or _worker_id[0] != pid:
+        _worker_id = (pid, secrets.token_hex(4))
+    return os.path.join(drift_dir, f"sketch-{socket.gethostname()}-{pid}-{_worker_id[1]}.json")
+
+
+def _local_state():
+    with _lock:
+        return {
+            'fingerprint': _fingerprint,
+            'window_s': _window_s,
+            'started_at': _started_at,
+            'windows': {
+                str(start): {
+                    'observed': window['observed'],
+                    'counts': {name: list(values) for name, values in window['counts'].items()}
+                }
+                for start, window in _windows.items()
+            }
+        }
+
+
+def _is_stale(state, now=None):
+    """Czy plik workera nie był zapisywany dłużej niż DRIFT_SKETCH_TTL_S."""
+    try:
+        saved_at = datetime.fromisoformat(state['saved_at']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return True
+    now = time.time() if now is None else now
+    return now - saved_at > _sketch_ttl_s
+
+
+def _read_sketches(drift_dir, skip_path=None):
+    """(ścieżka, stan) plików szkiców w DRIFT_DIR; uszkodzone pliki są pomijane."""
+    if not os.path.isdir(drift_dir):
+        return
+    for name in os.listdir(drift_dir):
+        path = os.path.join(drift_dir, name)
+        if not name.endswith('.json') or path == skip_path:
+            continue
+        try:
+            with open(path) as f:
+                yield path, json.load(f)
+        except (OSError, ValueError):
+            continue
+
+
+def prune_stale(drift_dir):
+    """Usuwa pliki workerów nieaktualizowane dłużej niż DRIFT_SKETCH_TTL_S."""
+    removed = 0
+    for path, state in _read_sketches(drift_dir, skip_path=_worker_path(drift_dir)):
+        if _is_stale(state):
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def persist(drift_dir):
+    """Zapisuje liczniki procesu do DRIFT_DIR (atomowo - plik tymczasowy i os.replace)."""
+    if _profile is None:
+        return None
+
+    state = _local_state()
+    state['saved_at'] = datetime.now(timezone.utc).isoformat()
+
+    os.makedirs(drift_dir, exist_ok=True)
+    path = _worker_path(drift_dir)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+    return path
+
+
+def merged_counts(drift_dir):
+    """Suma liczników ostatnich DRIFT_WINDOWS okien wszystkich workerów (bieżący proces
+    z pamięci, pozostałe z plików zapisanych w ciągu DRIFT_SKETCH_TTL_S)."""
+    state = _local_state()
+    counts = _empty_counts(_profile)
+    oldest = _oldest_window()
+    observed = 0
+    workers = 0
+
+    def add(worker_state):
+        nonlocal observed
+        for start, window in worker_state['windows'].items():
+            if int(start) < oldest:
+                continue
+            for feature, values in window['counts'].items():
+                if feature in counts and len(values) == len(counts[feature]):
+                    counts[feature] = [a + b for a, b in zip(counts[feature], values)]
+            observed += window['observed']
+
+    add(state)
+    workers += 1
+
+    for _, other in _read_sketches(drift_dir, skip_path=_worker_path(drift_dir)):
+        if (other.get('fingerprint') != state['fingerprint'] or other.get('window_s') != state['window_s']
+                or 'windows' not in other or _is_stale(other)):
+            continue
+        add(other)
+        workers += 1
+
+    return counts, observed, workers
+
+
+def _distribution(counts):
+    total = sum(counts)
+    return [(c / total if total else 0.0) for c in counts]
+
+
+def psi_kl(live_counts, reference_counts):
+    """PSI oraz KL(live || referencja) dla dwóch histogramów o tych samych kubełkach."""
+    live = _distribution(live_counts)
+    reference = _distribution(reference_counts)
+
+    psi = kl = 0.0
+    for p, q in zip(live, reference):
+        p, q = max(p, EPSILON), max(q, EPSILON)
+        psi += (p - q) * math.log(p / q)
+        kl += p * math.log(p / q)
+    return psi, kl
+
+
+def _coarsen(live_counts, reference_counts, bins=PSI_BINS):
+    """Łączy sąsiednie kubełki w ~bins przedziałów o równej masie referencji."""
+    total = sum(reference_counts)
+    live, reference = [0], [0]
+    cumulative = 0
+    for live_count, reference_count in zip(live_counts, reference_counts):
+        live[-1] += live_count
+        reference[-1] += reference_count
+        cumulative += reference_count
+        if cumulative * bins >= total * len(reference) and len(reference) < bins:
+            live.append(0)
+            reference.append(0)
+    return live, reference
+
+
+def sketch_quantile(feature, counts, q):
+    """Kwantyl cechy ciągłej ze szkicu (środek geometryczny kubełka, błąd względny <= alpha)."""
+    total = sum(counts)
+    if not total:
+        return None
+
+    rank = q * (total - 1)
+    cumulative = 0
+    for i, count in enumerate(counts):
+        cumulative += count
+        if cumulative > rank:
+            index = i + feature['min_index']
+            return round(2 * feature['gamma'] ** (index + 1) / (feature['gamma'] + 1), 2)
+    return None
+
+
+def drift_report(drift_dir, min_observations=100):
+    """PSI / KL per cecha dla połączonych szkiców wszystkich workerów z ostatnich okien."""
+    if _profile is None:
+        return None
+
+    counts, observed, workers = merged_counts(drift_dir)
+    features = {}
+
+    for name, feature in _profile['features'].items():
+        reference_counts = list(feature['counts'])
+        live_counts = counts[name]
+        row = {'kind': feature['kind']}
+
+        if feature['kind'] == 'discrete':
+            # Wartości spoza referencji trafiają do osobnego kubełku z zerem po stronie referencji
+            reference_counts.append(0)
+            row['unseen_values'] = live_counts[-1]
+        else:
+            row['quantiles'] = {
+                f'p{int(q * 100)}': {
+                    'live': sketch_quantile(feature, live_counts, q),
+                    'reference': sketch_quantile(feature, reference_counts, q)
+                }
+                for q in (0.1, 0.5, 0.9)
+            }
+
+        if observed >= min_observations:
+            if feature['kind'] == 'log':
+                live_counts, reference_counts = _coarsen(live_counts, reference_counts)
+            psi, kl = psi_kl(live_counts, reference_counts)
+            row.update({
+                'psi': round(psi, 4),
+                'kl': round(kl, 4),
+                'status': 'significant' if psi >= PSI_SIGNIFICANT else 'moderate' if psi >= PSI_MODERATE else 'stable'
+            })
+        features[name] = row
+
+    drifting = sorted(
+        (name for name, row in features.items() if row.get('status') == 'significant'),
+        key=lambda name: features[name]['psi'], reverse=True
+    )
+
+    return {
+        'observed': observed,
+        'workers': workers,
+        'window_s': _window_s,
+        'windows': _window_count,
+        'since': datetime.fromtimestamp(_oldest_window(), timezone.utc).isoformat(),
+        'reference_rows': _profile['rows'],
+        'min_observations': min_observations,
+        'drifting_features': drifting,
+        'features': features
+    }
+
+
+def start_persister(app):
+    """Wątek w tle zapisujący liczniki procesu co DRIFT_PERSIST_INTERVAL_S sekund
+    i usuwający przeterminowane pliki innych workerów."""
+    global _worker
+
+    interval = app.config['DRIFT_PERSIST_INTERVAL_S']
+    if interval <= 0 or _worker is not None:
+        return
+
+    drift_dir = app.config['DRIFT_DIR']
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                persist(drift_dir)
+                prune_stale(drift_dir)
+            except Exception as e:
+                print(f"Drift sketch persist error: {e}")
+
+    _worker = threading.Thread(target=run, name='drift-persist', daemon=True)
+    _worker.start()
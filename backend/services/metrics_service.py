@@ -0,0 +1,127 @@
+"""
+Lekkie metryki czasu etapów (budowa ramki, skalowanie, modele, SHAP, Gemini, zapis historii).
+
+span() mierzy etap, dopisuje go do histogramu w pamięci procesu oraz do listy etapów
+bieżącego żądania - z niej powstaje nagłówek Server-Timing. Histogramy wystawiane są
+pod /metrics w formacie tekstowym Prometheusa. Koszt pomiaru to perf_counter i krótka
+sekcja pod lockiem, więc instrumentacja może być włączona na produkcji.
+Metryki są per proces - przy kilku workerach Prometheus zbiera każdy z nich osobno.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+# Górne granice kubełków histogramu (sekundy)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_METRIC = 'diabetes_stage_duration_seconds'
+
+_lock = threading.Lock()
+_histograms = {}  # (stage, model) -> [liczniki kubełków, suma, liczba]
+_counters = {}  # (nazwa, etykiety) -> wartość
+
+
+def observe(stage, duration, model=None):
+    """Dopisuje pomiar czasu etapu do histogramu."""
+    key = (stage, model)
+    index = bisect_left(BUCKETS, duration)
+
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        hist[0][index] += 1
+        hist[1] += duration
+        hist[2] += 1
+
+
+@contextmanager
+def span(stage, model=None):
+    """Mierzy czas bloku kodu jako etap (opcjonalnie dla konkretnego modelu)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start, model)
+
+
+def record(stage, duration, model=None):
+    """Zapisuje czas etapu zmierzony gdzie indziej (np. w wątku puli) - histogram i Server-Timing żądania."""
+    observe(stage, duration, model)
+
+    if has_request_context():
+        name = f"{stage}_{model}" if model else stage
+        g.setdefault('server_timing', []).append((name, duration))
+
+
+def inc(name, value=1, **labels):
+    """Zwiększa licznik (np. pominięte etapy, scalone żądania)."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def stage_mean(stage, model=None):
+    """Średni czas etapu w sekundach (None, jeśli etap nie był jeszcze mierzony)."""
+    with _lock:
+        hist = _histograms.get((stage, model))
+        if not hist or hist[2] == 0:
+            return None
+        return hist[1] / hist[2]
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+
+def render_prometheus():
+    """Wszystkie metryki procesu w formacie tekstowym Prometheusa."""
+    with _lock:
+        histograms = {key: (list(h[0]), h[1], h[2]) for key, h in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = [
+        f'# HELP {STAGE_METRIC} Czas etapów obsługi predykcji',
+        f'# TYPE {STAGE_METRIC} histogram'
+    ]
+
+    for (stage, model), (buckets, total, count) in sorted(histograms.items(), key=lambda item: str(item[0])):
+        labels = [('stage', stage)] + ([('model', model)] if model else [])
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS + ('+Inf',), buckets):
+            cumulative += bucket_count
+            lines.append(f'{STAGE_METRIC}_bucket{_format_labels(labels + [("le", bound)])} {cumulative}')
+        lines.append(f'{STAGE_METRIC}_sum{_format_labels(labels)} {total}')
+        lines.append(f'{STAGE_METRIC}_count{_format_labels(labels)} {count}')
+
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f'# TYPE {name} counter')
+        for (counter_name, labels), value in sorted(counters.items()):
+            if counter_name == name:
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """Dodaje nagłówek Server-Timing do odpowiedzi, w których mierzono etapy."""
+
+    @app.before_request
+    def _start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def _add_server_timing(response):
+        entries = g.pop('server_timing', None)
+        if entries:
+            total = time.perf_counter() - g.get('request_start', time.perf_counter())
+            entries.append(('total', total))
+            response.headers['Server-Timing'] = ', '.join(
+                f'{name};dur={round(duration * 1000, 2)}' for name, duration in entries
+            )
+        return response
@@ -0,0 +1,193 @@
+"""
+Profilowanie pojedynczych żądań "na żywo" (np. wolne wyjaśnienie SHAP dla konkretnego payloadu).
+
+Gdy PROFILING_ENABLED jest włączone, żądanie jest profilowane, jeśli:
+  - administrator wyśle nagłówek X-Profile: 1, albo
+  - zostanie wylosowane z prawdopodobieństwem PROFILING_SAMPLE_RATE.
+Używany jest pyinstrument (profiler próbkujący), jeśli jest zainstalowany, a w przeciwnym
+razie cProfile. Artefakt oraz plik z metadanymi zapisywane są w PROFILING_DIR pod
+identyfikatorem żądania, który wraca w nagłówku X-Profile-Id.
+Przy wyłączonym trybie każde żądanie kosztuje tylko jedno sprawdzenie konfiguracji.
+
+Widoki async def (/predict, /chat) oddają modele, SHAP i bazę do wątków (offload). Profiler
+widzi tylko swój wątek, więc w profilowanym żądaniu korutyna widoku działa w bieżącym wątku
+(AsyncFlask.ensure_sync), a offload wykonuje pracę inline. Pod serwerem ASGI takie żądanie
+przechodzi do wątku roboczego, żeby profilowana praca nie blokowała pętli zdarzeń.
+"""
+import asyncio
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, request, make_response, has_request_context
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+
+from auth import is_admin
+from services.ai_service import NATIVE_ASYNC_KEY
+
+# Endpointy, których nie opakowujemy
+_SKIPPED_ENDPOINTS = {'static', 'ops.list_recent_profiles'}
+
+# Znacznik profilowanego żądania w środowisku WSGI
+_PROFILING_KEY = 'diabetes.profiling'
+
+
+def profiling_active():
+    """Czy bieżące żądanie jest profilowane."""
+    return has_request_context() and bool(request.environ.get(_PROFILING_KEY))
+
+
+async def offload(fn, *args, **kwargs):
+    """Praca blokująca z widoku async - w wątku roboczym, a w profilowanym żądaniu inline,
+    żeby trafiła do profilu."""
+    if profiling_active():
+        return fn(*args, **kwargs)
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+def _request_id():
+    """Identyfikator z nagłówka X-Request-ID (jeśli bezpieczny jako nazwa pliku) lub nowy UUID."""
+    request_id = request.headers.get('X-Request-ID', '')
+    if re.fullmatch(r'[A-Za-z0-9_-]{1,64}', request_id):
+        return request_id
+    return uuid.uuid4().hex
+
+
+def _profile_reason():
+    """Zwraca powód profilowania ('header' / 'sample') albo None."""
+    config = current_app.config
+
+    if request.headers.get('X-Profile') == '1':
+        try:
+            verify_jwt_in_request(optional=True)
+            if is_admin(get_jwt_identity()):
+                return 'header'
+        except Exception:
+            pass
+
+    sample_rate = config.get('PROFILING_SAMPLE_RATE', 0)
+    if sample_rate and random.random() < sample_rate:
+        return 'sample'
+
+    return None
+
+
+def _top_functions(profiler, limit=15):
+    """Najkosztowniejsze funkcje (czas skumulowany) z wyniku cProfile."""
+    stats = pstats.Stats(profiler)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            'function': f"{os.path.basename(filename)}:{line}({name})",
+            'calls': calls,
+            'total_ms': round(total_time * 1000, 3),
+            'cumulative_ms': round(cumulative_time * 1000, 3)
+        }
+        for (filename, line, name), (_, calls, total_time, cumulative_time, _) in rows
+    ]
+
+
+def _run_profiled(view, reason, args, kwargs):
+    profile_dir = current_app.config['PROFILING_DIR']
+    os.makedirs(profile_dir, exist_ok=True)
+    request_id = _request_id()
+
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    start = time.perf_counter()
+    if Profiler is not None:
+        profiler = Profiler()
+        profiler.start()
+        try:
+            response = make_response(view(*args, **kwargs))
+        finally:
+            profiler.stop()
+        artifact = f"{request_id}.html"
+        with open(os.path.join(profile_dir, artifact), 'w') as f:
+            f.write(profiler.output_html())
+        top_functions = None
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = make_response(view(*args, **kwargs))
+        finally:
+            profiler.disable()
+        artifact = f"{request_id}.prof"
+        profiler.dump_stats(os.path.join(profile_dir, artifact))
+        top_functions = _top_functions(profiler)
+    duration = time.perf_counter() - start
+
+    meta = {
+        'id': request_id,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': request.path,
+        'reason': reason,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 2),
+        'profiler': 'pyinstrument' if Profiler is not None else 'cProfile',
+        'artifact': artifact,
+        'top_functions': top_functions
+    }
+    with open(os.path.join(profile_dir, f"{request_id}.json"), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    response.headers['X-Profile-Id'] = request_id
+    return response
+
+
+def profiled(view):
+    """Opakowuje widok - profiluje tylko, gdy tryb jest włączony i żądanie o to prosi."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_app.config.get('PROFILING_ENABLED'):
+            return view(*args, **kwargs)
+
+        reason = _profile_reason()
+        if reason is None:
+            return view(*args, **kwargs)
+
+        request.environ[_PROFILING_KEY] = True
+        if request.environ.get(NATIVE_ASYNC_KEY):
+            # Pętla serwera ASGI czeka na wątek, w którym żądanie wykonuje się jak pod WSGI
+            request.environ[NATIVE_ASYNC_KEY] = False
+            return asyncio.to_thread(_run_profiled, view, reason, args, kwargs)
+        return _run_profiled(view, reason, args, kwargs)
+    return wrapper
+
+
+def list_profiles(limit=20):
+    """Metadane ostatnich profili (najnowsze pierwsze)."""
+    profile_dir = current_app.config['PROFILING_DIR']
+    if not os.path.isdir(profile_dir):
+        return []
+
+    meta_files = [
+        os.path.join(profile_dir, name) for name in os.listdir(profile_dir) if name.endswith('.json')
+    ]
+    meta_files.sort(key=os.path.getmtime, reverse=True)
+
+    profiles = []
+    for path in meta_files[:limit]:
+        with open(path) as f:
+            profiles.append(json.load(f))
+    return profiles
+
+
+def init_app(app):
+    """Opakowuje wszystkie zarejestrowane widoki - wywoływać po rejestracji blueprintów."""
+    for endpoint, view in list(app.view_functions.items()):
+        if endpoint not in _SKIPPED_ENDPOINTS:
+            app.view_functions[endpoint] = profiled(view)
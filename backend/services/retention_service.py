@@ -0,0 +1,228 @@
+"""
+Retencja historii predykcji.
+
+Rekordy History starsze niż HISTORY_RETENTION_DAYS są kompaktowane do dziennych agregatów
+HistoryDaily (liczba predykcji, min/max/średnie ryzyko, ostatni wynik dnia) i usuwane.
+Teksty porad Gemini z usuwanych rekordów trafiają do archiwum gzip (JSON Lines)
+w HISTORY_ARCHIVE_DIR - po jednym pliku na przebieg. Porady paczki zapisywane są najpierw
+do pliku tymczasowego i dopisywane do archiwum dopiero po commicie, więc wycofana paczka
+nie zostawia w nim wpisów.
+
+Praca odbywa się paczkami po HISTORY_RETENTION_CHUNK rekordów, każda w osobnej transakcji,
+więc przebieg można przerwać w dowolnym momencie, a blokady bazy trwają krótko.
+Uruchomienie: flask --app app compact-history albo wątek w tle (HISTORY_RETENTION_INTERVAL_S > 0).
+"""
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import delete, insert, select, update
+
+from models import db, History, HistoryDaily, bump_user_versions
+from services.metrics_service import inc
+
+# Po tylu konfliktach z innym procesem przebieg się kończy (wynik w podsumowaniu)
+MAX_CONFLICTS = 5
+
+_worker = None
+
+
+class _ChunkConflict(Exception):
+    """Paczkę w międzyczasie przetworzył inny proces - transakcja jest wycofywana."""
+
+
+def _aggregate(rows):
+    """Agregaty per (user_id, dzień) z wierszy History."""
+    groups = {}
+    for row in rows:
+        key = (row.user_id, row.created_at.date())
+        group = groups.get(key)
+        if group is None:
+            groups[key] = {
+                'count': 1, 'sum': row.probability,
+                'min': row.probability, 'max': row.probability,
+                'last_result': row.result, 'last_created_at': row.created_at
+            }
+            continue
+
+        group['count'] += 1
+        group['sum'] += row.probability
+        group['min'] = min(group['min'], row.probability)
+        group['max'] = max(group['max'], row.probability)
+        if row.created_at >= group['last_created_at']:
+            group['last_result'] = row.result
+            group['last_created_at'] = row.created_at
+    return groups
+
+
+def _merge_daily(connection, groups):
+    """Dopisuje agregaty paczki do HistoryDaily (łącząc z istniejącymi wierszami tych samych dni)."""
+    user_ids = {user_id for user_id, _ in groups}
+    days = {day for _, day in groups}
+    existing = {
+        (row.user_id, row.day): row
+        for row in connection.execute(
+            select(HistoryDaily).where(HistoryDaily.user_id.in_(user_ids), HistoryDaily.day.in_(days))
+        )
+    }
+
+    new_rows = []
+    for (user_id, day), group in groups.items():
+        current = existing.get((user_id, day))
+        if current is None:
+            new_rows.append({
+                'user_id': user_id, 'day': day, 'count': group['count'],
+                'min_probability': group['min'], 'max_probability': group['max'],
+                'mean_probability': group['sum'] / group['count'],
+                'last_result': group['last_result'], 'last_created_at': group['last_created_at']
+            })
+            continue
+
+        count = current.count + group['count']
+        values = {
+            'count': count,
+            'min_probability': min(current.min_probability, group['min']),
+            'max_probability': max(current.max_probability, group['max']),
+            'mean_probability': (current.mean_probability * current.count + group['sum']) / count
+        }
+        if group['last_created_at'] >= current.last_created_at:
+            values.update(last_result=group['last_result'], last_created_at=group['last_created_at'])
+        connection.execute(update(HistoryDaily).where(HistoryDaily.id == current.id).values(**values))
+
+    if new_rows:
+        connection.execute(insert(HistoryDaily), new_rows)
+
+
+def _stage_feedback(archive_path, rows):
+    """Porady Gemini paczki w osobnym pliku gzip obok archiwum - (ścieżka albo None, liczba wpisów)."""
+    lines = [
+        json.dumps({
+            'history_id': row.id, 'user_id': row.user_id,
+            'created_at': row.created_at.isoformat(), 'llm_feedback': row.llm_feedback
+        }, ensure_ascii=False)
+        for row in rows if row.llm_feedback
+    ]
+    if not lines:
+        return None, 0
+
+    os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+    pending_path = f"{archive_path}.{rows[0].id}.pending"
+    with gzip.open(pending_path, 'wt', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    return pending_path, len(lines)
+
+
+def _publish_feedback(pending_path, archive_path):
+    """Dopisuje plik paczki do archiwum (kolejny człon gzip w tym samym pliku) i go usuwa."""
+    with open(pending_path, 'rb') as src, open(archive_path, 'ab') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(pending_path)
+
+
+def _compact_chunk(cutoff, chunk_size, archive_path):
+    """Jedna paczka: agregaty, usunięcie rekordów, archiwum porad. Zwraca liczbę rekordów (0 = koniec)."""
+    pending_path = None
+    try:
+        with db.engine.begin() as connection:
+            rows = connection.execute(
+                select(History.id, History.user_id, History.created_at, History.result,
+                       History.probability, History.llm_feedback)
+                .where(History.created_at < cutoff)
+                .order_by(History.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                return 0, 0
+
+            ids = [row.id for row in rows]
+            deleted = connection.execute(delete(History).where(History.id.in_(ids))).rowcount
+            if deleted != len(ids):
+                raise _ChunkConflict()
+
+            _merge_daily(connection, _aggregate(rows))
+            bump_user_versions(connection, sorted({row.user_id for row in rows}), ['history'])
+
+            # Przed commitem tylko plik tymczasowy - błąd zapisu wycofuje transakcję
+            pending_path, archived = _stage_feedback(archive_path, rows)
+    except BaseException:
+        if pending_path and os.path.exists(pending_path):
+            os.remove(pending_path)
+        raise
+
+    if pending_path:
+        _publish_feedback(pending_path, archive_path)
+    return len(rows), archived
+
+
+def compact_history(retention_days=None, chunk_size=None, pause=0.0, max_chunks=None):
+    """
+    Kompaktuje History starsze niż retention_days dni. Wymaga kontekstu aplikacji.
+    Zwraca podsumowanie przebiegu (liczba rekordów, paczek, zarchiwizowanych porad).
+    """
+    config = current_app.config
+    retention_days = config['HISTORY_RETENTION_DAYS'] if retention_days is None else retention_days
+    chunk_size = chunk_size or config['HISTORY_RETENTION_CHUNK']
+
+    # Kolumny DateTime są zapisywane bez strefy (UTC)
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=retention_days)
+    archive_path = os.path.join(
+        config['HISTORY_ARCHIVE_DIR'], f"llm_feedback-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.jsonl.gz"
+    )
+
+    summary = {'cutoff': cutoff.isoformat(), 'rows': 0, 'chunks': 0, 'archived_feedback': 0, 'conflicts': 0}
+    start = time.perf_counter()
+
+    while max_chunks is None or summary['chunks'] < max_chunks:
+        try:
+            rows, archived = _compact_chunk(cutoff, chunk_size, archive_path)
+        except _ChunkConflict:
+            summary['conflicts'] += 1
+            if summary['conflicts'] >= MAX_CONFLICTS:
+                # Inny proces kompaktuje równolegle - reszta zostanie na kolejny przebieg
+                summary['stopped'] = 'conflicts'
+                break
+            continue
+
+        if not rows:
+            break
+
+        summary['rows'] += rows
+        summary['chunks'] += 1
+        summary['archived_feedback'] += archived
+        inc('diabetes_history_compacted_total', rows)
+
+        if pause:
+            time.sleep(pause)
+
+    summary['duration_s'] = round(time.perf_counter() - start, 2)
+    if summary['archived_feedback']:
+        summary['archive'] = archive_path
+    return summary
+
+
+def start_worker(app):
+    """Wątek w tle uruchamiający kompaktowanie co HISTORY_RETENTION_INTERVAL_S sekund."""
+    global _worker
+
+    interval = app.config['HISTORY_RETENTION_INTERVAL_S']
+    if interval <= 0 or _worker is not None:
+        return
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                with app.app_context():
+                    summary = compact_history(pause=app.config['HISTORY_RETENTION_PAUSE_S'])
+                if summary['rows']:
+                    print(f"🗜️ History compaction: {summary}")
+            except Exception as e:
+                print(f"History compaction error: {e}")
+
+    _worker = threading.Thread(target=run, name='history-retention', daemon=True)
+    _worker.start()
@@ -0,0 +1,216 @@
+"""
+Ewaluacja modeli-kandydatów "w cieniu" na ruchu produkcyjnym.
+
+Kandydat to komplet artefaktów z analiza/modele.py (modele, scaler.pkl, model_columns.pkl)
+w katalogu SHADOW_MODELS_DIR. Wylosowany ułamek żądań /predict (SHADOW_SAMPLE_RATE) trafia -
+jako wektor cech i wyniki modeli produkcyjnych - do ograniczonej kolejki. Gdy kolejka jest
+pełna, zadanie jest odrzucane, więc żądanie nigdy na nic nie czeka.
+
+Kolejkę obsługuje jeden wątek, który po każdym zadaniu odsypia tyle, by jego czas CPU
+nie przekroczył SHADOW_CPU_SHARE jednego rdzenia. Wyniki: zgodność klasy, różnice ryzyka
+i czas modeli kandydata - w metrykach (/metrics) oraz w podsumowaniu GET /shadow.
+"""
+import os
+import queue
+import random
+import threading
+import time
+
+import joblib
+
+from services.metrics_service import inc, observe, stage_mean
+
+# Kubełki |różnicy ryzyka| w punktach procentowych
+DELTA_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+_lock = threading.Lock()
+_queue = None
+_worker = None
+_settings = {}
+_candidate = None  # {'models': {...}, 'scaler': ..., 'columns': [...], 'path': ...}
+_load_error = None  # błąd wczytania kandydata - shadow jest wtedy wyłączony
+_stats = {}  # model -> liczniki porównań
+_cpu_seconds = 0.0  # łączny czas CPU wątku shadow
+
+
+def _load_candidate(path):
+    """Artefakty kandydata - wczytywane w wątku shadow, poza ścieżką żądania."""
+    from ml_service import MODEL_FILES
+
+    models = {}
+    for name, filename in MODEL_FILES.items():
+        model_path = os.path.join(path, filename)
+        if os.path.exists(model_path):
+            model = joblib.load(model_path)
+            if hasattr(model, 'n_jobs'):
+                model.n_jobs = 1
+            models[name] = model
+
+    scaler_path = os.path.join(path, 'scaler.pkl')
+    return {
+        'path': path,
+        'models': models,
+        'scaler': joblib.load(scaler_path) if os.path.exists(scaler_path) else None,
+        'columns': joblib.load(os.path.join(path, 'model_columns.pkl'))
+    }
+
+
+def submit(features, predictions):
+    """Z prawdopodobieństwem SHADOW_SAMPLE_RATE wstawia żądanie do kolejki (bez czekania)."""
+    if _queue is None or _load_error is not None or random.random() >= _settings['sample_rate']:
+        return
+
+    live = {
+        name: (result['prediction'], result['diabetes_risk'])
+        for name, result in predictions.items()
+        if isinstance(result, dict) and 'diabetes_risk' in result
+    }
+    try:
+        _queue.put_nowait((dict(features), live))
+        inc('diabetes_shadow_jobs_total', outcome='queued')
+    except queue.Full:
+        inc('diabetes_shadow_jobs_total', outcome='dropped')
+
+
+def _score(candidate, features):
+    """(klasa, ryzyko w %, czas) każdego modelu kandydata dla jednego wiersza cech."""
+    import pandas as pd
+
+    row = pd.DataFrame([[float(features.get(col, 0.0)) for col in candidate['columns']]],
+                       columns=candidate['columns'])
+    if candidate['scaler'] is not None:
+        row = pd.DataFrame(candidate['scaler'].transform(row), columns=candidate['columns'])
+
+    results = {}
+    for name, model in candidate['models'].items():
+        # Ta sama praca co _run_model w ml_service, więc czasy są porównywalne
+        start = time.perf_counter()
+        prediction = int(model.predict(row)[0])
+        probabilities = model.predict_proba(row)[0]
+        duration = time.perf_counter() - start
+
+        results[name] = (prediction, float((probabilities[1] + probabilities[2]) * 100), duration)
+    return results
+
+
+def _record(live, shadow):
+    for name, (shadow_prediction, shadow_risk, duration) in shadow.items():
+        observe('shadow_model', duration, model=name)
+        if name not in live:
+            continue
+
+        live_prediction, live_risk = live[name]
+        agree = shadow_prediction == live_prediction
+        delta = shadow_risk - live_risk
+        inc('diabetes_shadow_agreement_total', model=name, agree=str(agree).lower())
+
+        with _lock:
+            stats = _stats.setdefault(name, {
+                'compared': 0, 'agreed': 0, 'delta_sum': 0.0, 'abs_delta_sum': 0.0, 'abs_delta_max': 0.0,
+                'abs_delta_buckets': [0] * (len(DELTA_BUCKETS) + 1)
+            })
+            stats['compared'] += 1
+            stats['agreed'] += int(agree)
+            stats['delta_sum'] += delta
+            stats['abs_delta_sum'] += abs(delta)
+            stats['abs_delta_max'] = max(stats['abs_delta_max'], abs(delta))
+            bucket = next((i for i, bound in enumerate(DELTA_BUCKETS) if abs(delta) <= bound), len(DELTA_BUCKETS))
+            stats['abs_delta_buckets'][bucket] += 1
+
+
+def _run():
+    global _candidate, _cpu_seconds, _load_error
+
+    from threadpoolctl import threadpool_limits
+    from ml_service import single_thread_blas
+
+    # Limit OpenMP (np. HistGradientBoosting) dotyczy wątku, który go ustawia - tylko wątku shadow.
+    # BLAS jest globalny, więc ograniczany tylko na czas liczenia (single_thread_blas).
+    # Cała praca kandydata odbywa się wtedy w tym wątku, więc thread_time mierzy ją w całości.
+    threadpool_limits(limits=1, user_api='openmp')
+
+    try:
+        _candidate = _load_candidate(_settings['models_dir'])
+        print(f"Shadow models loaded from {_settings['models_dir']}: {', '.join(_candidate['models'])}")
+    except Exception as e:
+        # submit() przestaje wstawiać zadania - kolejki nikt już nie obsłuży
+        _load_error = str(e)
+        print(f"Shadow models load error: {e}")
+        return
+
+    cpu_share = _settings['cpu_share']
+    while True:
+        features, live = _queue.get()
+        cpu_start = time.thread_time()
+        try:
+            with single_thread_blas():
+                shadow = _score(_candidate, features)
+            _record(live, shadow)
+        except Exception as e:
+            inc('diabetes_shadow_jobs_total', outcome='error')
+            print(f"Shadow scoring error: {e}")
+
+        # Cykl pracy: po t s CPU odpoczynek t * (1 - share) / share
+        cpu_used = time.thread_time() - cpu_start
+        _cpu_seconds += cpu_used
+        time.sleep(cpu_used * (1 - cpu_share) / cpu_share)
+
+
+def start(app):
+    """Uruchamia kolejkę i wątek shadow, jeśli ustawiono SHADOW_MODELS_DIR."""
+    global _queue, _worker
+
+    models_dir = app.config['SHADOW_MODELS_DIR']
+    if not models_dir or _worker is not None:
+        return
+
+    _settings.update(
+        models_dir=models_dir,
+        sample_rate=app.config['SHADOW_SAMPLE_RATE'],
+        cpu_share=min(max(app.config['SHADOW_CPU_SHARE'], 0.01), 1.0),
+        started=time.perf_counter()
+    )
+    _queue = queue.Queue(maxsize=app.config['SHADOW_QUEUE_SIZE'])
+    _worker = threading.Thread(target=_run, name='shadow-models', daemon=True)
+    _worker.start()
+
+
+def shadow_summary():
+    """Podsumowanie porównań kandydata z modelami produkcyjnymi (None, gdy shadow jest wyłączony)."""
+    if _queue is None:
+        return None
+
+    with _lock:
+        stats = {name: dict(values, abs_delta_buckets=list(values['abs_delta_buckets'])) for name, values in _stats.items()}
+
+    models = {}
+    for name, values in stats.items():
+        compared = values['compared']
+        live_mean = stage_mean('model', name)
+        shadow_mean = stage_mean('shadow_model', name)
+        models[name] = {
+            'compared': compared,
+            'agreement_rate': round(values['agreed'] / compared, 4),
+            'mean_delta': round(values['delta_sum'] / compared, 3),
+            'mean_abs_delta': round(values['abs_delta_sum'] / compared, 3),
+            'max_abs_delta': round(values['abs_delta_max'], 3),
+            # max_abs_delta kubełka (None = powyżej ostatniej granicy)
+            'abs_delta_histogram': [
+                {'le': bound, 'count': count}
+                for bound, count in zip(DELTA_BUCKETS + (None,), values['abs_delta_buckets'])
+            ],
+            'live_mean_ms': round(live_mean * 1000, 3) if live_mean is not None else None,
+            'shadow_mean_ms': round(shadow_mean * 1000, 3) if shadow_mean is not None else None
+        }
+
+    return {
+        'models_dir': _settings['models_dir'],
+        'loaded': _candidate is not None,
+        'load_error': _load_error,
+        'sample_rate': _settings['sample_rate'],
+        'cpu_share': _settings['cpu_share'],
+        'cpu_share_used': round(_cpu_seconds / (time.perf_counter() - _settings['started']), 4),
+        'queue_size': _queue.qsize(),
+        'queue_capacity': _queue.maxsize,
+        'models': models
+    }
@@ -0,0 +1,147 @@
+"""
+Sprawdzenie AsyncFlask.dispatch_native (asgi.py) względem zwykłej ścieżki WSGI.
+
+Na osobnej aplikacji testowej z hakami before_request / after_request / teardown_request,
+sygnałem request_started i obsługą błędów (errorhandler, HTTPException, nieobsłużony wyjątek)
+każde żądanie wysyłane jest:
+  1. przez app.test_client() (WSGI - Flask uruchamia korutynę przez asgiref),
+  2. przez dispatch_native na pętli zdarzeń (jak w asgi.py).
+Status, treść, nagłówki dodane w after_request i wywołania haków muszą być identyczne.
+Na koniec N równoległych widoków async czekających po SLEEP_S sekund musi się zmieścić
+w czasie bliskim jednemu oczekiwaniu - korutyny nie zajmują wątków.
+
+Przykład:
+    python tests/asgi_check.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+from flask import abort, g, jsonify, request
+from flask.signals import request_started
+from werkzeug.test import EnvironBuilder
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from async_app import AsyncFlask  # noqa: E402
+from services.ai_service import NATIVE_ASYNC_KEY  # noqa: E402
+
+SLEEP_S = 0.2
+CONCURRENT = 200
+
+
+class CheckError(Exception):
+    pass
+
+
+def build_app(calls):
+    app = AsyncFlask(__name__)
+
+    @app.before_request
+    def before():
+        calls.append('before')
+        g.tag = 'set-in-before'
+        if 'X-Block' in request.headers:
+            return jsonify({"msg": "blocked"}), 403
+
+    @app.after_request
+    def after(response):
+        calls.append('after')
+        response.headers['X-After'] = g.get('tag', 'missing')
+        return response
+
+    @app.teardown_request
+    def teardown(error):
+        calls.append(f'teardown:{type(error).__name__ if error else None}')
+
+    @app.errorhandler(CheckError)
+    def handle_check_error(error):
+        return jsonify({"msg": str(error)}), 418
+
+    def on_started(sender, **extra):
+        calls.append('started')
+    request_started.connect(on_started, app, weak=False)
+
+    @app.route('/ok')
+    async def ok():
+        await asyncio.sleep(0)
+        return jsonify({"tag": g.tag})
+
+    @app.route('/handled')
+    async def handled():
+        raise CheckError('handled by errorhandler')
+
+    @app.route('/http')
+    async def http_error():
+        abort(404)
+
+    @app.route('/crash')
+    async def crash():
+        raise RuntimeError('unhandled')
+
+    @app.route('/sleep')
+    async def sleep():
+        await asyncio.sleep(SLEEP_S)
+        return jsonify({"slept": SLEEP_S})
+
+    @app.route('/sync')
+    def sync_view():
+        return jsonify({"sync": True})
+
+    return app
+
+
+def native_environ(path, headers=None):
+    environ = EnvironBuilder(path=path, headers=headers).get_environ()
+    environ[NATIVE_ASYNC_KEY] = True
+    return environ
+
+
+def summarize(status, body, headers, calls):
+    return status, body, headers.get('X-After'), list(calls)
+
+
+def main():
+    calls = []
+    app = build_app(calls)
+    client = app.test_client()
+    failures = 0
+
+    for path, headers in [('/ok', None), ('/ok', {'X-Block': '1'}), ('/handled', None), ('/http', None),
+                          ('/crash', None), ('/nope', None)]:
+        calls.clear()
+        response = client.get(path, headers=headers)
+        wsgi = summarize(response.status_code, response.get_data(), response.headers, calls)
+
+        calls.clear()
+        response = asyncio.run(app.dispatch_native(native_environ(path, headers)))
+        native = summarize(response.status_code, response.get_data(), response.headers, calls)
+        response.close()
+
+        ok = wsgi == native
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {path} {headers or ''} -> {native[0]} {native[3]}")
+        if not ok:
+            print(f"   WSGI:   {wsgi}\n   native: {native}")
+
+    print(f"is_native_request: /sleep={app.is_native_request(native_environ('/sleep'))}, "
+          f"/sync={app.is_native_request(native_environ('/sync'))}")
+    failures += not app.is_native_request(native_environ('/sleep')) or app.is_native_request(native_environ('/sync'))
+
+    async def concurrent():
+        return await asyncio.gather(*(app.dispatch_native(native_environ('/sleep')) for _ in range(CONCURRENT)))
+
+    start = time.perf_counter()
+    responses = asyncio.run(concurrent())
+    elapsed = time.perf_counter() - start
+    ok = all(response.status_code == 200 for response in responses) and elapsed < SLEEP_S * 3
+    failures += not ok
+    print(f"{'✅' if ok else '❌'} {CONCURRENT} x /sleep ({SLEEP_S}s) on one loop in {elapsed:.2f}s")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
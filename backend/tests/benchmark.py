@@ -0,0 +1,212 @@
+"""
+Mikrobenchmarki potoku predykcji uruchamiane w procesie (bez serwera i bez prawdziwego Gemini).
+
+Mierzone etapy:
+  - predict_diabetes_risk dla anonimowego i zalogowanego użytkownika (LLM zastąpiony atrapą),
+  - get_shap_explanation dla każdego modelu (explainery budowane przed pomiarem),
+  - analyze_risk_trend dla 10 / 100 / 10 000 punktów,
+  - predict_proba każdego modelu dla jednego wiersza i dla paczki 1000 wierszy,
+  - predict_diabetes_risk z modelami liczonymi po kolei i równolegle (--pool-size).
+
+Wyniki zapisywane są do tests/benchmarks/latest.json. Z --save-baseline stają się punktem
+odniesienia; kolejne uruchomienia porównują mediany z bazą i kończą się kodem 1,
+jeśli któryś etap zwolnił bardziej niż --threshold (domyślnie 1.25 = +25%).
+
+Przykład:
+    python tests/benchmark.py --models-dir /ścieżka/do/pkl --save-baseline
+    python tests/benchmark.py --models-dir /ścieżka/do/pkl --threshold 1.3
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import ml_service  # noqa: E402
+
+# Modele trenowane są na macierzach bez nazw kolumn - ostrzeżenie sklearn tylko zaśmieca wynik
+warnings.filterwarnings('ignore', message='X has feature names')
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks')
+
+SAMPLE_INPUT = {
+    "Sex": 1, "Age": 10, "HighBP": 1, "HighChol": 1, "Stroke": 0, "DiffWalk": 1,
+    "PhysActivity": 0, "GenHlth": 4, "PhysHlth": 20, "MentHlth": 5,
+    "HeartDiseaseorAttack": 1, "Smoker": 1, "Fruits": 0, "Veggies": 0,
+    "HvyAlcoholConsump": 1, "BMI": 32.0
+}
+
+
+def fake_llm_advice(user_data, prediction_class, diabetes_risk, risk_factors):
+    """Atrapa Gemini - benchmark mierzy nasz kod, nie sieć."""
+    return "1. Ruch. 2. Dieta. 3. Kontrola u lekarza."
+
+
+def measure(func, repeat, warmup=3):
+    """Mediana i p95 czasu wywołania (ms)."""
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'median_ms': round(float(np.median(timings)), 4),
+        'p95_ms': round(float(np.percentile(timings, 95)), 4),
+        'repeat': repeat
+    }
+
+
+def make_history(points):
+    """Sztuczna historia predykcji dla analyze_risk_trend."""
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rng = np.random.default_rng(0)
+    return [
+        SimpleNamespace(created_at=start + timedelta(hours=6 * i), probability=float(30 + rng.normal(0, 5)))
+        for i in range(points)
+    ]
+
+
+def build_benchmarks(repeat):
+    """Lista (nazwa, funkcja, liczba powtórzeń)."""
+    benchmarks = []
+
+    input_df = ml_service.build_feature_frame(pd.DataFrame([SAMPLE_INPUT]))
+    input_scaled_df = ml_service.scale_features(input_df)
+    rng = np.random.default_rng(0)
+    batch_scaled_df = input_scaled_df.sample(1000, replace=True, random_state=0).reset_index(drop=True)
+    batch_scaled_df += rng.normal(0, 0.5, batch_scaled_df.shape)
+
+    benchmarks.append(('predict_anonymous', lambda: ml_service.predict_diabetes_risk(SAMPLE_INPUT, False), repeat))
+    benchmarks.append(('predict_authenticated', lambda: ml_service.predict_diabetes_risk(SAMPLE_INPUT, True), repeat))
+
+    ml_service.warm_up_explainers()
+    for name, model in ml_service._models.items():
+        if model is not None:
+            benchmarks.append((f'explain_{name}',
+                               lambda n=name: ml_service.get_shap_explanation(n, input_scaled_df), repeat))
+
+    for points in (10, 100, 10000):
+        history = make_history(points)
+        benchmarks.append((f'trend_{points}', lambda h=history: ml_service.analyze_risk_trend(h),
+                           max(3, repeat // 10) if points >= 10000 else repeat))
+
+    for name, model in ml_service._models.items():
+        if model is None:
+            continue
+        benchmarks.append((f'{name}_single_row', lambda m=model: m.predict_proba(input_scaled_df), repeat))
+        benchmarks.append((f'{name}_batch_1000', lambda m=model: m.predict_proba(batch_scaled_df), max(3, repeat // 10)))
+
+    return benchmarks
+
+
+def compare_parallel(repeat, pool_size):
+    """Opóźnienie jednego żądania: modele po kolei vs równolegle na puli wątków.
+
+    Obie wersje mierzone są z n_jobs=1 i limitem wątków BLAS/OpenMP, więc różnica
+    pochodzi tylko z równoległości między modelami (na maszynie jednordzeniowej jej nie będzie).
+    """
+    ml_service.configure_model_pool(pool_size)
+    try:
+        results = {
+            'predict_models_sequential': measure(
+                lambda: ml_service.predict_diabetes_risk(SAMPLE_INPUT, False, parallel=False), repeat),
+            f'predict_models_parallel_{pool_size}': measure(
+                lambda: ml_service.predict_diabetes_risk(SAMPLE_INPUT, False, parallel=True), repeat)
+        }
+    finally:
+        ml_service.configure_model_pool(0)
+
+    sequential, parallel = results.values()
+    print(f"\nParallel models ({pool_size} threads, {os.cpu_count()} CPUs): "
+          f"{sequential['median_ms']:.3f} ms -> {parallel['median_ms']:.3f} ms "
+          f"({sequential['median_ms'] / parallel['median_ms']:.2f}x)")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Zwraca listę etapów, które zwolniły ponad próg względem bazy."""
+    regressions = []
+    print(f"\n{'benchmark':<32}{'median ms':>12}{'baseline':>12}{'ratio':>8}")
+    print("-" * 64)
+
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<32}{result['median_ms']:>12.3f}{'-':>12}{'-':>8}")
+            continue
+
+        ratio = result['median_ms'] / base['median_ms'] if base['median_ms'] else 1.0
+        flag = "  ❌" if ratio > threshold else ""
+        print(f"{name:<32}{result['median_ms']:>12.3f}{base['median_ms']:>12.3f}{ratio:>8.2f}{flag}")
+
+        if ratio > threshold:
+            regressions.append(name)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mikrobenchmarki potoku predykcji")
+    parser.add_argument('--models-dir', default=None, help="Katalog z plikami pkl (domyślnie katalog backend)")
+    parser.add_argument('--repeat', type=int, default=50, help="Liczba pomiarów na etap")
+    parser.add_argument('--baseline', default=os.path.join(BENCHMARK_DIR, 'baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true', help="Zapisz wyniki jako nową bazę")
+    parser.add_argument('--threshold', type=float, default=1.25, help="Dopuszczalny stosunek do bazy")
+    parser.add_argument('--pool-size', type=int, default=3, help="Rozmiar puli przy porównaniu równoległości modeli")
+    args = parser.parse_args()
+
+    ml_service.load_model(args.models_dir)
+    if all(model is None for model in ml_service._models.values()):
+        print("❌ No models loaded - pass --models-dir with trained pkl files.")
+        sys.exit(2)
+
+    ml_service.generate_llm_advice = fake_llm_advice
+
+    results = {}
+    for name, func, repeat in build_benchmarks(args.repeat):
+        results[name] = measure(func, repeat)
+        print(f"  {name:<30} median {results[name]['median_ms']:.3f} ms  p95 {results[name]['p95_ms']:.3f} ms")
+
+    # Na końcu, bo pula zmienia n_jobs wczytanych modeli
+    results.update(compare_parallel(args.repeat, args.pool_size))
+
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    with open(os.path.join(BENCHMARK_DIR, 'latest.json'), 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline yet - run with --save-baseline first.")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ Regressions over {args.threshold}x: {', '.join(regressions)}")
+        sys.exit(1)
+
+    print("\n✅ No regressions.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Czas importu modułów aplikacji (python -X importtime) - pilnuje szybkiego startu workerów i CLI.
+
+Dla każdego modułu uruchamiany jest świeży interpreter z -X importtime, a wynik (najlepszy
+z --repeat prób) sumowany jest per pakiet najwyższego poziomu. Podsumowanie trafia do
+tests/benchmarks/import_time.txt, które jest w repozytorium - regresja widać w diffie.
+
+Dodatkowo skrypt sprawdza, że import nie wciąga ciężkich bibliotek ładowanych leniwie
+(shap, pandas, sklearn, google.generativeai) i kończy się kodem 1, jeśli któraś się pojawi.
+
+Przykład:
+    python tests/import_time.py
+    python tests/import_time.py --modules app,ml_service --repeat 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUMMARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'import_time.txt')
+
+# Biblioteki, które mają być importowane dopiero przy pierwszym użyciu
+LAZY_PACKAGES = ('shap', 'pandas', 'sklearn', 'google.generativeai', 'numba')
+
+
+def import_profile(module):
+    """Lista (moduł, czas własny us, czas skumulowany us) z jednego uruchomienia -X importtime."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def summarize(rows, top_n):
+    """Całkowity czas importu oraz czas własny zsumowany per pakiet najwyższego poziomu."""
+    packages = {}
+    for name, self_us, _ in rows:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+
+    total_us = sum(self_us for _, self_us, _ in rows)
+    top = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top_n]
+    return total_us, top
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Czas importu modułów aplikacji")
+    parser.add_argument('--modules', default='app,routes,ml_service', help="Moduły do sprawdzenia")
+    parser.add_argument('--repeat', type=int, default=3, help="Liczba prób (brany jest najszybszy import)")
+    parser.add_argument('--top', type=int, default=10, help="Liczba najcięższych pakietów w podsumowaniu")
+    parser.add_argument('--no-save', action='store_true', help="Nie nadpisuj tests/benchmarks/import_time.txt")
+    args = parser.parse_args()
+
+    lines = [f"# python -X importtime, best of {args.repeat} (Python {sys.version.split()[0]})"]
+    violations = []
+
+    for module in args.modules.split(','):
+        profiles = [import_profile(module) for _ in range(args.repeat)]
+        rows = min(profiles, key=lambda r: sum(self_us for _, self_us, _ in r))
+        total_us, top = summarize(rows, args.top)
+
+        lines.append(f"\n{module}: {total_us / 1000:.1f} ms, {len(rows)} modules")
+        for package, self_us in top:
+            lines.append(f"  {package:<28}{self_us / 1000:>9.1f} ms")
+
+        imported = {name for name, _, _ in rows}
+        for package in LAZY_PACKAGES:
+            if package in imported:
+                violations.append(f"{module} imports {package}")
+
+    summary = '\n'.join(lines) + '\n'
+    print(summary)
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(SUMMARY_PATH), exist_ok=True)
+        with open(SUMMARY_PATH, 'w') as f:
+            f.write(summary)
+
+    if violations:
+        print("❌ Eager heavy imports: " + ', '.join(violations))
+        sys.exit(1)
+
+    print("✅ No heavy imports at module load.")
+
+
+if __name__ == '__main__':
+    main()
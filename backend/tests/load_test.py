@@ -0,0 +1,266 @@
+"""
+Test obciążeniowy w jednym procesie: ile żądań /predict, /history i /chat na sekundę wytrzymuje jeden węzeł.
+
+Skrypt:
+  1. uruchamia aplikację na tymczasowej bazie SQLite (wielowątkowy serwer werkzeug
+     albo uvicorn z asgi.py przy --asgi),
+  2. podmienia Gemini na atrapę z konfigurowalnym opóźnieniem,
+  3. tworzy N użytkowników z historią predykcji (seed_data.py),
+  4. generuje ruch wg zadanej mieszanki endpointów - stała współbieżność (pętla zamknięta)
+     albo stałe tempo napływu (pętla otwarta, --rate),
+  5. raportuje przepustowość, p50/p95/p99 i odsetek błędów per endpoint.
+
+Przykład:
+    python tests/load_test.py --models-dir /ścieżka/do/pkl --users 50 --concurrency 16 --duration 30
+    python tests/load_test.py --models-dir /ścieżka/do/pkl --rate 40 --mix predict=6,history=3,chat=1 --llm-latency 2
+    python tests/load_test.py --models-dir /ścieżka/do/pkl --rate 40 --mix predict=6,history=3,chat=1 --llm-latency 2 --asgi
+"""
+import asyncio
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+BASE_INPUT = {
+    "Sex": 1, "Age": 8, "HighBP": 0, "HighChol": 1, "Stroke": 0, "DiffWalk": 0,
+    "PhysActivity": 1, "GenHlth": 3, "PhysHlth": 5, "MentHlth": 3,
+    "HeartDiseaseorAttack": 0, "Smoker": 0, "Fruits": 1, "Veggies": 1,
+    "HvyAlcoholConsump": 0, "BMI": 25.0
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Test obciążeniowy API w jednym procesie")
+    parser.add_argument('--models-dir', default=None, help="Katalog z plikami pkl (domyślnie katalog backend)")
+    parser.add_argument('--users', type=int, default=20, help="Liczba użytkowników testowych")
+    parser.add_argument('--history', type=int, default=30, help="Liczba rekordów historii na użytkownika")
+    parser.add_argument('--mix', default='predict=5,history=3,chat=2', help="Wagi endpointów")
+    parser.add_argument('--concurrency', type=int, default=8, help="Liczba równoległych klientów")
+    parser.add_argument('--rate', type=float, default=None, help="Stałe tempo napływu (żądania/s) zamiast pętli zamkniętej")
+    parser.add_argument('--duration', type=float, default=20, help="Czas trwania testu (s)")
+    parser.add_argument('--llm-latency', type=float, default=0.5, help="Opóźnienie atrapy Gemini (s)")
+    parser.add_argument('--asgi', action='store_true', help="Serwer uvicorn z asgi.py zamiast wątków werkzeug")
+    parser.add_argument('--output', default=None, help="Opcjonalny plik JSON z raportem")
+    return parser.parse_args()
+
+
+def boot_app(args, db_path):
+    """Uruchamia aplikację na tymczasowej bazie i zwraca (app, bazowy URL)."""
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+    from werkzeug.serving import make_server
+    import ml_service
+    import routes
+    from app import app
+
+    def fake_llm_advice(user_data, prediction_class, diabetes_risk, risk_factors):
+        time.sleep(args.llm_latency)
+        return "1. Ruch. 2. Dieta. 3. Kontrola u lekarza."
+
+    def fake_ai_response(user_message, user_context=None, **kwargs):
+        time.sleep(args.llm_latency)
+        return "Atrapa odpowiedzi asystenta."
+
+    async def fake_llm_advice_async(user_data, prediction_class, diabetes_risk, risk_factors):
+        await asyncio.sleep(args.llm_latency)
+        return "1. Ruch. 2. Dieta. 3. Kontrola u lekarza."
+
+    async def fake_ai_response_async(user_message, user_context=None, **kwargs):
+        await asyncio.sleep(args.llm_latency)
+        return "Atrapa odpowiedzi asystenta."
+
+    ml_service.generate_llm_advice = fake_llm_advice
+    ml_service.generate_llm_advice_async = fake_llm_advice_async
+    routes.get_ai_response = fake_ai_response
+    routes.get_ai_response_async = fake_ai_response_async
+
+    with app.app_context():
+        ml_service.load_model(args.models_dir)
+
+    if args.asgi:
+        return app, boot_asgi()
+
+    # Log każdego żądania werkzeug zagłuszyłby raport
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return app, f'http://127.0.0.1:{server.server_port}'
+
+
+def boot_asgi():
+    """Uvicorn z asgi.application w osobnym wątku; zwraca bazowy URL."""
+    import socket
+    import uvicorn
+    from asgi import application
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    # Modele są już załadowane z --models-dir, więc bez obsługi lifespan
+    server = uvicorn.Server(uvicorn.Config(application, host='127.0.0.1', port=port, lifespan='off', log_level='error'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f'http://127.0.0.1:{port}'
+
+
+def seed_users(app, users, history_per_user):
+    """Tworzy użytkowników z historią (seed_data) i zwraca ich tokeny JWT."""
+    from flask_jwt_extended import create_access_token
+    from seed_data import seed_database
+
+    with app.app_context():
+        user_ids = seed_database(users, history_per_user, log_days=history_per_user, progress=False)
+        return [create_access_token(identity=str(user_id), expires_delta=timedelta(hours=2)) for user_id in user_ids]
+
+
+def make_request(session, base_url, endpoint, token, rng):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    if endpoint == 'predict':
+        body = dict(BASE_INPUT, BMI=round(rng.uniform(18, 45), 1), HighBP=rng.randint(0, 1))
+        return session.post(f"{base_url}/predict", json=body, headers=headers)
+    if endpoint == 'history':
+        return session.get(f"{base_url}/history", headers=headers)
+    if endpoint == 'chat':
+        return session.post(f"{base_url}/chat", json={"message": "Jak obniżyć ryzyko cukrzycy?"}, headers=headers)
+    if endpoint == 'trends':
+        return session.get(f"{base_url}/trends", headers=headers)
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+class Recorder:
+    """Zbiera opóźnienia i błędy per endpoint (bezpieczne wątkowo)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, endpoint, latency, ok):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(latency)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def report(self, duration):
+        result = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            values = np.array(latencies) * 1000
+            errors = self.errors.get(endpoint, 0)
+            result[endpoint] = {
+                'requests': len(values),
+                'throughput_rps': round(len(values) / duration, 2),
+                'error_rate': round(errors / len(values), 4),
+                'p50_ms': round(float(np.percentile(values, 50)), 2),
+                'p95_ms': round(float(np.percentile(values, 95)), 2),
+                'p99_ms': round(float(np.percentile(values, 99)), 2)
+            }
+        return result
+
+
+def _timed_call(recorder, session, base_url, endpoint, token, rng, scheduled_at):
+    """Opóźnienie liczone od planowanego startu - kolejka po stronie klienta też się liczy."""
+    try:
+        response = make_request(session, base_url, endpoint, token, rng)
+        ok = response.status_code < 400
+    except requests.RequestException:
+        ok = False
+    recorder.record(endpoint, time.perf_counter() - scheduled_at, ok)
+
+
+def run_closed_loop(args, base_url, tokens, endpoints, weights, recorder):
+    """Stała liczba klientów - każdy wysyła kolejne żądanie zaraz po poprzednim."""
+    deadline = time.perf_counter() + args.duration
+
+    def client(worker_id):
+        rng = random.Random(worker_id)
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            endpoint = rng.choices(endpoints, weights)[0]
+            _timed_call(recorder, session, base_url, endpoint, rng.choice(tokens), rng, time.perf_counter())
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for worker_id in range(args.concurrency):
+            pool.submit(client, worker_id)
+
+
+def run_open_loop(args, base_url, tokens, endpoints, weights, recorder):
+    """Stałe tempo napływu niezależne od czasu odpowiedzi (bez 'coordinated omission')."""
+    rng = random.Random(0)
+    local = threading.local()
+    interval = 1.0 / args.rate
+    start = time.perf_counter()
+
+    def task(endpoint, token, scheduled_at):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        _timed_call(recorder, local.session, base_url, endpoint, token, random.Random(), scheduled_at)
+
+    with ThreadPoolExecutor(max_workers=max(args.concurrency, 64)) as pool:
+        i = 0
+        while True:
+            scheduled_at = start + i * interval
+            if scheduled_at - start >= args.duration:
+                break
+            time.sleep(max(0.0, scheduled_at - time.perf_counter()))
+            pool.submit(task, rng.choices(endpoints, weights)[0], rng.choice(tokens), scheduled_at)
+            i += 1
+
+
+def main():
+    args = parse_args()
+
+    mix = dict(item.split('=') for item in args.mix.split(','))
+    endpoints = list(mix)
+    weights = [float(w) for w in mix.values()]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        app, base_url = boot_app(args, os.path.join(tmp_dir, 'loadtest.db'))
+        print(f"Seeding {args.users} users x {args.history} history records...")
+        tokens = seed_users(app, args.users, args.history)
+
+        mode = f"open loop, {args.rate} req/s" if args.rate else f"closed loop, concurrency {args.concurrency}"
+        mode += ", ASGI" if args.asgi else ", WSGI threads"
+        print(f"Running {args.duration}s ({mode}), LLM latency {args.llm_latency}s, mix {mix}...")
+
+        recorder = Recorder()
+        start = time.perf_counter()
+        if args.rate:
+            run_open_loop(args, base_url, tokens, endpoints, weights, recorder)
+        else:
+            run_closed_loop(args, base_url, tokens, endpoints, weights, recorder)
+        duration = time.perf_counter() - start
+
+    report = recorder.report(duration)
+
+    print(f"\n{'endpoint':<12}{'requests':>10}{'rps':>10}{'errors':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    print("-" * 72)
+    for endpoint, r in report.items():
+        print(f"{endpoint:<12}{r['requests']:>10}{r['throughput_rps']:>10.2f}{r['error_rate'] * 100:>9.1f}%"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+
+    total = sum(r['requests'] for r in report.values())
+    print(f"\nTotal: {total} requests in {round(duration, 1)}s ({round(total / duration, 2)} req/s)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'duration_s': round(duration, 2), 'endpoints': report}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Sprawdzenie profilowania /predict: profil żądania musi zawierać etap SHAP (get_shap_explanation).
+
+/predict jest widokiem async def, a modele i SHAP wykonuje offload - profiler widzi tylko swój
+wątek, więc bez wykonania tej pracy inline profil pokazywałby samo oczekiwanie na wątek.
+
+Skrypt uruchamia aplikację na tymczasowej bazie i katalogu profili (serwer werkzeug albo
+uvicorn z asgi.py przy --asgi - tam profilowane żądanie przechodzi z pętli do wątku roboczego),
+wysyła jako administrator /predict z nagłówkiem X-Profile: 1 i szuka funkcji w artefakcie
+(pstats dla cProfile, HTML dla pyinstrument). Kod wyjścia 1 oznacza brak etapu SHAP w profilu.
+
+Przykład:
+    python tests/profiling_check.py --models-dir /ścieżka/do/pkl
+    python tests/profiling_check.py --models-dir /ścieżka/do/pkl --asgi
+"""
+import argparse
+import json
+import logging
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+ADMIN_EMAIL = 'profiling-check@example.com'
+ADMIN_PASSWORD = 'Profiling12345'
+
+PREDICT_INPUT = {
+    "Sex": 1, "Age": 8, "HighBP": 1, "HighChol": 1, "Stroke": 0, "DiffWalk": 0,
+    "PhysActivity": 1, "GenHlth": 3, "PhysHlth": 5, "MentHlth": 3,
+    "HeartDiseaseorAttack": 0, "Smoker": 0, "Fruits": 1, "Veggies": 1,
+    "HvyAlcoholConsump": 0, "BMI": 31.0
+}
+
+EXPECTED_FUNCTION = 'get_shap_explanation'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Czy profil /predict obejmuje etap SHAP")
+    parser.add_argument('--models-dir', default=None, help="Katalog z plikami pkl (domyślnie katalog backend)")
+    parser.add_argument('--asgi', action='store_true', help="Serwer uvicorn z asgi.py zamiast werkzeug")
+    return parser.parse_args()
+
+
+def boot_app(args, work_dir):
+    """Aplikacja z włączonym profilowaniem na tymczasowej bazie; zwraca bazowy URL."""
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(work_dir, 'profiling.db')}"
+    os.environ['ADMIN_EMAILS'] = ADMIN_EMAIL
+
+    from werkzeug.serving import make_server
+    import ml_service
+    from app import app
+    from models import db
+
+    app.config.update(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0, PROFILING_DIR=os.path.join(work_dir, 'profiles'))
+    # Porada Gemini nie jest tu potrzebna - bez klucza API i tak zwraca None
+    ml_service.generate_llm_advice = lambda *a, **kw: None
+
+    async def no_llm_advice_async(*args, **kwargs):
+        return None
+    ml_service.generate_llm_advice_async = no_llm_advice_async
+
+    with app.app_context():
+        db.create_all()
+        ml_service.load_model(args.models_dir)
+
+    if args.asgi:
+        return app, boot_asgi()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return app, f'http://127.0.0.1:{server.server_port}'
+
+
+def boot_asgi():
+    """Uvicorn z asgi.application w osobnym wątku; zwraca bazowy URL."""
+    import socket
+    import uvicorn
+    from asgi import application
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    # Modele są już załadowane z --models-dir, więc bez obsługi lifespan
+    server = uvicorn.Server(uvicorn.Config(application, host='127.0.0.1', port=port, lifespan='off', log_level='error'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f'http://127.0.0.1:{port}'
+
+
+def profiled_functions(profile_dir, meta):
+    """Nazwy funkcji zapisanych w artefakcie profilu."""
+    path = os.path.join(profile_dir, meta['artifact'])
+    if meta['profiler'] == 'cProfile':
+        return {name for _, _, name in pstats.Stats(path).stats}
+    with open(path) as f:
+        html = f.read()
+    return {EXPECTED_FUNCTION} if EXPECTED_FUNCTION in html else set()
+
+
+def main():
+    args = parse_args()
+    work_dir = tempfile.mkdtemp(prefix='profiling-check-')
+    app, base_url = boot_app(args, work_dir)
+
+    requests.post(f"{base_url}/register", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    login = requests.post(f"{base_url}/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    token = login.json()['data']['access_token']
+
+    response = requests.post(
+        f"{base_url}/predict", json=PREDICT_INPUT,
+        headers={"Authorization": f"Bearer {token}", "X-Profile": "1"}
+    )
+    profile_id = response.headers.get('X-Profile-Id')
+    if response.status_code != 200 or not profile_id:
+        print(f"❌ /predict: HTTP {response.status_code}, X-Profile-Id={profile_id}")
+        return 1
+
+    profile_dir = app.config['PROFILING_DIR']
+    with open(os.path.join(profile_dir, f"{profile_id}.json")) as f:
+        meta = json.load(f)
+
+    if EXPECTED_FUNCTION not in profiled_functions(profile_dir, meta):
+        print(f"❌ {EXPECTED_FUNCTION} missing from profile {meta['artifact']} ({meta['profiler']})")
+        return 1
+
+    print(f"✅ {EXPECTED_FUNCTION} found in profile {meta['artifact']} "
+          f"({meta['profiler']}, {meta['duration_ms']} ms)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
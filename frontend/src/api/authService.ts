@@ -236,7 +236,7 @@ export const authService = {
 
     return result;
   },
-chatWithAI: async (message: string) => {
+chatWithAI: async (message: string, sessionId?: number | null) => {
     const token = localStorage.getItem('accessToken');
     
     if (!token) {
@@ -249,7 +249,8 @@ chatWithAI: async (message: string) => {
         'Content-Type': 'application/json',
         'Authorization': `Bearer ${token}`
       },
-      body: JSON.stringify({ message }),
+      // session_id kontynuuje rozmowę (serwer pamięta jej historię)
+      body: JSON.stringify(sessionId ? { message, session_id: sessionId } : { message }),
     });
 
     const result = await response.json();
@@ -264,6 +265,6 @@ chatWithAI: async (message: string) => {
       throw new Error(result.error || result.msg || 'Błąd komunikacji z asystentem');
     }
 
-    return result; // Zwraca { text: "Odpowiedź...", status: "success" }
+    return result; // Zwraca { text: "Odpowiedź...", status: "success", session_id: 12 }
   },
 };
\ No newline at end of file
@@ -13,6 +13,7 @@ const HealthChat: React.FC = () => {
   const { isLoggedIn } = useAuth(); // Pobieramy stan zalogowania z kontekstu
   const [input, setInput] = useState('');
   const [isTyping, setIsTyping] = useState(false);
+  const [sessionId, setSessionId] = useState<number | null>(null);
   const [messages, setMessages] = useState<Message[]>([
     {
       id: 1,
@@ -58,7 +59,8 @@ const HealthChat: React.FC = () => {
 
     try {
       // 2. Wywołanie serwisu (to tutaj dzieje się magia z tokenem)
-      const data = await authService.chatWithAI(currentInput);
+      const data = await authService.chatWithAI(currentInput, sessionId);
+      if (data.session_id) setSessionId(data.session_id);
 
       // 3. Obsługa sukcesu
       const botResponse: Message = {
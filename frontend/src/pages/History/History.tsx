@@ -3,8 +3,16 @@ import { useNavigate } from 'react-router-dom';
 import styles from './History.module.css';
 import { authService } from '@/api/authService';
 
+interface DailySummary {
+  count: number;
+  min_probability: number;
+  max_probability: number;
+  mean_probability: number;
+}
+
 interface HistoryRecord {
-  id: number;
+  // null dla dziennych podsumowań starszej historii (daily_summary)
+  id: number | null;
   created_at: string;
   result: number;
   result_label: string;
@@ -12,6 +20,7 @@ interface HistoryRecord {
   llm_feedback?: string;
   input_data: any;
   model_scores?: Record<string, any>;
+  daily_summary?: DailySummary;
 }
 
 const History = () => {
@@ -160,7 +169,7 @@ const History = () => {
         ) : (
           <div className={styles.timeline}>
             {records.map((record, index) => (
-              <div key={record.id} className={styles.timelineItem}>
+              <div key={record.id ?? `daily-${record.created_at}`} className={styles.timelineItem}>
                 <div className={styles.timelineDot}></div>
                 {index < records.length - 1 && <div className={styles.timelineLine}></div>}
 
@@ -195,20 +204,29 @@ const History = () => {
                     </div>
                   )}
 
+                  {record.daily_summary && (
+                    <div className={styles.dateInfo}>
+                      Podsumowanie dnia: {record.daily_summary.count} pomiarów, ryzyko{' '}
+                      {record.daily_summary.min_probability.toFixed(1)}–{record.daily_summary.max_probability.toFixed(1)}%
+                    </div>
+                  )}
+
+                  {record.id !== null && (
                   <div className={styles.cardActions}>
                     <button
                       className={styles.btnExpand}
-                      onClick={() => toggleExpand(record.id)}
+                      onClick={() => toggleExpand(record.id!)}
                     >
                       {expandedId === record.id ? '▼ Zwiń szczegóły' : '▶ Pokaż szczegóły'}
                     </button>
                     <button
                       className={styles.btnDelete}
-                      onClick={() => handleDelete(record.id)}
+                      onClick={() => handleDelete(record.id!)}
                     >
                       🗑️ Usuń
                     </button>
                   </div>
+                  )}
 
                   {expandedId === record.id && (
                     <div className={styles.expandedContent}>